@@ -0,0 +1,112 @@
+"""Сравнение времени кодирования и разбора JSON: JSONRenderer/JSONParser против FastJSON*.
+
+Запуск из корня проекта: python benchmarks/bench_json.py
+Полезная нагрузка повторяет ответы PrivateUserSerializer с историей платежей и списка курсов.
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import timeit
+from io import BytesIO
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from config.renderers import FastJSONParser, FastJSONRenderer, orjson  # noqa: E402
+
+
+def private_user_payload(payments):
+    """Профиль пользователя с историей платежей."""
+
+    paid_at = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+    return {
+        "id": 1,
+        "email": "student@example.com",
+        "phone": "79990000000",
+        "city": "Москва",
+        "payments": [
+            {
+                "id": i,
+                "payment_method": "transfer",
+                "amount": 5000 + i,
+                "session_id": f"cs_test_{i:024d}",
+                "link": f"https://checkout.stripe.com/c/pay/cs_test_{i:024d}",
+                "user": 1,
+                "payment_date": (paid_at + datetime.timedelta(hours=i)).isoformat().replace("+00:00", "Z"),
+                "item": {"type": "course", "id": i % 40, "name": f"Курс {i % 40}"},
+            }
+            for i in range(payments)
+        ],
+    }
+
+
+def course_list_payload(courses):
+    """Страница списка курсов."""
+
+    return {
+        "count": courses,
+        "next": None,
+        "previous": None,
+        "results": [
+            {
+                "id": i,
+                "lessons": [f"Урок {i}.{j}" for j in range(12)],
+                "count_lesson": 12,
+                "subscription": bool(i % 2),
+                "name": f"Курс {i}",
+                "preview": f"http://localhost/media/materials/preview/{i}.png",
+                "description": "Описание курса " * 20,
+                "owner": i % 100,
+            }
+            for i in range(courses)
+        ],
+    }
+
+
+def measure(label, payload, repeat, number):
+    """Печатает время кодирования и разбора одной полезной нагрузки."""
+
+    standard = JSONRenderer().render(payload)
+    assert FastJSONRenderer().render(payload) == standard
+
+    results = []
+    for renderer in (JSONRenderer(), FastJSONRenderer()):
+        results.append(min(timeit.repeat(lambda: renderer.render(payload), number=number, repeat=repeat)) / number)
+    for parser in (JSONParser(), FastJSONParser()):
+        results.append(
+            min(timeit.repeat(lambda: parser.parse(BytesIO(standard)), number=number, repeat=repeat)) / number
+        )
+
+    encode, fast_encode, decode, fast_decode = (value * 1000 for value in results)
+    print(
+        f"{label:<28} {len(standard) / 1024:7.1f} KiB  encode {encode:6.2f} -> {fast_encode:6.2f} ms  "
+        f"decode {decode:6.2f} -> {fast_decode:6.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    if orjson is None:
+        print("orjson не установлен: FastJSONRenderer работает как JSONRenderer")
+    measure("PrivateUser, 500 payments", private_user_payload(500), args.repeat, args.number)
+    measure("Course list, 10 courses", course_list_payload(10), args.repeat, args.number)
+    measure("Course list, 1000 courses", course_list_payload(1000), args.repeat, args.number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Сравнение CPU на строку: ModelSerializer против values()-сериализаторов списков.
+
+Запуск из корня проекта: python benchmarks/bench_list_serializers.py --rows 5000
+Запросы к базе не выполняются: строки собираются в памяти.
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from materials.models import Lesson  # noqa: E402
+from materials.serializers import LessonSerializer, LessonValuesSerializer  # noqa: E402
+from users.models import User  # noqa: E402
+from users.serializers import PublicUserSerializer, PublicUserValuesSerializer  # noqa: E402
+
+
+def lesson_rows(count):
+    """Уроки в виде экземпляров модели и эквивалентных строк values()."""
+
+    instances = [
+        Lesson(
+            id=i,
+            name=f"Урок {i}",
+            description="Описание урока" * 5,
+            preview=f"materials/preview/{i}.png" if i % 2 else None,
+            video=f"https://www.youtube.com/watch?v={i}",
+            course_id=i % 50 or None,
+            owner_id=i % 1000,
+        )
+        for i in range(1, count + 1)
+    ]
+    columns = [column for _, column, _, _ in LessonValuesSerializer.columns]
+    rows = [{column: lesson.serializable_value(column) for column in columns} for lesson in instances]
+    for row in rows:
+        row["preview"] = row["preview"].name
+    return instances, rows
+
+
+def user_rows(count):
+    """Пользователи в виде экземпляров модели и эквивалентных строк values()."""
+
+    instances = [
+        User(id=i, email=f"user{i}@example.com", phone="79990000000", city="Москва") for i in range(1, count + 1)
+    ]
+    rows = [{"id": user.id, "email": user.email, "phone": user.phone, "city": user.city} for user in instances]
+    return instances, rows
+
+
+def measure(label, serializer_class, values_serializer_class, instances, rows, context, repeat):
+    """Печатает время на строку для обоих способов сериализации."""
+
+    expected = serializer_class(instances, many=True, context=context).data
+    assert values_serializer_class(context=context).many(rows) == expected
+
+    full = min(
+        timeit.repeat(lambda: serializer_class(instances, many=True, context=context).data, number=1, repeat=repeat)
+    )
+    fast = min(timeit.repeat(lambda: values_serializer_class(context=context).many(rows), number=1, repeat=repeat))
+    per_row = 1_000_000 / len(rows)
+    print(
+        f"{label:<22} ModelSerializer {full * per_row:7.2f} µs/row  "
+        f"values() {fast * per_row:7.2f} µs/row  x{full / fast:.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    context = {"request": Request(APIRequestFactory().get("/", HTTP_HOST="localhost"))}
+    measure(
+        "LessonSerializer", LessonSerializer, LessonValuesSerializer, *lesson_rows(args.rows), context, args.repeat
+    )
+    measure(
+        "PublicUserSerializer",
+        PublicUserSerializer,
+        PublicUserValuesSerializer,
+        *user_rows(args.rows),
+        context,
+        args.repeat,
+    )
+
+
+if __name__ == "__main__":
+    main()
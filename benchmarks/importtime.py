@@ -0,0 +1,98 @@
+"""Профиль импорта при запуске веб-процесса и воркера Celery по выводу ``python -X importtime``.
+
+Запуск из корня проекта: python benchmarks/importtime.py --top 30
+Запуск идёт в отдельном интерпретаторе, поэтому замер не зависит от уже загруженных модулей.
+Пиковая резидентная память берётся из /proc/self/status (VmHWM): ru_maxrss в Linux переживает exec
+и показал бы память родительского процесса, если она больше.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import NamedTuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Что загружает процесс при запуске: WSGI-приложение с маршрутами и задачи воркера
+BOOT_CODE = """
+import resource
+from pathlib import Path
+from config.wsgi import application
+import config.urls
+from config.celery import app
+app.loader.import_default_modules()
+status = Path("/proc/self/status")
+if status.exists():
+    print(next(line.split()[1] for line in status.read_text().splitlines() if line.startswith("VmHWM:")))
+else:
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+# SDK, которые загружаются только при обращении к интеграции (см. config.clients)
+LAZY_MODULES = ("stripe", "forex_python")
+
+
+class BootProfile(NamedTuple):
+    """Суммарное время импорта, время по модулям (микросекунды) и пиковая память процесса."""
+
+    total_us: int
+    modules: dict
+    max_rss_mb: float
+
+
+def parse_importtime(output):
+    """Разбирает вывод -X importtime: {модуль: накопленное время}, сумма по модулям верхнего уровня."""
+
+    modules, total = {}, 0
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # заголовок
+        name = name[1:]
+        modules[name.strip()] = int(cumulative)
+        if not name.startswith(" "):
+            total += int(cumulative)
+    return total, modules
+
+
+def profile_boot():
+    """Запускает BOOT_CODE с -X importtime в новом интерпретаторе и возвращает BootProfile."""
+
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": "config.settings"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", BOOT_CODE],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total, modules = parse_importtime(result.stderr)
+    # VmHWM и ru_maxrss в Linux — в килобайтах, ru_maxrss в macOS — в байтах
+    max_rss = int(result.stdout.split()[-1])
+    max_rss_mb = max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+    return BootProfile(total, modules, max_rss_mb)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=30, help="Сколько самых долгих импортов показать")
+    args = parser.parse_args()
+
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    profile = profile_boot()
+    print(f"Импорт при запуске: {profile.total_us / 1000:.0f} мс, пиковая память: {profile.max_rss_mb:.0f} МБ")
+    print(f"{'накопленно, мс':>15}  модуль")
+    for name, cumulative in sorted(profile.modules.items(), key=lambda item: item[1], reverse=True)[: args.top]:
+        print(f"{cumulative / 1000:>15.1f}  {name}")
+    loaded = [name for name in LAZY_MODULES if name in profile.modules]
+    if loaded:
+        print(f"Загружены при запуске, хотя должны загружаться лениво: {', '.join(loaded)}")
+
+
+if __name__ == "__main__":
+    main()
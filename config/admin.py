@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def table_row_estimate(queryset):
+    """Оценка числа строк таблицы модели из статистики PostgreSQL (pg_class.reltuples).
+
+    Возвращает None для других СУБД и для таблиц, по которым ещё не собрана статистика.
+    """
+
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [queryset.model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    return row[0] if row and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, который для списка без фильтров берёт число строк из статистики, а не из COUNT(*).
+
+    Оценка используется только для таблиц не меньше ADMIN_ESTIMATED_COUNT_THRESHOLD строк;
+    для небольших таблиц и отфильтрованных списков число строк считается точно.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where and not queryset.query.distinct:
+            estimate = table_row_estimate(queryset)
+            if estimate is not None and estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    """Список в админке без полных COUNT(*): оценочное число строк и поиск по ID без приведения к тексту."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if term.isdigit():
+            return queryset.filter(pk=int(term)), False
+        return super().get_search_results(request, queryset, term)
@@ -0,0 +1,87 @@
+import math
+import random
+import time
+
+from django.core.cache import cache
+
+# Сколько секунд держится блокировка пересчёта значения
+LOCK_TIMEOUT = 10
+# Как часто ожидающий процесс проверяет, не появилось ли значение
+LOCK_POLL_INTERVAL = 0.05
+
+
+def namespace_version_key(namespace):
+    return f"{namespace}:__version__"
+
+
+def namespace_version(namespace):
+    """Текущая версия пространства ключей; новые пространства начинаются с версии 1."""
+
+    key = namespace_version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def bump_namespace(namespace):
+    """Инвалидирует все ключи пространства, увеличивая его версию."""
+
+    key = namespace_version_key(namespace)
+    cache.add(key, 1, timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Ключ успел истечь или быть вытеснен между add и incr
+        cache.set(key, 2, timeout=None)
+        return 2
+
+
+def cache_key(namespace, *parts, versioned=False):
+    """Ключ вида ``namespace:part:...``; при ``versioned=True`` в него входит версия пространства."""
+
+    prefix = f"{namespace}:v{namespace_version(namespace)}" if versioned else namespace
+    return ":".join([prefix, *map(str, parts)])
+
+
+def get_or_compute(key, compute, timeout, beta=1.0):
+    """Возвращает значение из кеша или вычисляет и сохраняет его, защищаясь от лавины пересчётов.
+
+    Незадолго до истечения значение пересчитывается заранее с вероятностью, растущей к
+    концу срока (probabilistic early expiration, XFetch), поэтому ключ популярного значения
+    не истекает одновременно для всех процессов. Если значения нет, его вычисляет один
+    процесс под блокировкой, остальные ждут результат не дольше LOCK_TIMEOUT секунд.
+    """
+
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires_at = entry
+        if time.time() - delta * beta * math.log(1 - random.random()) < expires_at:
+            return value
+        # Ранний пересчёт: остальные процессы продолжают получать текущее значение
+        if not cache.add(f"{key}:lock", True, timeout=LOCK_TIMEOUT):
+            return value
+        return _compute_and_store(key, compute, timeout)
+
+    if cache.add(f"{key}:lock", True, timeout=LOCK_TIMEOUT):
+        return _compute_and_store(key, compute, timeout)
+
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    return _compute_and_store(key, compute, timeout)
+
+
+def _compute_and_store(key, compute, timeout):
+    try:
+        started = time.time()
+        value = compute()
+        delta = time.time() - started
+        cache.set(key, (value, delta, time.time() + timeout), timeout=timeout)
+        return value
+    finally:
+        cache.delete(f"{key}:lock")
@@ -3,6 +3,11 @@ from __future__ import absolute_import, unicode_literals
 import os
 
 from celery import Celery
+from celery.signals import (before_task_publish, task_failure, task_postrun, task_prerun, task_retry, worker_init,
+                            worker_process_shutdown, worker_ready)
+from django.db import close_old_connections
+
+from config import metrics
 
 # Установка переменной окружения для настроек проекта
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
@@ -15,3 +20,40 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 
 # Автоматическое обнаружение и регистрация задач из файлов tasks.py в приложениях Django
 app.autodiscover_tasks()
+
+
+@task_prerun.connect
+@task_postrun.connect
+def close_stale_db_connections(task=None, **kwargs):
+    """Закрывает сломанные, устаревшие и оставленные в транзакции соединения с базой.
+
+    Рабочие соединения переиспользуются следующими задачами процесса. Задачи, выполняемые
+    синхронно (eager), работают в соединении вызывающего кода и не трогаются.
+    """
+
+    if task is not None and getattr(task.request, "is_eager", False):
+        return
+    close_old_connections()
+
+
+# Метрики задач: ожидание в очереди, время выполнения, повторы и ошибки по имени задачи
+before_task_publish.connect(metrics.stamp_published_at)
+task_prerun.connect(metrics.record_task_start)
+task_postrun.connect(metrics.record_task_duration)
+task_retry.connect(metrics.count_task_retry)
+task_failure.connect(metrics.count_task_failure)
+
+
+@worker_init.connect
+def reset_worker_metrics(**kwargs):
+    metrics.reset_multiprocess_dir()
+
+
+@worker_ready.connect
+def start_worker_metrics_server(**kwargs):
+    metrics.start_worker_metrics_server()
+
+
+@worker_process_shutdown.connect
+def mark_worker_process_dead(pid=None, **kwargs):
+    metrics.mark_process_dead(pid or os.getpid())
@@ -0,0 +1,34 @@
+from functools import cache
+
+from django.conf import settings
+
+
+@cache
+def http_session():
+    """Общая сессия requests процесса с пулом соединений к внешним API.
+
+    requests импортируется при первом внешнем запросе, а не при запуске веб-процесса или воркера.
+    """
+
+    import requests
+
+    return requests.Session()
+
+
+@cache
+def stripe_client():
+    """SDK Stripe с ключом STRIPE_API_KEY; импортируется и настраивается при первом обращении к платежам."""
+
+    import stripe
+
+    stripe.api_key = settings.STRIPE_API_KEY
+    return stripe
+
+
+@cache
+def currency_rates():
+    """Клиент курсов валют forex-python, создаётся при первой конвертации."""
+
+    from forex_python.converter import CurrencyRates
+
+    return CurrencyRates()
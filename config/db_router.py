@@ -0,0 +1,163 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import jwt
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+
+from config.cache import cache_key
+
+PRIMARY = "default"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Проверенное отставание реплик: {alias: (время проверки, реплика пригодна)}
+_replica_health = {}
+# Состояние маршрутизации текущего запроса; вне запросов (Celery, команды) чтение идёт с основной базы
+_routing = ContextVar("db_routing", default=None)
+
+
+class RoutingState:
+    """Куда читать в текущем запросе: на реплику, пока запрос не закреплён за основной базой."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+
+
+def user_pin_key(user_id):
+    return cache_key("db", "pin", user_id)
+
+
+def replica_lag(alias):
+    """Отставание реплики в секундах; 0, если реплика применила всё полученное или это не PostgreSQL."""
+
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+        )
+        lag = cursor.fetchone()[0]
+    return float(lag or 0)
+
+
+def replica_is_healthy(alias):
+    """Реплика доступна и отстаёт не больше DB_REPLICA_MAX_LAG секунд; результат проверки кешируется в процессе."""
+
+    checked_at, healthy = _replica_health.get(alias, (0, False))
+    if time.monotonic() - checked_at < settings.DB_REPLICA_LAG_CHECK_INTERVAL:
+        return healthy
+    try:
+        healthy = replica_lag(alias) <= settings.DB_REPLICA_MAX_LAG
+    except DatabaseError:
+        healthy = False
+    _replica_health[alias] = (time.monotonic(), healthy)
+    return healthy
+
+
+def choose_replica():
+    """Случайная пригодная реплика или None, если читать нужно с основной базы."""
+
+    replicas = [alias for alias in settings.DATABASE_REPLICAS if replica_is_healthy(alias)]
+    return random.choice(replicas) if replicas else None
+
+
+def in_transaction():
+    """Открыта ли транзакция на основной базе; внешние транзакции TestCase не учитываются, как в Django."""
+
+    return any(not block._from_testcase for block in connections[PRIMARY].atomic_blocks)
+
+
+@contextmanager
+def routing(pinned=False):
+    """Включает чтение с реплик в блоке; ``pinned=True`` оставляет все запросы на основной базе."""
+
+    token = _routing.set(RoutingState(pinned))
+    try:
+        yield _routing.get()
+    finally:
+        _routing.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """Запись и миграции — на основную базу, безопасное чтение в запросе — на реплики из DATABASE_REPLICAS.
+
+    Чтение остаётся на основной базе вне HTTP-запросов, внутри транзакции, после записи в том же
+    запросе и в окне read-your-writes после изменения (см. ReplicaRoutingMiddleware).
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or state.pinned or not settings.DATABASE_REPLICAS:
+            return PRIMARY
+        if in_transaction():
+            return PRIMARY
+        return choose_replica() or PRIMARY
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.pinned = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+def token_user_id(request):
+    """ID пользователя из access-токена без проверки подписи.
+
+    Используется только для выбора базы: поддельный токен может лишь закрепить запрос за основной базой.
+    """
+
+    header = request.headers.get("Authorization", "")
+    if not header.startswith("Bearer "):
+        return None
+    try:
+        claims = jwt.decode(header[len("Bearer ") :], options={"verify_signature": False})
+    except jwt.InvalidTokenError:
+        return None
+    return claims.get(settings.SIMPLE_JWT.get("USER_ID_CLAIM", "user_id"))
+
+
+class ReplicaRoutingMiddleware:
+    """Закрепляет за основной базой изменяющие запросы и следующие за ними DB_PIN_SECONDS секунд.
+
+    Окно read-your-writes отмечается cookie DB_PIN_COOKIE для браузеров и ключом в кеше для
+    пользователя из JWT, поэтому клиент сразу читает собственные изменения.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        unsafe = request.method not in SAFE_METHODS
+        user_id = token_user_id(request)
+        pinned = (
+            unsafe
+            or settings.DB_PIN_COOKIE in request.COOKIES
+            or (user_id is not None and cache.get(user_pin_key(user_id)) is not None)
+        )
+        with routing(pinned) as state:
+            response = self.get_response(request)
+
+        if unsafe or (state.pinned and not pinned):
+            response.set_cookie(settings.DB_PIN_COOKIE, "1", max_age=settings.DB_PIN_SECONDS, httponly=True)
+            user = getattr(request, "user", None)
+            user_id = user.pk if user is not None and user.is_authenticated else user_id
+            if user_id is not None:
+                cache.set(user_pin_key(user_id), True, timeout=settings.DB_PIN_SECONDS)
+        return response
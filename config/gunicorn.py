@@ -0,0 +1,27 @@
+"""Настройки gunicorn: gunicorn -c config/gunicorn.py config.wsgi:application"""
+
+import os
+import shutil
+
+# Метрики Prometheus процессов-воркеров пишутся в общий каталог и суммируются при выгрузке /metrics.
+# Переменная задаётся до загрузки приложения, иначе prometheus_client выберет хранение в памяти процесса
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus-web")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", 1))
+
+
+def on_starting(server):
+    """Очищает метрики прошлого запуска."""
+
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """Убирает из выгрузки показатели завершившегося воркера, которые не суммируются (gauge live)."""
+
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
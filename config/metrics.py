@@ -0,0 +1,178 @@
+import hmac
+import os
+import shutil
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+
+import prometheus_client
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db import connections
+from django.http import Http404, HttpResponse
+from prometheus_client import multiprocess
+
+# Границы корзин числа SQL-запросов на HTTP-запрос
+DB_QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+# Ожидание в очереди и выполнение задач: от миллисекунд до десятков минут
+TASK_TIME_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 1800)
+
+HTTP_REQUEST_DURATION = prometheus_client.Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса", ("method", "route", "status")
+)
+HTTP_REQUEST_DB_QUERIES = prometheus_client.Histogram(
+    "http_request_db_queries",
+    "Число SQL-запросов на HTTP-запрос",
+    ("method", "route"),
+    buckets=DB_QUERY_BUCKETS,
+)
+CELERY_TASK_DURATION = prometheus_client.Histogram(
+    "celery_task_duration_seconds",
+    "Время выполнения задачи",
+    ("task", "state"),
+    buckets=TASK_TIME_BUCKETS,
+)
+CELERY_TASK_QUEUE_WAIT = prometheus_client.Histogram(
+    "celery_task_queue_wait_seconds",
+    "Время от публикации (или ETA) задачи до начала выполнения",
+    ("task",),
+    buckets=TASK_TIME_BUCKETS,
+)
+CELERY_TASK_RETRIES = prometheus_client.Counter("celery_task_retries", "Повторы задач", ("task",))
+CELERY_TASK_FAILURES = prometheus_client.Counter("celery_task_failures", "Задачи, завершившиеся ошибкой", ("task",))
+NOTIFICATIONS_SENT = prometheus_client.Counter("notifications_sent", "Отправленные уведомления", ("channel",))
+STRIPE_CALLS = prometheus_client.Counter("stripe_calls", "Запросы к Stripe API", ("operation", "outcome"))
+FX_LOOKUPS = prometheus_client.Counter("fx_lookups", "Запросы курса валют к внешнему сервису", ("pair", "outcome"))
+
+
+@contextmanager
+def count_call(counter, **labels):
+    """Считает вызов внешнего API в ``counter`` с меткой outcome: ok или error."""
+
+    try:
+        yield
+    except Exception:
+        counter.labels(outcome="error", **labels).inc()
+        raise
+    counter.labels(outcome="ok", **labels).inc()
+
+
+def metrics_enabled():
+    return settings.METRICS_ENABLED
+
+
+def metrics_registry():
+    """Реестр для выгрузки: сумма по всем процессам из PROMETHEUS_MULTIPROC_DIR или метрики текущего процесса."""
+
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return prometheus_client.REGISTRY
+
+
+def reset_multiprocess_dir():
+    """Очищает PROMETHEUS_MULTIPROC_DIR при запуске главного процесса: файлы прошлого запуска иначе суммируются."""
+
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def mark_process_dead(pid):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
+
+
+def metrics_view(request):
+    """Метрики в текстовом формате Prometheus; снаружи закрыто в nginx, при METRICS_TOKEN — ещё и токеном."""
+
+    if not metrics_enabled():
+        raise Http404
+    if settings.METRICS_TOKEN and not hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        raise PermissionDenied
+    return HttpResponse(
+        prometheus_client.generate_latest(metrics_registry()), content_type=prometheus_client.CONTENT_TYPE_LATEST
+    )
+
+
+class MetricsMiddleware:
+    """Время обработки и число SQL-запросов по маршрутам (шаблон URL, а не конкретный путь)."""
+
+    def __init__(self, get_response):
+        if not metrics_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_query))
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        route = match.route if match is not None else "unmatched"
+        HTTP_REQUEST_DURATION.labels(request.method, route, response.status_code).observe(
+            time.perf_counter() - started
+        )
+        HTTP_REQUEST_DB_QUERIES.labels(request.method, route).observe(queries)
+        return response
+
+
+# Время начала задач текущего процесса: {task_id: perf_counter()}
+_task_started = {}
+
+
+def stamp_published_at(headers=None, **kwargs):
+    """before_task_publish: время публикации в заголовках сообщения для расчёта ожидания в очереди."""
+
+    if headers is not None:
+        headers.setdefault("published_at", time.time())
+
+
+def record_task_start(task_id=None, task=None, **kwargs):
+    """task_prerun: запоминает начало задачи и записывает, сколько она ждала в очереди."""
+
+    _task_started[task_id] = time.perf_counter()
+    request = task.request
+    published_at = getattr(request, "published_at", None)
+    if published_at is None or request.is_eager:
+        return
+    ready_at = float(published_at)
+    if request.eta:
+        ready_at = max(ready_at, datetime.fromisoformat(request.eta).timestamp())
+    CELERY_TASK_QUEUE_WAIT.labels(task.name).observe(max(0.0, time.time() - ready_at))
+
+
+def record_task_duration(task_id=None, task=None, state=None, **kwargs):
+    """task_postrun: время выполнения задачи по имени и итоговому состоянию."""
+
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        CELERY_TASK_DURATION.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - started)
+
+
+def count_task_retry(sender=None, **kwargs):
+    CELERY_TASK_RETRIES.labels(sender.name).inc()
+
+
+def count_task_failure(sender=None, **kwargs):
+    CELERY_TASK_FAILURES.labels(sender.name).inc()
+
+
+def start_worker_metrics_server(**kwargs):
+    """worker_ready: HTTP-сервер метрик воркера Celery на METRICS_CELERY_PORT."""
+
+    if metrics_enabled() and settings.METRICS_CELERY_PORT:
+        prometheus_client.start_http_server(settings.METRICS_CELERY_PORT, registry=metrics_registry())
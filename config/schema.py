@@ -0,0 +1,98 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+from drf_spectacular.views import SpectacularAPIView
+
+SCHEMA_RENDERERS = {"yaml": OpenApiYamlRenderer, "json": OpenApiJsonRenderer}
+
+# Готовая схема в процессе: {формат: (тело, ETag)}
+_schemas = {}
+
+
+def generate_schema():
+    """Схема OpenAPI всего API, как её строит SpectacularAPIView для анонимного запроса."""
+
+    return spectacular_settings.DEFAULT_GENERATOR_CLASS().get_schema(request=None, public=True)
+
+
+def render_schema(schema, schema_format):
+    return SCHEMA_RENDERERS[schema_format]().render(schema, renderer_context={})
+
+
+def schema_path(schema_format):
+    return Path(settings.API_SCHEMA_ROOT) / f"openapi.{schema_format}"
+
+
+def schema_etag(body):
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def _write(path, body):
+    """Записывает файл атомарно: процессы, читающие схему, не видят его недописанным."""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(body)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def build_schema_files():
+    """Генерирует схему и сохраняет её во всех форматах в API_SCHEMA_ROOT; возвращает пути файлов."""
+
+    schema = generate_schema()
+    paths = []
+    for schema_format in SCHEMA_RENDERERS:
+        body = render_schema(schema, schema_format)
+        _write(schema_path(schema_format), body)
+        _schemas[schema_format] = (body, schema_etag(body))
+        paths.append(schema_path(schema_format))
+    return paths
+
+
+def cached_schema(schema_format):
+    """Тело схемы и его ETag: из памяти процесса, затем из файла, иначе схема генерируется и сохраняется."""
+
+    if schema_format not in _schemas:
+        path = schema_path(schema_format)
+        if not path.exists():
+            build_schema_files()
+        else:
+            body = path.read_bytes()
+            _schemas[schema_format] = (body, schema_etag(body))
+    return _schemas[schema_format]
+
+
+class CachedSchemaView(SpectacularAPIView):
+    """SpectacularAPIView, отдающий заранее сгенерированную схему с ETag.
+
+    Схема строится командой build_api_schema при развёртывании или первым запросом и не
+    пересобирается на каждый запрос Swagger UI и Redoc. Без API_SCHEMA_CACHE, а также для
+    запросов с версией или языком работает как SpectacularAPIView.
+    """
+
+    def _get_schema_response(self, request):
+        if not settings.API_SCHEMA_CACHE or request.GET.get("version") or request.GET.get("lang"):
+            return super()._get_schema_response(request)
+
+        body, etag = cached_schema(request.accepted_renderer.format)
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type=request.accepted_media_type)
+            response["Content-Disposition"] = f'inline; filename="{self._get_filename(request, None)}"'
+        response["ETag"] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
@@ -1,10 +1,14 @@
 import os
 import sys
+from copy import deepcopy
 from datetime import timedelta
+from importlib.util import find_spec
 from pathlib import Path
 
 from celery.schedules import crontab
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
+from kombu import Queue
 
 load_dotenv(override=True)
 
@@ -36,7 +40,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "config.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "config.db_router.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -65,31 +71,122 @@ TEMPLATES = [
 WSGI_APPLICATION = "config.wsgi.application"
 
 
+# JSON API на orjson (если установлен), иначе стандартный json
+API_FAST_JSON = os.getenv("API_FAST_JSON", "True") == "True"
+
 REST_FRAMEWORK = {
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
+    "DEFAULT_RENDERER_CLASSES": [
+        "config.renderers.FastJSONRenderer" if API_FAST_JSON else "rest_framework.renderers.JSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "config.renderers.FastJSONParser" if API_FAST_JSON else "rest_framework.parsers.JSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.StatelessJWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    # Корзины токенов (config.throttling): лимит "<область>.<роль>" или "<область>", роли anon, user, moderator
+    "DEFAULT_THROTTLE_CLASSES": ["config.throttling.TokenBucketThrottle"],
+    "DEFAULT_THROTTLE_RATES": {
+        "login_ip": os.getenv("LOGIN_THROTTLE_IP_RATE", "20/min"),
+        "login_account": os.getenv("LOGIN_THROTTLE_ACCOUNT_RATE", "5/min"),
+        "api.anon": os.getenv("THROTTLE_ANON_RATE", "60/min"),
+        "api.user": os.getenv("THROTTLE_USER_RATE", "600/min"),
+        "api.moderator": os.getenv("THROTTLE_MODERATOR_RATE", "1200/min"),
+        "register": os.getenv("THROTTLE_REGISTER_RATE", "10/hour"),
+        "subscription.user": os.getenv("THROTTLE_SUBSCRIPTION_RATE", "30/min"),
+        "subscription.moderator": "120/min",
+        "payment": os.getenv("THROTTLE_PAYMENT_RATE", "10/min"),
+        "media": os.getenv("THROTTLE_MEDIA_RATE", "300/min"),
+        "media.anon": os.getenv("THROTTLE_MEDIA_ANON_RATE", "60/min"),
+    },
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
 
+# Соединения с PostgreSQL. По умолчанию каждый процесс держит постоянное соединение
+# (DB_CONN_MAX_AGE секунд) с проверкой перед повторным использованием. DB_POOL=True включает
+# пул соединений Django на процесс (нужен psycopg 3 с psycopg_pool). DB_PGBOUNCER=True
+# готовит соединения к работе через pgbouncer в режиме transaction pooling
+DB_POOL = os.getenv("DB_POOL", "False") == "True"
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "False") == "True"
+# Django выбирает psycopg 3, если он установлен, иначе psycopg2
+DB_PSYCOPG3 = bool(find_spec("psycopg"))
+if DB_POOL and not (DB_PSYCOPG3 and find_spec("psycopg_pool")):
+    raise ImproperlyConfigured('DB_POOL=True requires "psycopg[binary,pool]"')
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql_psycopg2",
+        "ENGINE": "django.db.backends.postgresql",
         "NAME": os.getenv("POSTGRES_DB"),
         "USER": os.getenv("POSTGRES_USER"),
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
         "HOST": os.getenv("POSTGRES_HOST", "localhost"),
         "PORT": os.getenv("POSTGRES_PORT", default="5432"),
+        # С пулом соединения возвращаются в пул после каждого запроса
+        "CONN_MAX_AGE": 0 if DB_POOL else int(os.getenv("DB_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": True,
+        # Серверные курсоры не переживают смену соединения в pgbouncer
+        "DISABLE_SERVER_SIDE_CURSORS": DB_PGBOUNCER,
         "OPTIONS": {
             "client_encoding": "UTF8",
         },
     }
 }
-
+if DB_POOL:
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(os.getenv("DB_POOL_MIN_SIZE", 1)),
+        "max_size": int(os.getenv("DB_POOL_MAX_SIZE", 4)),
+        "timeout": int(os.getenv("DB_POOL_TIMEOUT", 10)),
+    }
+if DB_PGBOUNCER and DB_PSYCOPG3:
+    # Подготовленные запросы psycopg 3 привязаны к серверному соединению;
+    # psycopg2 подготовленных запросов не использует, для него отключать нечего
+    DATABASES["default"]["OPTIONS"]["prepare_threshold"] = None
+
+# Реплики только для чтения: DB_REPLICA_HOSTS=host1,host2 (остальные параметры как у основной базы).
+# Безопасное чтение в HTTP-запросах идёт на реплики, отстающие не больше DB_REPLICA_MAX_LAG секунд;
+# после изменения клиент DB_PIN_SECONDS секунд читает с основной базы
+DATABASE_REPLICAS = []
+for number, host in enumerate(filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(",")), start=1):
+    DATABASES[f"replica_{number}"] = {
+        **deepcopy(DATABASES["default"]),
+        "HOST": host.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica_{number}")
+DATABASE_ROUTERS = ["config.db_router.PrimaryReplicaRouter"]
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", 5))
+DB_REPLICA_LAG_CHECK_INTERVAL = 5
+DB_PIN_SECONDS = int(os.getenv("DB_PIN_SECONDS", 5))
+DB_PIN_COOKIE = "db_pin"
+
+
+# Алгоритм хеширования паролей: argon2, bcrypt (нужен пакет django[argon2] или django[bcrypt])
+# или pbkdf2. Пароли со старым алгоритмом перехешируются при следующем входе
+PASSWORD_HASHER = os.getenv("PASSWORD_HASHER", "pbkdf2")
+PASSWORD_HASHERS = [
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+PREFERRED_PASSWORD_HASHERS = {
+    "argon2": ("argon2", "django.contrib.auth.hashers.Argon2PasswordHasher"),
+    "bcrypt": ("bcrypt", "django.contrib.auth.hashers.BCryptSHA256PasswordHasher"),
+}
+if PASSWORD_HASHER in PREFERRED_PASSWORD_HASHERS:
+    module, hasher = PREFERRED_PASSWORD_HASHERS[PASSWORD_HASHER]
+    if not find_spec(module):
+        raise ImproperlyConfigured(f'PASSWORD_HASHER={PASSWORD_HASHER} requires "django[{PASSWORD_HASHER}]"')
+    PASSWORD_HASHERS.remove(hasher)
+    PASSWORD_HASHERS.insert(0, hasher)
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -123,6 +220,66 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Уменьшенные копии превью и аватаров: имя -> максимальный размер (ширина, высота)
+IMAGE_RENDITIONS = {
+    "thumb": (320, 180),
+    "card": (960, 540),
+}
+IMAGE_RENDITION_FORMAT = os.getenv("IMAGE_RENDITION_FORMAT", "WEBP")  # WEBP или JPEG
+IMAGE_RENDITION_QUALITY = int(os.getenv("IMAGE_RENDITION_QUALITY", 80))
+IMAGE_RENDITIONS_DIR = "renditions"
+
+# Файлы из MEDIA_ROOT отдаются через /media/ после проверки доступа: Django отвечает заголовком
+# X-Accel-Redirect с путём во внутреннем location nginx MEDIA_ACCEL_PREFIX, файл отдаёт nginx.
+# Без MEDIA_ACCEL_REDIRECT (по умолчанию при DEBUG) файл отдаёт сам Django. Владельцы файлов и
+# доступные пользователю курсы и уроки кешируются на MEDIA_ENTITLEMENT_CACHE_TTL секунд
+MEDIA_ACCEL_REDIRECT = os.getenv("MEDIA_ACCEL_REDIRECT", str(not DEBUG)) == "True"
+MEDIA_ACCEL_PREFIX = os.getenv("MEDIA_ACCEL_PREFIX", "/protected-media/")
+MEDIA_ENTITLEMENT_CACHE_TTL = int(os.getenv("MEDIA_ENTITLEMENT_CACHE_TTL", 300))
+
+# Снимок каталога курсов для полной синхронизации клиентов: gzip NDJSON в CATALOGUE_SNAPSHOT_ROOT,
+# который отдаёт nginx по CATALOGUE_SNAPSHOT_URL. Пересобирается раз в CATALOGUE_SNAPSHOT_INTERVAL минут,
+# если каталог изменился
+CATALOGUE_SNAPSHOT_ROOT = os.getenv("CATALOGUE_SNAPSHOT_ROOT", BASE_DIR / "snapshots")
+CATALOGUE_SNAPSHOT_URL = "/snapshots/"
+CATALOGUE_SNAPSHOT_INTERVAL = int(os.getenv("CATALOGUE_SNAPSHOT_INTERVAL", 15))
+CATALOGUE_SNAPSHOT_CHUNK_SIZE = 500
+CATALOGUE_SNAPSHOT_KEEP = 3
+# Изменения каталога: не больше CATALOGUE_CHANGES_LIMIT курсов за ответ, запас по времени в секундах
+CATALOGUE_CHANGES_LIMIT = int(os.getenv("CATALOGUE_CHANGES_LIMIT", 500))
+CATALOGUE_CHANGES_OVERLAP = 60
+
+# Инкрементальная синхронизация: не больше SYNC_CHANGES_LIMIT объектов каждого вида за ответ,
+# токен отстаёт от текущего времени на SYNC_CHANGES_OVERLAP секунд, записи об удалениях
+# хранятся SYNC_TOMBSTONE_RETENTION_DAYS дней
+SYNC_CHANGES_LIMIT = int(os.getenv("SYNC_CHANGES_LIMIT", 500))
+SYNC_CHANGES_OVERLAP = int(os.getenv("SYNC_CHANGES_OVERLAP", 30))
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", 30))
+
+# Отметки прогресса по урокам копятся в буфере (Redis-хеши) и переносятся в базу через
+# LESSON_PROGRESS_FLUSH_DELAY секунд после отметки, по LESSON_PROGRESS_FLUSH_BATCH_SIZE пар пользователь–курс за запуск
+LESSON_PROGRESS_FLUSH_DELAY = int(os.getenv("LESSON_PROGRESS_FLUSH_DELAY", 10))
+LESSON_PROGRESS_FLUSH_BATCH_SIZE = int(os.getenv("LESSON_PROGRESS_FLUSH_BATCH_SIZE", 500))
+
+# Перебалансировка рангов уроков курса запускается не чаще раза в LESSON_REBALANCE_DELAY секунд
+LESSON_REBALANCE_DELAY = int(os.getenv("LESSON_REBALANCE_DELAY", 60))
+
+# Метаданные видео уроков: провайдер, размер пачки и срок, после которого данные перепроверяются.
+# С YOUTUBE_API_KEY по умолчанию используется YouTube Data API, без него заглушка — только при DEBUG;
+# иначе задачи загрузки метаданных завершаются ошибкой ImproperlyConfigured
+YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
+if YOUTUBE_API_KEY:
+    DEFAULT_VIDEO_METADATA_PROVIDER = "materials.video.YouTubeVideoProvider"
+elif DEBUG:
+    DEFAULT_VIDEO_METADATA_PROVIDER = "materials.video.StubVideoProvider"
+else:
+    DEFAULT_VIDEO_METADATA_PROVIDER = ""
+VIDEO_METADATA_PROVIDER = os.getenv("VIDEO_METADATA_PROVIDER", DEFAULT_VIDEO_METADATA_PROVIDER)
+VIDEO_METADATA_BATCH_SIZE = int(os.getenv("VIDEO_METADATA_BATCH_SIZE", 50))
+VIDEO_METADATA_DELAY = int(os.getenv("VIDEO_METADATA_DELAY", 10))
+VIDEO_METADATA_TTL_HOURS = int(os.getenv("VIDEO_METADATA_TTL_HOURS", 24))
+VIDEO_METADATA_TIMEOUT = 10
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "users.User"
@@ -130,8 +287,20 @@ AUTH_USER_MODEL = "users.User"
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=15),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
+    # last_login нужен для деактивации неактивных пользователей
+    "UPDATE_LAST_LOGIN": True,
+    # Claims роли и версии токенов для StatelessJWTAuthentication
+    "TOKEN_OBTAIN_SERIALIZER": "users.serializers.UserTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "users.serializers.UserTokenRefreshSerializer",
 }
 
+# Сколько секунд кешируется версия токенов пользователя: столько может работать отозванный access-токен
+AUTH_TOKEN_VERSION_CACHE_TTL = int(os.getenv("AUTH_TOKEN_VERSION_CACHE_TTL", 60))
+
+# Неизвестные и неактивные учётные записи отклоняются без загрузки пользователя; пароль при этом
+# сверяется с хешем случайного пароля, чтобы неудачный вход всегда стоил одного хеширования
+LOGIN_EARLY_REJECT = os.getenv("LOGIN_EARLY_REJECT", "True") == "True"
+
 
 SPECTACULAR_SETTINGS = {
     "TITLE": "CourseStream API",
@@ -140,6 +309,19 @@ SPECTACULAR_SETTINGS = {
     "SERVE_INCLUDE_SCHEMA": False,
 }
 
+# Схема OpenAPI генерируется один раз за развёртывание (manage.py build_api_schema или первый запрос),
+# хранится в памяти процесса и в API_SCHEMA_ROOT и отдаётся с ETag. При DEBUG по умолчанию строится заново
+API_SCHEMA_CACHE = os.getenv("API_SCHEMA_CACHE", str(not DEBUG)) == "True"
+API_SCHEMA_ROOT = os.getenv("API_SCHEMA_ROOT", BASE_DIR / "schema")
+
+# Метрики Prometheus: /metrics веб-процесса и HTTP-сервер воркера Celery
+# на METRICS_CELERY_PORT (0 — не запускать). Метрики нескольких процессов gunicorn и Celery суммируются
+# через каталог из переменной окружения PROMETHEUS_MULTIPROC_DIR
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True") == "True"
+# Токен для /metrics: Prometheus передаёт его в заголовке Authorization: Bearer; пустой — без проверки
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_CELERY_PORT = int(os.getenv("METRICS_CELERY_PORT", 9808))
+
 STRIPE_API_KEY = os.getenv("STRIPE_API_KEY")
 
 # Настройки для Celery
@@ -159,10 +341,61 @@ CELERY_TASK_TRACK_STARTED = True
 # Максимальное время на выполнение задачи
 CELERY_TASK_TIME_LIMIT = 30 * 60
 
+# Соединения с базой не закрываются после каждой задачи: устаревшие и сломанные закрывает
+# обработчик в config/celery.py по правилам DB_CONN_MAX_AGE, как у веб-запросов
+CELERY_DB_REUSE_MAX = int(os.getenv("CELERY_DB_REUSE_MAX", 1000))
+
+# Outbox событий обновления курсов: задержка разбора после изменения (секунды), размер пачки,
+# период страховочного запуска на случай потерянных задач и срок хранения обработанных событий (дни)
+OUTBOX_DISPATCH_DELAY = int(os.getenv("OUTBOX_DISPATCH_DELAY", 10))
+OUTBOX_DISPATCH_BATCH_SIZE = int(os.getenv("OUTBOX_DISPATCH_BATCH_SIZE", 500))
+OUTBOX_SWEEP_INTERVAL = int(os.getenv("OUTBOX_SWEEP_INTERVAL", 15 * 60))
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", 7))
+
+# Не чаще одного уведомления по курсу за интервал
+COURSE_NOTIFICATION_INTERVAL = timedelta(hours=int(os.getenv("COURSE_NOTIFICATION_INTERVAL_HOURS", 4)))
+
+# Дайджест уведомлений: обновления курсов копятся и отправляются одним сообщением на пользователя
+# раз в окно (минуты). Интервал COURSE_NOTIFICATION_INTERVAL по курсу при этом сохраняется
+COURSE_NOTIFICATION_DIGEST = os.getenv("COURSE_NOTIFICATION_DIGEST", "False") == "True"
+COURSE_NOTIFICATION_DIGEST_WINDOW = int(os.getenv("COURSE_NOTIFICATION_DIGEST_WINDOW", 30))
+
+# Рассылка обходит подписчиков пачками; журнал доставки хранится NOTIFICATION_DELIVERY_RETENTION_DAYS дней
+NOTIFICATION_CHUNK_SIZE = int(os.getenv("NOTIFICATION_CHUNK_SIZE", 500))
+NOTIFICATION_DELIVERY_RETENTION_DAYS = int(os.getenv("NOTIFICATION_DELIVERY_RETENTION_DAYS", 30))
+
 CELERY_BEAT_SCHEDULE = {
-    "check-course-notifications-every-half_an_hour": {
-        "task": "materials.tasks.four_hours_notification",
-        "schedule": timedelta(minutes=30),
+    "sweep-course-update-events": {
+        "task": "materials.tasks.dispatch_course_update_events",
+        "schedule": timedelta(seconds=OUTBOX_SWEEP_INTERVAL),
+    },
+    "flush-notification-digests": {
+        "task": "materials.tasks.flush_notification_digests",
+        "schedule": timedelta(minutes=COURSE_NOTIFICATION_DIGEST_WINDOW),
+    },
+    "export-catalogue-snapshot": {
+        "task": "materials.tasks.export_catalogue_snapshot",
+        "schedule": timedelta(minutes=CATALOGUE_SNAPSHOT_INTERVAL),
+    },
+    "prune-course-update-events": {
+        "task": "materials.tasks.prune_course_update_events",
+        "schedule": crontab(hour=3, minute=15),
+    },
+    "prune-notification-deliveries": {
+        "task": "materials.tasks.prune_notification_deliveries",
+        "schedule": crontab(hour=3, minute=30),
+    },
+    "flush-lesson-progress": {
+        "task": "materials.tasks.flush_lesson_progress",
+        "schedule": timedelta(minutes=5),
+    },
+    "prune-tombstones": {
+        "task": "materials.tasks.prune_tombstones",
+        "schedule": crontab(hour=3, minute=45),
+    },
+    "refresh-video-metadata": {
+        "task": "materials.tasks.refresh_video_metadata",
+        "schedule": crontab(hour=4, minute=0),
     },
     "deactivate_inactive_users": {
         "task": "users.tasks.deactivate_inactive_users",
@@ -171,6 +404,77 @@ CELERY_BEAT_SCHEDULE = {
     },
 }
 
+# Очереди Celery: каждый класс задач обслуживается своими воркерами (см. docker-compose.yml),
+# поэтому рассылка уведомлений не задерживает обслуживание и остальные задачи
+CELERY_TASK_DEFAULT_QUEUE = "default"
+CELERY_TASK_QUEUES = (
+    Queue("default"),
+    Queue("notifications"),
+    Queue("maintenance"),
+)
+# Приоритет внутри очереди: в Redis задачи с меньшим числом выполняются раньше
+CELERY_TASK_DEFAULT_PRIORITY = 5
+CELERY_TASK_ROUTES = {
+    "materials.tasks.dispatch_course_update_events": {"queue": "notifications", "priority": 2},
+    "materials.tasks.four_hours_notification": {"queue": "notifications", "priority": 2},
+    "materials.tasks.send_information_about_course_update": {"queue": "notifications", "priority": 6},
+    "materials.tasks.flush_notification_digests": {"queue": "notifications", "priority": 6},
+    "users.tasks.deactivate_inactive_users": {"queue": "maintenance"},
+    "materials.tasks.ingest_video_metadata": {"queue": "maintenance"},
+    "materials.tasks.prune_notification_deliveries": {"queue": "maintenance"},
+    "materials.tasks.prune_course_update_events": {"queue": "maintenance"},
+    "materials.tasks.export_catalogue_snapshot": {"queue": "maintenance"},
+    "materials.tasks.prune_tombstones": {"queue": "maintenance"},
+    "materials.tasks.rebalance_course_lessons": {"queue": "maintenance"},
+    "materials.tasks.refresh_video_metadata": {"queue": "maintenance", "priority": 8},
+    "materials.tasks.generate_image_renditions": {"queue": "default"},
+}
+# Самый далёкий countdown, с которым ставятся задачи: отложенный разбор outbox планируется не дальше
+# OUTBOX_SWEEP_INTERVAL, остальные задачи откладываются на свои задержки в секундах
+CELERY_MAX_COUNTDOWN = max(
+    OUTBOX_DISPATCH_DELAY,
+    OUTBOX_SWEEP_INTERVAL,
+    LESSON_PROGRESS_FLUSH_DELAY,
+    LESSON_REBALANCE_DELAY,
+    VIDEO_METADATA_DELAY,
+)
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    "queue_order_strategy": "priority",
+    "priority_steps": list(range(10)),
+    "sep": ":",
+    # Неподтверждённая задача возвращается в очередь по истечении visibility_timeout. Он должен
+    # быть больше самой долгой задачи и самого далёкого countdown/eta, иначе задача выполнится дважды
+    "visibility_timeout": max(CELERY_TASK_TIME_LIMIT, CELERY_MAX_COUNTDOWN) + 10 * 60,
+}
+# Воркер резервирует по одной задаче на процесс: длинные задачи не держат за собой очередь.
+# Воркеры коротких задач могут увеличить значение через --prefetch-multiplier
+CELERY_WORKER_PREFETCH_MULTIPLIER = int(os.getenv("CELERY_WORKER_PREFETCH_MULTIPLIER", 1))
+# Лимиты времени по типам задач; acks_late — только для идемпотентных задач, которые
+# безопасно выполнить повторно после падения воркера
+CELERY_TASK_ANNOTATIONS = {
+    "materials.tasks.dispatch_course_update_events": {
+        "soft_time_limit": 4 * 60,
+        "time_limit": 5 * 60,
+        "acks_late": True,
+    },
+    # Одна пачка рассылки; повторный запуск пропускает уже доставленные сообщения (NotificationDelivery)
+    "materials.tasks.send_information_about_course_update": {
+        "soft_time_limit": 5 * 60,
+        "time_limit": 6 * 60,
+        "acks_late": True,
+    },
+    "materials.tasks.flush_notification_digests": {"soft_time_limit": 25 * 60, "time_limit": 30 * 60},
+    "materials.tasks.generate_image_renditions": {"soft_time_limit": 60, "time_limit": 2 * 60, "acks_late": True},
+    "materials.tasks.ingest_video_metadata": {"soft_time_limit": 2 * 60, "time_limit": 3 * 60, "acks_late": True},
+    "materials.tasks.refresh_video_metadata": {"soft_time_limit": 2 * 60, "time_limit": 3 * 60, "acks_late": True},
+    "users.tasks.deactivate_inactive_users": {"soft_time_limit": 55 * 60, "time_limit": 60 * 60, "acks_late": True},
+}
+
+# Деактивация неактивных пользователей: срок неактивности, размер пакета (диапазон ID) и пауза между пакетами
+USER_INACTIVITY_DAYS = int(os.getenv("USER_INACTIVITY_DAYS", 30))
+USER_DEACTIVATION_BATCH_SIZE = int(os.getenv("USER_DEACTIVATION_BATCH_SIZE", 1000))
+USER_DEACTIVATION_BATCH_SLEEP = float(os.getenv("USER_DEACTIVATION_BATCH_SLEEP", 0.1))
+
 
 # для отправки реальных сообщений
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
@@ -193,19 +497,45 @@ TELEGRAM_URL = "https://api.telegram.org/bot"
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 
 
-# CACHE_ENABLED = True
-# if CACHE_ENABLED:
-#     CACHES = {
-#         "default": {
-#             "BACKEND": "django.core.cache.backends.redis.RedisCache",
-#             "LOCATION": os.getenv("LOCATION"),
-#         }
-#     }
+# Общий кеш веб-процессов и воркеров Celery (throttling, отзыв токенов, курсы валют).
+# Без LOCATION (например, redis://redis:6379/1) используется кеш в памяти процесса
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "coursestream")
+if os.getenv("LOCATION"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("LOCATION"),
+            "KEY_PREFIX": CACHE_KEY_PREFIX,
+            "TIMEOUT": int(os.getenv("CACHE_TIMEOUT", 300)),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "KEY_PREFIX": CACHE_KEY_PREFIX,
+        }
+    }
+
+# Списки в админке для таблиц от ADMIN_ESTIMATED_COUNT_THRESHOLD строк показывают оценочное
+# число строк из статистики PostgreSQL вместо COUNT(*)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(os.getenv("ADMIN_ESTIMATED_COUNT_THRESHOLD", 100_000))
+
+# Сколько секунд кешируется курс валют
+FX_RATE_CACHE_TTL = int(os.getenv("FX_RATE_CACHE_TTL", 60 * 60))
 
 if "test" in sys.argv:
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db.sqlite3",
-        }
+        },
+        # Реплика для тестов маршрутизации; включается через override_settings(DATABASE_REPLICAS=["replica"])
+        "replica": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+            "TEST": {"MIRROR": "default"},
+        },
     }
+    DATABASE_REPLICAS = []
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
@@ -0,0 +1,489 @@
+import datetime
+import json
+import shutil
+import tempfile
+import time
+import uuid
+from decimal import Decimal
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from benchmarks.importtime import LAZY_MODULES, parse_importtime, profile_boot
+from config import db_router, metrics, schema
+from config.admin import EstimatedCountPaginator, table_row_estimate
+from config.cache import bump_namespace, cache_key, get_or_compute
+from config.celery import app, close_stale_db_connections
+from config.renderers import FastJSONParser, FastJSONRenderer
+from config.throttling import parse_rate, take_token
+from materials.models import Course, Subscription
+from users.models import User
+
+
+class FastJSONTestCase(SimpleTestCase):
+    """Тесты JSON-рендерера и парсера на orjson."""
+
+    def test_renderer_matches_drf_json_renderer(self):
+        """Вывод совпадает со стандартным JSONRenderer для типов, которые отдаёт DRF."""
+
+        data = {
+            "amount": Decimal("10.50"),
+            "paid_at": datetime.datetime(2025, 12, 1, 10, 0, 0, 123456, tzinfo=datetime.timezone.utc),
+            "date": datetime.date(2025, 12, 1),
+            "time": datetime.time(10, 30),
+            "title": gettext_lazy("Курс"),
+            "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+            "items": [{"id": 1, "name": "Python\u2028"}],
+            1: None,
+        }
+
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_renderer_falls_back_for_indent(self):
+        """Запрошенные отступы обрабатываются стандартным JSONRenderer."""
+
+        media_type = "application/json; indent=4"
+        data = {"id": 1}
+        self.assertEqual(FastJSONRenderer().render(data, media_type), JSONRenderer().render(data, media_type))
+
+    def test_parser(self):
+        """Парсер читает JSON и сообщает об ошибке разбора как ParseError."""
+
+        parser = FastJSONParser()
+        self.assertEqual(parser.parse(BytesIO('{"name": "Курс"}'.encode())), {"name": "Курс"})
+        with self.assertRaises(ParseError):
+            parser.parse(BytesIO(b"{"))
+
+
+class CeleryDBConnectionsTestCase(SimpleTestCase):
+    """Тесты обработки соединений с базой между задачами Celery."""
+
+    @patch("config.celery.close_old_connections")
+    def test_worker_task_closes_only_stale_connections(self, close_old_connections):
+        """После задачи воркера закрываются только устаревшие и сломанные соединения."""
+
+        close_stale_db_connections(task=SimpleNamespace(request=SimpleNamespace(is_eager=False)))
+
+        close_old_connections.assert_called_once_with()
+
+    @patch("config.celery.close_old_connections")
+    def test_eager_task_keeps_caller_connection(self, close_old_connections):
+        """Синхронно выполненная задача не закрывает соединение вызывающего кода."""
+
+        close_stale_db_connections(task=SimpleNamespace(request=SimpleNamespace(is_eager=True)))
+
+        close_old_connections.assert_not_called()
+
+
+class CacheLayerTestCase(SimpleTestCase):
+    """Тесты ключей и защиты от лавины пересчётов в config.cache."""
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return f"value {self.calls}"
+
+    def test_bump_namespace_invalidates_versioned_keys(self):
+        """Новая версия пространства меняет версионированные ключи, но не обычные."""
+
+        old_key = cache_key("courses", "list", 1, versioned=True)
+        bump_namespace("courses")
+
+        self.assertNotEqual(cache_key("courses", "list", 1, versioned=True), old_key)
+        self.assertEqual(cache_key("courses", "list", 1), "courses:list:1")
+
+    def test_value_is_computed_once(self):
+        """Повторные обращения получают сохранённое значение."""
+
+        self.assertEqual(get_or_compute("fx:test", self.compute, 60), "value 1")
+        self.assertEqual(get_or_compute("fx:test", self.compute, 60), "value 1")
+        self.assertEqual(self.calls, 1)
+
+    def test_expiring_value_is_recomputed_early(self):
+        """Истекающее значение пересчитывается до удаления ключа из кеша."""
+
+        cache.set("fx:test", ("old", 1.0, time.time()), timeout=60)
+
+        self.assertEqual(get_or_compute("fx:test", self.compute, 60), "value 1")
+
+    def test_early_recompute_runs_in_one_process(self):
+        """Пока значение пересчитывает другой процесс, возвращается текущее."""
+
+        cache.set("fx:test", ("old", 1.0, time.time()), timeout=60)
+        cache.add("fx:test:lock", True)
+
+        self.assertEqual(get_or_compute("fx:test", self.compute, 60), "old")
+        self.assertEqual(self.calls, 0)
+
+
+class CeleryRoutingTestCase(SimpleTestCase):
+    """Тесты маршрутизации задач Celery по очередям."""
+
+    def route(self, task_name):
+        return app.amqp.router.route({}, task_name)
+
+    def test_tasks_are_routed_to_their_queues(self):
+        """Рассылка и обслуживание попадают в отдельные очереди, остальное — в default."""
+
+        routes = {
+            "materials.tasks.send_information_about_course_update": "notifications",
+            "materials.tasks.dispatch_course_update_events": "notifications",
+            "users.tasks.deactivate_inactive_users": "maintenance",
+            "materials.tasks.generate_image_renditions": "default",
+        }
+        for task_name, queue in routes.items():
+            with self.subTest(task=task_name):
+                self.assertEqual(self.route(task_name)["queue"].name, queue)
+
+    def test_outbox_dispatch_outranks_fan_out(self):
+        """Разбор outbox выполняется раньше накопившейся рассылки той же очереди."""
+
+        dispatch = self.route("materials.tasks.dispatch_course_update_events")
+        fan_out = self.route("materials.tasks.send_information_about_course_update")
+
+        self.assertLess(dispatch["priority"], fan_out["priority"])
+
+    def test_visibility_timeout_covers_countdowns_and_time_limits(self):
+        """Redis не выдаёт повторно ни отложенную, ни долго выполняющуюся задачу."""
+
+        visibility_timeout = settings.CELERY_BROKER_TRANSPORT_OPTIONS["visibility_timeout"]
+        self.assertGreater(visibility_timeout, settings.CELERY_TASK_TIME_LIMIT)
+        self.assertGreater(visibility_timeout, settings.OUTBOX_SWEEP_INTERVAL)
+
+
+def throttle_rates(**rates):
+    """Подменяет лимиты DEFAULT_THROTTLE_RATES."""
+
+    return override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates})
+
+
+class TokenBucketThrottleTestCase(APITestCase):
+    """Тесты ограничения частоты запросов корзинами токенов."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bucket_refills_over_time(self):
+        """Корзина выдаёт не больше ёмкости подряд и пополняется со временем."""
+
+        with patch("config.throttling.time.time", return_value=1000.0) as now:
+            self.assertEqual([take_token("bucket", 2, 1.0) for _ in range(3)], [0, 0, 1.0])
+            now.return_value = 1000.5
+            self.assertEqual(take_token("bucket", 2, 1.0), 0.5)
+            now.return_value = 1001.0
+            self.assertEqual(take_token("bucket", 2, 1.0), 0)
+
+    def test_parse_rate(self):
+        """Лимит задаёт ёмкость корзины и скорость пополнения."""
+
+        self.assertEqual(parse_rate("120/min"), (120, 2.0))
+        self.assertEqual(parse_rate("10/hour"), (10, 10 / 3600))
+
+    @throttle_rates(register="1/hour")
+    def test_anonymous_register_throttled_with_retry_after(self):
+        """Анонимная регистрация сверх лимита получает 429 и Retry-After."""
+
+        url = reverse("users:register")
+        self.client.post(url, {"email": "first@example.com", "password": "password"}, format="json")
+        response = self.client.post(url, {"email": "second@example.com", "password": "password"}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response["Retry-After"], "3600")
+
+    @throttle_rates(**{"api.user": "1/min", "api.moderator": "2/min"})
+    def test_rates_depend_on_role(self):
+        """Модераторы получают свой лимит, отдельный от лимита пользователей."""
+
+        user = User.objects.create(email="user@example.com")
+        moderator = User.objects.create(email="moderator@example.com", is_staff=True)
+        url = reverse("materials:lessons-list")
+
+        self.client.force_authenticate(user=user)
+        self.assertEqual(
+            [self.client.get(url).status_code for _ in range(2)],
+            [status.HTTP_200_OK, status.HTTP_429_TOO_MANY_REQUESTS],
+        )
+
+        self.client.force_authenticate(user=moderator)
+        self.assertEqual([self.client.get(url).status_code for _ in range(3)][-1], status.HTTP_429_TOO_MANY_REQUESTS)
+        cache.clear()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    @throttle_rates()
+    def test_scope_without_rate_is_not_throttled(self):
+        """Без лимита для области запросы не ограничиваются."""
+
+        self.client.force_authenticate(user=User.objects.create(email="free@example.com"))
+        for _ in range(5):
+            self.assertEqual(self.client.get(reverse("materials:lessons-list")).status_code, status.HTTP_200_OK)
+
+
+class EstimatedCountPaginatorTestCase(APITestCase):
+    """Тесты оценочного числа строк в админке."""
+
+    def setUp(self):
+        self.users = [User.objects.create(email=f"user{number}@example.com") for number in range(3)]
+
+    @patch("config.admin.table_row_estimate", return_value=5_000_000)
+    def test_unfiltered_list_uses_estimate(self, estimate):
+        """Для большой таблицы без фильтров число строк берётся из статистики."""
+
+        self.assertEqual(EstimatedCountPaginator(User.objects.order_by("pk"), 100).count, 5_000_000)
+        self.assertEqual(EstimatedCountPaginator(User.objects.filter(is_active=True), 100).count, 3)
+
+    @patch("config.admin.table_row_estimate", return_value=10)
+    def test_small_table_counted_exactly(self, estimate):
+        """Для небольшой таблицы число строк считается точно."""
+
+        self.assertEqual(EstimatedCountPaginator(User.objects.order_by("pk"), 100).count, 3)
+
+    def test_estimate_only_on_postgresql(self):
+        """Вне PostgreSQL статистика не используется."""
+
+        self.assertIsNone(table_row_estimate(User.objects.all()))
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Список подписок загружает пользователей и курсы одним запросом, а поиск по числу ищет по ID."""
+
+        admin_user = User.objects.create(email="admin@example.com", is_staff=True, is_superuser=True)
+        self.client.force_login(admin_user)
+        course = Course.objects.create(name="Python")
+        url = reverse("admin:materials_subscription_changelist")
+
+        Subscription.objects.create(user=self.users[0], course=course)
+        with CaptureQueriesContext(connection) as few:
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        for user in self.users[1:]:
+            Subscription.objects.create(user=user, course=course)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(url)
+        self.assertEqual(len(few), len(many))
+
+        subscription = Subscription.objects.first()
+        response = self.client.get(url, {"q": str(subscription.pk)})
+        self.assertEqual(list(response.context["cl"].result_list), [subscription])
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTestCase(APITestCase):
+    """Тесты маршрутизации чтения на реплики."""
+
+    def setUp(self):
+        cache.clear()
+        db_router._replica_health.clear()
+        self.router = db_router.PrimaryReplicaRouter()
+        self.user = User.objects.create(email="reader@example.com")
+
+    def test_reads_outside_requests_use_primary(self):
+        """Вне HTTP-запроса, после записи и в транзакции чтение идёт с основной базы."""
+
+        self.assertEqual(self.router.db_for_read(Course), "default")
+        with db_router.routing():
+            self.assertEqual(self.router.db_for_read(Course), "replica")
+            self.router.db_for_write(Course)
+            self.assertEqual(self.router.db_for_read(Course), "default")
+        with db_router.routing(), transaction.atomic():
+            self.assertEqual(self.router.db_for_read(Course), "default")
+
+    def replica_reads(self):
+        """Подменяет выбор реплики: запросы остаются на основной базе, а обращения к реплике считаются."""
+
+        return patch("config.db_router.choose_replica", return_value="default")
+
+    def test_safe_list_reads_from_replica(self):
+        """Список уроков читается с реплики."""
+
+        self.client.force_authenticate(user=self.user)
+        with self.replica_reads() as choose_replica:
+            response = self.client.get(reverse("materials:lessons-list"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(choose_replica.called)
+        self.assertNotIn(settings.DB_PIN_COOKIE, response.cookies)
+
+    def test_write_pins_client_to_primary(self):
+        """После изменения клиент с cookie и пользователь из JWT читают с основной базы."""
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse("materials:course-list"), {"name": "Python"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn(settings.DB_PIN_COOKIE, response.cookies)
+
+        with self.replica_reads() as choose_replica:
+            self.client.get(reverse("materials:course-list"))
+        self.assertFalse(choose_replica.called)
+
+        self.client.cookies.clear()
+        self.client.force_authenticate(user=None)
+        token = RefreshToken.for_user(self.user).access_token
+        with self.replica_reads() as choose_replica:
+            self.client.get(reverse("materials:course-list"), HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertFalse(choose_replica.called)
+
+    def test_lagging_replica_skipped(self):
+        """Отстающая или недоступная реплика не используется."""
+
+        with patch("config.db_router.replica_lag", return_value=60), db_router.routing():
+            self.assertEqual(self.router.db_for_read(Course), "default")
+
+        db_router._replica_health.clear()
+        with patch("config.db_router.replica_lag", side_effect=OperationalError), db_router.routing():
+            self.assertEqual(self.router.db_for_read(Course), "default")
+
+
+class BootImportTestCase(SimpleTestCase):
+    """Регрессионный тест времени запуска и памяти веб-процесса и воркера."""
+
+    # С запасом для медленных машин CI: локально импорт занимает ~0.6 с и ~80 МБ
+    BOOT_IMPORT_LIMIT_MS = 2000
+    BOOT_RSS_LIMIT_MB = 120
+
+    def test_parse_importtime(self):
+        """Время верхнего уровня суммируется, вложенные модули учитываются отдельно."""
+
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       100 |        100 |   json.decoder\n"
+            "import time:       200 |        300 | json\n"
+            "import time:        50 |         50 | stripe\n"
+        )
+        self.assertEqual(parse_importtime(output), (350, {"json.decoder": 100, "json": 300, "stripe": 50}))
+
+    def test_boot_does_not_load_payment_sdks(self):
+        """При запуске не загружаются SDK платежей, импорт и память не выходят за пределы."""
+
+        profile = profile_boot()
+
+        for module in LAZY_MODULES:
+            self.assertNotIn(module, profile.modules)
+        self.assertLess(profile.total_us / 1000, self.BOOT_IMPORT_LIMIT_MS)
+        self.assertLess(profile.max_rss_mb, self.BOOT_RSS_LIMIT_MB)
+
+
+class CachedSchemaTestCase(APITestCase):
+    """Тесты заранее сгенерированной схемы OpenAPI."""
+
+    def setUp(self):
+        self.schema_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.schema_root, ignore_errors=True)
+        override = override_settings(API_SCHEMA_ROOT=self.schema_root, API_SCHEMA_CACHE=True)
+        override.enable()
+        self.addCleanup(override.disable)
+        schema._schemas.clear()
+        self.addCleanup(schema._schemas.clear)
+
+    def test_built_schema_matches_fresh_generation(self):
+        """Команда build_api_schema сохраняет ту же схему, что строится заново."""
+
+        call_command("build_api_schema", stdout=StringIO())
+
+        fresh = json.loads(schema.render_schema(schema.generate_schema(), "json"))
+        self.assertEqual(json.loads(schema.schema_path("json").read_bytes()), fresh)
+        self.assertTrue(schema.schema_path("yaml").exists())
+
+    def test_schema_served_from_cache_with_etag(self):
+        """Схема строится один раз, повторный запрос с ETag получает 304."""
+
+        with patch("config.schema.generate_schema", wraps=schema.generate_schema) as generate:
+            response = self.client.get(reverse("schema"), {"format": "json"})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn("/materials/changes/", json.loads(response.content)["paths"])
+
+            etag = response["ETag"]
+            response = self.client.get(reverse("schema"), {"format": "json"}, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(self.client.get(reverse("schema")).status_code, status.HTTP_200_OK)
+
+        self.assertEqual(generate.call_count, 1)
+
+    def test_schema_loaded_from_file(self):
+        """Процесс без схемы в памяти берёт её из файла, не генерируя заново."""
+
+        schema.build_schema_files()
+        schema._schemas.clear()
+
+        with patch("config.schema.generate_schema") as generate:
+            response = self.client.get(reverse("schema"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, schema.schema_path("yaml").read_bytes())
+        generate.assert_not_called()
+
+
+class MetricsTestCase(APITestCase):
+    """Тесты метрик Prometheus."""
+
+    def test_count_call(self):
+        """Вызов внешнего API считается с исходом ok или error."""
+
+        counter = MagicMock()
+        with metrics.count_call(counter, operation="product.create"):
+            pass
+        with self.assertRaises(ValueError), metrics.count_call(counter, operation="product.create"):
+            raise ValueError
+
+        counter.labels.assert_any_call(outcome="ok", operation="product.create")
+        counter.labels.assert_any_call(outcome="error", operation="product.create")
+
+    @patch("config.metrics.CELERY_TASK_DURATION")
+    @patch("config.metrics.CELERY_TASK_QUEUE_WAIT")
+    def test_task_queue_wait_and_duration(self, queue_wait, duration):
+        """Ожидание считается от публикации или ETA, время выполнения — по имени задачи и состоянию."""
+
+        now = time.time()
+        request = SimpleNamespace(published_at=now - 30, eta=None, is_eager=False)
+        task = SimpleNamespace(name="materials.tasks.flush_lesson_progress", request=request)
+
+        metrics.record_task_start(task_id="1", task=task)
+        metrics.record_task_duration(task_id="1", task=task, state="SUCCESS")
+
+        queue_wait.labels.assert_called_once_with(task.name)
+        self.assertGreaterEqual(queue_wait.labels.return_value.observe.call_args.args[0], 30)
+        duration.labels.assert_called_once_with(task.name, "SUCCESS")
+
+        queue_wait.reset_mock()
+        request.eta = datetime.datetime.fromtimestamp(now - 5, tz=datetime.timezone.utc).isoformat()
+        metrics.record_task_start(task_id="2", task=task)
+        self.assertLess(queue_wait.labels.return_value.observe.call_args.args[0], 30)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_metrics_disabled(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_token(self):
+        """При заданном METRICS_TOKEN метрики отдаются только с этим токеном."""
+
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_metrics_endpoint(self):
+        """Запросы учитываются по шаблону маршрута вместе с числом SQL-запросов."""
+
+        self.client.get(reverse("materials:course-list"))
+        response = self.client.get(reverse("metrics"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="materials/$",status="401"}', body)
+        self.assertIn("http_request_db_queries", body)
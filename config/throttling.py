@@ -0,0 +1,109 @@
+import math
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from config.cache import cache_key
+from users.permissions import is_moderator
+
+THROTTLE_NAMESPACE = "throttle"
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+# Пополняет корзину за прошедшее время и забирает из неё один токен за один вызов.
+# KEYS[1] — корзина, ARGV — ёмкость, токенов в секунду, текущее время в миллисекундах.
+# Возвращает {1, 0}, если токен выдан, иначе {0, сколько миллисекунд ждать следующего}
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+local allowed, wait = 0, 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "ts", now)
+redis.call("PEXPIRE", KEYS[1], math.ceil(capacity * 1000 / rate))
+return {allowed, wait}
+"""
+
+
+def parse_rate(rate):
+    """Лимит вида ``"100/min"`` — ёмкость корзины и число токенов, восстанавливаемых за секунду."""
+
+    num, period = rate.split("/")
+    capacity = int(num)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+def take_token(key, capacity, refill_rate):
+    """Забирает токен из корзины ``key``; возвращает 0 или сколько секунд ждать следующего токена.
+
+    С Redis-кешем корзина обновляется Lua-скриптом за один запрос, без Redis — через кеш Django
+    (неатомарно, для разработки и тестов).
+    """
+
+    backend = caches["default"]
+    now = int(time.time() * 1000)
+
+    if isinstance(backend, RedisCache):
+        client = backend._cache.get_client(write=True)
+        allowed, wait = client.register_script(TOKEN_BUCKET_SCRIPT)(
+            keys=[backend.make_and_validate_key(key)], args=[capacity, refill_rate, now]
+        )
+        return 0 if allowed else wait / 1000
+
+    tokens, ts = backend.get(key, (capacity, now))
+    tokens = min(capacity, tokens + max(0, now - ts) * refill_rate / 1000)
+    wait = 0 if tokens >= 1 else math.ceil((1 - tokens) * 1000 / refill_rate) / 1000
+    backend.set(key, (tokens - 1 if not wait else tokens, now), timeout=math.ceil(capacity / refill_rate))
+    return wait
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Ограничение частоты запросов корзиной токенов.
+
+    Лимит берётся из DEFAULT_THROTTLE_RATES по ключу ``<scope>.<role>`` или, если его нет, ``<scope>``.
+    Область — ``throttle_scope`` представления (по умолчанию ``api``), роль — ``anon``, ``user``
+    или ``moderator``. Корзина заводится на пользователя, для анонимных — на IP-адрес.
+    Представления без лимита для области не ограничиваются.
+    """
+
+    default_scope = "api"
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_role(self, request):
+        user = request.user
+        if not user or not user.is_authenticated:
+            return "anon"
+        if user.is_staff or is_moderator(user):
+            return "moderator"
+        return "user"
+
+    def get_rate(self, scope, role):
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        return rates.get(f"{scope}.{role}", rates.get(scope))
+
+    def allow_request(self, request, view):
+        scope = getattr(view, "throttle_scope", None) or self.default_scope
+        role = self.get_role(request)
+        rate = self.get_rate(scope, role)
+        if rate is None:
+            return True
+
+        ident = self.get_ident(request) if role == "anon" else request.user.pk
+        self.wait_seconds = take_token(cache_key(THROTTLE_NAMESPACE, scope, role, ident), *parse_rate(rate))
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
@@ -0,0 +1,110 @@
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import fields as drf_fields
+from rest_framework import relations
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+class ValuesSerializer:
+    """Сериализатор строк ``QuerySet.values()`` для списков только на чтение.
+
+    Даёт тот же вывод, что и ``model_serializer``, но не создаёт экземпляры моделей и не
+    проходит механизм полей DRF для каждой строки: набор, порядок полей и преобразователи
+    значений собираются один раз при объявлении класса.
+    """
+
+    model_serializer = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.model_serializer is not None:
+            cls.columns = tuple(
+                cls._compile_field(name, field)
+                for name, field in cls.model_serializer().fields.items()
+                if not field.write_only
+            )
+
+    @staticmethod
+    def _compile_field(name, field):
+        """Возвращает (имя в ответе, колонка values(), вид преобразования, поле DRF)."""
+
+        if field.source == "*" or "." in field.source:
+            raise ImproperlyConfigured(f"Поле {name} нельзя получить через values()")
+        if isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None:
+            return name, field.source, "raw", field
+        if isinstance(field, drf_fields.FileField):
+            return name, field.source, "file", field
+        if isinstance(field, drf_fields.CharField):
+            return name, field.source, "str", field
+        if isinstance(field, (drf_fields.IntegerField, drf_fields.BooleanField)):
+            return name, field.source, "raw", field
+        return name, field.source, "field", field
+
+    def __init__(self, context=None):
+        self.context = context or {}
+        # Поля привязываются к контексту один раз на запрос, а не на строку
+        fields = self.model_serializer(context=self.context).fields
+        self._converters = tuple(
+            (name, column, self._converter(kind, fields[name])) for name, column, kind, _ in self.columns
+        )
+
+    def _converter(self, kind, field):
+        if kind == "raw":
+            return None
+        if kind == "str":
+            return str
+        if kind == "file":
+            return self._file_url(field)
+        return field.to_representation
+
+    def _file_url(self, field):
+        storage = field.parent.Meta.model._meta.get_field(field.source).storage
+        request = self.context.get("request")
+        use_url = getattr(field, "use_url", api_settings.UPLOADED_FILES_USE_URL)
+
+        def to_representation(name):
+            if not name:
+                return None
+            if not use_url:
+                return name
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+
+        return to_representation
+
+    def values(self, queryset):
+        """Ограничивает queryset колонками, нужными для ответа."""
+
+        return queryset.values(*(column for _, column, _ in self._converters))
+
+    def to_representation(self, row):
+        """Преобразует одну строку values() в словарь ответа."""
+
+        data = {}
+        for name, column, convert in self._converters:
+            value = row[column]
+            data[name] = value if value is None or convert is None else convert(value)
+        return data
+
+    def many(self, rows):
+        """Преобразует набор строк values() в список ответа."""
+
+        return [self.to_representation(row) for row in rows]
+
+
+class ValuesListMixin:
+    """Быстрый ``list()`` для ListAPIView через ``values_serializer_class``.
+
+    Схема API и остальные действия по-прежнему используют ``serializer_class``.
+    """
+
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.values_serializer_class(context=self.get_serializer_context())
+        queryset = serializer.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.many(page))
+        return Response(serializer.many(queryset))
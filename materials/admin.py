@@ -1,33 +1,52 @@
 from django.contrib import admin
 
-from materials.models import Course, Lesson, Subscription  # название модели
+from config.admin import ScalableModelAdmin
+from materials.models import Course, Lesson, Subscription, VideoMetadata  # название модели
+
+# Поиск по префиксу (LIKE 'текст%') использует индексы *_name_pattern_idx; число или ID ищется по первичному ключу
 
 
 @admin.register(Course)
-class CourseAdmin(admin.ModelAdmin):
+class CourseAdmin(ScalableModelAdmin):
     list_display = (
         "id",
         "name",
-        "description",
+        "owner",
+        "updated_at",
     )
-    list_filter = ("name",)
-    search_fields = ("name",)
+    list_select_related = ("owner",)
+    search_fields = ("name__startswith",)
+    autocomplete_fields = ("owner",)
 
 
 @admin.register(Lesson)
-class LessonAdmin(admin.ModelAdmin):
+class LessonAdmin(ScalableModelAdmin):
     list_display = (
         "id",
         "name",
-        "description",
         "course",
+        "owner",
+    )
+    list_select_related = ("course", "owner")
+    search_fields = ("name__startswith",)
+    autocomplete_fields = ("course", "owner")
+
+
+@admin.register(VideoMetadata)
+class VideoMetadataAdmin(ScalableModelAdmin):
+    list_display = (
+        "video_id",
+        "title",
+        "duration",
+        "is_available",
+        "checked_at",
     )
-    list_filter = ("name",)
-    search_fields = ("name",)
+    list_filter = ("is_available",)
+    search_fields = ("video_id__exact",)
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(ScalableModelAdmin):
     list_display = (
         "id",
         "user",
@@ -36,5 +55,7 @@ class SubscriptionAdmin(admin.ModelAdmin):
         "updated_at",
         "is_active",
     )
-    list_filter = ("id",)
-    search_fields = ("id",)
+    list_select_related = ("user", "course")
+    list_filter = ("is_active",)
+    search_fields = ("user__email__exact",)
+    autocomplete_fields = ("user", "course")
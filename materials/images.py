@@ -0,0 +1,69 @@
+import hashlib
+import re
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+RENDITION_EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg"}
+# Путь копии внутри IMAGE_RENDITIONS_DIR: <первые 2 символа>/<sha256>_<имя>.<расширение>
+RENDITION_NAME_RE = re.compile(r"(?P<prefix>[0-9a-f]{2})/(?P<digest>[0-9a-f]{64})_[^/]+")
+
+
+def rendition_path(digest, name, image_format):
+    """Путь копии, адресуемый содержимым исходника: одинаковые загрузки делят одни файлы."""
+
+    return f"{settings.IMAGE_RENDITIONS_DIR}/{digest[:2]}/{digest}_{name}.{RENDITION_EXTENSIONS[image_format]}"
+
+
+def rendition_digest(path):
+    """SHA-256 исходника по пути копии или None, если путь не похож на путь копии."""
+
+    directory, _, name = path.partition("/")
+    match = RENDITION_NAME_RE.fullmatch(name) if directory == settings.IMAGE_RENDITIONS_DIR else None
+    if match is None or not match["digest"].startswith(match["prefix"]):
+        return None
+    return match["digest"]
+
+
+def encode_rendition(image, size, image_format):
+    """Уменьшает изображение, вписывая его в size, и кодирует в image_format."""
+
+    rendition = image.copy()
+    rendition.thumbnail(size, Image.Resampling.LANCZOS)
+    if image_format == "JPEG" and rendition.mode != "RGB":
+        rendition = rendition.convert("RGB")
+    elif rendition.mode not in ("RGB", "RGBA"):
+        rendition = rendition.convert("RGBA")
+
+    buffer = BytesIO()
+    rendition.save(buffer, format=image_format, quality=settings.IMAGE_RENDITION_QUALITY)
+    return buffer.getvalue()
+
+
+def build_renditions(field_file):
+    """Декодирует загруженное изображение и сохраняет его копии из IMAGE_RENDITIONS.
+
+    Возвращает описание копий для поля ``*_renditions``. Уже существующие копии того же
+    содержимого повторно не кодируются. Некорректные изображения вызывают исключения Pillow.
+    """
+
+    with field_file.open("rb") as source:
+        content = source.read()
+    digest = hashlib.sha256(content).hexdigest()
+    image_format = settings.IMAGE_RENDITION_FORMAT
+
+    image = Image.open(BytesIO(content))
+    image.load()
+    image = ImageOps.exif_transpose(image)
+
+    storage = field_file.storage
+    files = {}
+    for name, size in settings.IMAGE_RENDITIONS.items():
+        path = rendition_path(digest, name, image_format)
+        if not storage.exists(path):
+            path = storage.save(path, ContentFile(encode_rendition(image, size, image_format)))
+        files[name] = path
+
+    return {"source": field_file.name, "sha256": digest, "files": files}
@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from config.schema import build_schema_files
+
+
+class Command(BaseCommand):
+    help = "Генерирует схему OpenAPI и сохраняет её в API_SCHEMA_ROOT для отдачи без повторной генерации."
+
+    def handle(self, *args, **options):
+        for path in build_schema_files():
+            self.stdout.write(self.style.SUCCESS(f"Schema written to {path}"))
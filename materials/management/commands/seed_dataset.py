@@ -0,0 +1,51 @@
+import time
+from datetime import datetime, timezone
+
+from django.core.management import BaseCommand, CommandError
+
+from materials.seeding import SEED_UNTIL, seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет базу синтетическими пользователями, курсами, уроками, подписками и платежами "
+        "для нагрузочного тестирования. Одинаковый --seed даёт одинаковые данные."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10_000, help="Число пользователей")
+        parser.add_argument("--courses", type=int, default=500, help="Число курсов")
+        parser.add_argument("--lessons-per-course", type=float, default=12, help="Среднее число уроков в курсе")
+        parser.add_argument(
+            "--subscriptions-per-user", type=float, default=3, help="Среднее число подписок пользователя"
+        )
+        parser.add_argument("--paid-share", type=float, default=0.3, help="Доля подписок с оплатой")
+        parser.add_argument("--seed", type=int, default=0, help="Начальное значение генератора")
+        parser.add_argument(
+            "--until",
+            type=lambda value: datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc),
+            default=SEED_UNTIL,
+            help="Конец периода дат в формате ГГГГ-ММ-ДД",
+        )
+        parser.add_argument("--batch-size", type=int, default=50_000, help="Строк в одном COPY или INSERT")
+
+    def handle(self, *args, **options):
+        if min(options["users"], options["courses"]) < 0 or options["lessons_per_course"] < 1:
+            raise CommandError("Число пользователей и курсов не может быть отрицательным, уроков в курсе — меньше 1")
+        if not 0 <= options["paid_share"] <= 1:
+            raise CommandError("--paid-share должен быть от 0 до 1")
+
+        started = time.monotonic()
+        written = seed_dataset(
+            users=options["users"],
+            courses=options["courses"],
+            lessons_per_course=options["lessons_per_course"],
+            subscriptions_per_user=max(0, options["subscriptions_per_user"]),
+            paid_share=options["paid_share"],
+            seed=options["seed"],
+            batch_size=max(1, options["batch_size"]),
+            until=options["until"],
+        )
+        for name, count in written.items():
+            self.stdout.write(f"{name}: {count}")
+        self.stdout.write(self.style.SUCCESS(f"Dataset seeded in {time.monotonic() - started:.1f}s"))
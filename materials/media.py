@@ -0,0 +1,137 @@
+import hashlib
+import posixpath
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db.models import Q
+
+from config.cache import cache_key
+from materials.images import rendition_digest
+from materials.models import Course, Lesson, Subscription
+from users.models import Payment, User
+from users.permissions import is_moderator
+
+MEDIA_NAMESPACE = "media"
+
+
+def normalize_media_path(path):
+    """Путь файла относительно MEDIA_ROOT или None, если путь выходит за его пределы."""
+
+    normalized = posixpath.normpath(path)
+    if normalized.startswith(("/", "..")) or normalized == ".":
+        return None
+    return normalized
+
+
+def _file_lookup(field_name, path):
+    """Условие «файл — это поле ``field_name`` или одна из его уменьшенных копий» по индексированным столбцам.
+
+    Копии адресуются содержимым исходника, поэтому их владельцы ищутся по SHA-256 из пути копии.
+    """
+
+    digest = rendition_digest(path)
+    if digest is not None:
+        return Q(**{f"{field_name}_sha256": digest})
+    return Q(**{field_name: path})
+
+
+def access_scope(courses=(), lessons=(), owners=()):
+    """Описание доступа к объекту для can_access_media.
+
+    Доступ есть у подписчиков и покупателей курсов ``courses``, покупателей уроков ``lessons``,
+    владельцев ``owners`` и модераторов.
+    """
+
+    return {
+        "public": False,
+        "courses": sorted(set(courses) - {None}),
+        "lessons": sorted(set(lessons) - {None}),
+        "owners": sorted(set(owners) - {None}),
+    }
+
+
+def _resolve_media(path):
+    lessons = list(Lesson.objects.filter(_file_lookup("preview", path)).values_list("pk", "course_id", "owner_id"))
+    courses = list(Course.objects.filter(_file_lookup("preview", path)).values_list("pk", "owner_id"))
+    if courses or lessons:
+        return access_scope(
+            courses=[pk for pk, _ in courses] + [course_id for _, course_id, _ in lessons],
+            lessons=[pk for pk, _, _ in lessons],
+            owners=[owner_id for *_, owner_id in courses + lessons],
+        )
+    if User.objects.filter(_file_lookup("avatar", path)).exists():
+        return {"public": True}
+    return None
+
+
+def media_owners_cache_key(path):
+    return cache_key(MEDIA_NAMESPACE, "owners", hashlib.sha1(path.encode()).hexdigest())
+
+
+def forget_media_owners(instance):
+    """Сбрасывает закешированных владельцев превью объекта и его копий."""
+
+    paths = {instance.preview.name} | set((instance.preview_renditions or {}).get("files", {}).values())
+    cache.delete_many([media_owners_cache_key(path) for path in paths if path])
+
+
+def media_owners(path):
+    """Кому принадлежит файл: курсы, уроки и их владельцы; аватары пользователей публичны.
+
+    None — файл не относится ни к одному объекту. Найденный владелец кешируется на
+    MEDIA_ENTITLEMENT_CACHE_TTL секунд и сбрасывается при изменении курса или урока (см. materials.signals).
+    """
+
+    key = media_owners_cache_key(path)
+    owners = cache.get(key)
+    if owners is None:
+        owners = _resolve_media(path)
+        if owners is not None:
+            cache.set(key, owners, timeout=settings.MEDIA_ENTITLEMENT_CACHE_TTL)
+    return owners
+
+
+def entitlements_cache_key(user_id):
+    return cache_key(MEDIA_NAMESPACE, "entitlements", user_id)
+
+
+def forget_media_entitlements(user_id):
+    cache.delete(entitlements_cache_key(user_id))
+
+
+def user_entitlements(user_id):
+    """Курсы, на которые пользователь подписан или которые оплатил, и оплаченные уроки.
+
+    Кешируется до изменения подписок или платежей пользователя (см. materials.signals).
+    """
+
+    key = entitlements_cache_key(user_id)
+    entitlements = cache.get(key)
+    if entitlements is None:
+        course_type, lesson_type = ContentType.objects.get_for_models(Course, Lesson).values()
+        courses = set(Subscription.objects.filter(user_id=user_id, is_active=True).values_list("course_id", flat=True))
+        lessons = set()
+        for content_type_id, object_id in Payment.objects.filter(user_id=user_id).values_list(
+            "content_type_id", "object_id"
+        ):
+            if content_type_id == course_type.pk:
+                courses.add(object_id)
+            elif content_type_id == lesson_type.pk:
+                lessons.add(object_id)
+        entitlements = {"courses": courses - {None}, "lessons": lessons}
+        cache.set(key, entitlements, timeout=settings.MEDIA_ENTITLEMENT_CACHE_TTL)
+    return entitlements
+
+
+def can_access_media(user, owners):
+    """Доступ к файлу: публичный файл, владелец, модератор, подписчик или покупатель курса или урока."""
+
+    if owners["public"]:
+        return True
+    if not user.is_authenticated:
+        return False
+    if user.is_staff or user.pk in owners["owners"] or is_moderator(user):
+        return True
+    entitlements = user_entitlements(user.pk)
+    return bool(entitlements["courses"] & set(owners["courses"]) or entitlements["lessons"] & set(owners["lessons"]))
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:19
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def pending_flags_to_events(apps, schema_editor):
+    """Переносит курсы с notification_pending=True в outbox."""
+
+    Course = apps.get_model("materials", "Course")
+    CourseUpdateEvent = apps.get_model("materials", "CourseUpdateEvent")
+    CourseUpdateEvent.objects.bulk_create(
+        CourseUpdateEvent(course_id=course_id, event_type="course_updated")
+        for course_id in Course.objects.filter(notification_pending=True).values_list("id", flat=True)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0007_course_last_notification_at_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CourseUpdateEvent",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "event_type",
+                    models.CharField(
+                        choices=[
+                            ("course_updated", "Course updated"),
+                            ("lesson_created", "Lesson created"),
+                            ("lesson_updated", "Lesson updated"),
+                        ],
+                        max_length=32,
+                        verbose_name="event_type",
+                    ),
+                ),
+                (
+                    "payload",
+                    models.JSONField(blank=True, default=dict, help_text="Что изменилось", verbose_name="payload"),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True, verbose_name="created_at")),
+                (
+                    "available_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        help_text="Не доставлять раньше этого времени",
+                        verbose_name="available_at",
+                    ),
+                ),
+                ("processed_at", models.DateTimeField(blank=True, null=True, verbose_name="processed_at")),
+                (
+                    "course",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="update_events",
+                        to="materials.course",
+                        verbose_name="course",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Событие обновления курса",
+                "verbose_name_plural": "События обновления курсов",
+                "ordering": ["id"],
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("processed_at__isnull", True)),
+                        fields=["available_at", "id"],
+                        name="course_event_pending_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(pending_flags_to_events, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="course",
+            name="notification_pending",
+        ),
+    ]
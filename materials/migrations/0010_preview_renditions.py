@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0009_pendingnotification"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="course",
+            name="preview_renditions",
+            field=models.JSONField(
+                blank=True, default=dict, help_text="Уменьшенные копии превью", verbose_name="preview renditions"
+            ),
+        ),
+        migrations.AddField(
+            model_name="lesson",
+            name="preview_renditions",
+            field=models.JSONField(
+                blank=True, default=dict, help_text="Уменьшенные копии превью", verbose_name="preview renditions"
+            ),
+        ),
+    ]
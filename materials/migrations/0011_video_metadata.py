@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from materials.video import parse_video_id
+
+
+def fill_video_ids(apps, schema_editor):
+    """Заполняет ID видео существующих уроков; метаданные загрузит ingest_video_metadata."""
+
+    Lesson = apps.get_model("materials", "Lesson")
+    lessons = list(Lesson.objects.exclude(video__isnull=True).exclude(video="").only("id", "video"))
+    for lesson in lessons:
+        lesson.video_id = parse_video_id(lesson.video)
+    Lesson.objects.bulk_update(lessons, ["video_id"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0010_preview_renditions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VideoMetadata",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("video_id", models.CharField(max_length=32, unique=True, verbose_name="video id")),
+                ("title", models.CharField(blank=True, max_length=255, verbose_name="title")),
+                (
+                    "duration",
+                    models.PositiveIntegerField(
+                        blank=True, help_text="В секундах", null=True, verbose_name="duration"
+                    ),
+                ),
+                ("thumbnail_url", models.URLField(blank=True, max_length=500, verbose_name="thumbnail url")),
+                (
+                    "is_available",
+                    models.BooleanField(default=True, help_text="Видео найдено", verbose_name="is available"),
+                ),
+                (
+                    "checked_at",
+                    models.DateTimeField(db_index=True, help_text="Когда данные проверены", verbose_name="checked_at"),
+                ),
+            ],
+            options={
+                "verbose_name": "Метаданные видео",
+                "verbose_name_plural": "Метаданные видео",
+            },
+        ),
+        migrations.AddField(
+            model_name="lesson",
+            name="video_id",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, max_length=32, null=True, verbose_name="video id"
+            ),
+        ),
+        migrations.AddField(
+            model_name="lesson",
+            name="video_metadata",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="lessons",
+                to="materials.videometadata",
+                verbose_name="video metadata",
+            ),
+        ),
+        migrations.RunPython(fill_video_ids, migrations.RunPython.noop),
+    ]
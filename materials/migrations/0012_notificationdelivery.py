@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0011_video_metadata"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationDelivery",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "batch",
+                    models.PositiveBigIntegerField(help_text="ID последнего события рассылки", verbose_name="batch"),
+                ),
+                (
+                    "channel",
+                    models.CharField(
+                        choices=[("email", "Email"), ("telegram", "Telegram")], max_length=16, verbose_name="channel"
+                    ),
+                ),
+                ("delivered_at", models.DateTimeField(auto_now_add=True, verbose_name="delivered_at")),
+                (
+                    "course",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="notification_deliveries",
+                        to="materials.course",
+                        verbose_name="course",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="user",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Доставка уведомления",
+                "verbose_name_plural": "Доставки уведомлений",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("course", "batch", "user", "channel"), name="notification_delivery_unique"
+                    )
+                ],
+            },
+        ),
+    ]
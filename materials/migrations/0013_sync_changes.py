@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:46
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0012_notificationdelivery"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tombstone",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("course", "Course"), ("lesson", "Lesson"), ("subscription", "Subscription")],
+                        max_length=16,
+                        verbose_name="kind",
+                    ),
+                ),
+                ("object_id", models.PositiveBigIntegerField(verbose_name="object id")),
+                ("deleted_at", models.DateTimeField(default=django.utils.timezone.now, verbose_name="deleted_at")),
+            ],
+            options={
+                "verbose_name": "Удалённый объект",
+                "verbose_name_plural": "Удалённые объекты",
+            },
+        ),
+        migrations.AddField(
+            model_name="lesson",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, verbose_name="update_at"),
+        ),
+        migrations.AddIndex(
+            model_name="course",
+            index=models.Index(fields=["updated_at", "id"], name="course_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="lesson",
+            index=models.Index(fields=["updated_at", "id"], name="lesson_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="subscription",
+            index=models.Index(fields=["user", "updated_at", "id"], name="subscription_updated_idx"),
+        ),
+        migrations.AddField(
+            model_name="tombstone",
+            name="user",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Владелец курса или урока, пользователь подписки",
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="user",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tombstone",
+            index=models.Index(fields=["deleted_at", "id"], name="tombstone_deleted_idx"),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+LESSON_RANK_GAP = 1 << 16
+
+
+def fill_lesson_ranks(apps, schema_editor):
+    """Нумерует уроки каждого курса в порядке ID с промежутком LESSON_RANK_GAP."""
+
+    Lesson = apps.get_model("materials", "Lesson")
+    lessons, course_id, position = [], None, 0
+    for lesson in Lesson.objects.exclude(course__isnull=True).order_by("course_id", "id").only("id", "course_id"):
+        position = position + 1 if lesson.course_id == course_id else 1
+        course_id = lesson.course_id
+        lesson.rank = LESSON_RANK_GAP * position
+        lessons.append(lesson)
+    Lesson.objects.bulk_update(lessons, ["rank"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0013_sync_changes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="lesson",
+            name="rank",
+            field=models.BigIntegerField(
+                blank=True,
+                editable=False,
+                help_text="Позиция урока в курсе, с промежутками",
+                null=True,
+                verbose_name="rank",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lesson",
+            index=models.Index(fields=["course", "rank"], name="lesson_course_rank_idx"),
+        ),
+        migrations.RunPython(fill_lesson_ranks, migrations.RunPython.noop),
+    ]
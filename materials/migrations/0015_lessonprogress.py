@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0014_lesson_rank"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LessonProgress",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("viewed_at", models.DateTimeField(blank=True, null=True, verbose_name="viewed_at")),
+                ("completed_at", models.DateTimeField(blank=True, null=True, verbose_name="completed_at")),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="update_at")),
+                (
+                    "lesson",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="progress",
+                        to="materials.lesson",
+                        verbose_name="lesson",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lesson_progress",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="user",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Прогресс по уроку",
+                "verbose_name_plural": "Прогресс по урокам",
+                "constraints": [models.UniqueConstraint(fields=("user", "lesson"), name="lesson_progress_unique")],
+            },
+        ),
+    ]
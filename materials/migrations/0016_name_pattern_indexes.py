@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# Индексы для поиска по префиксу (LIKE 'текст%') в админке; есть только в PostgreSQL
+PATTERN_INDEXES = (
+    ("course_name_pattern_idx", "materials_course", "name"),
+    ("lesson_name_pattern_idx", "materials_lesson", "name"),
+)
+
+
+def create_pattern_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, table, column in PATTERN_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" ("{column}" varchar_pattern_ops)'
+        )
+
+
+def drop_pattern_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _, _ in PATTERN_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY не выполняется внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ("materials", "0015_lessonprogress"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_pattern_indexes, drop_pattern_indexes),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0016_name_pattern_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pendingnotification",
+            name="batch",
+            field=models.PositiveBigIntegerField(
+                default=0, help_text="ID последнего события рассылки", verbose_name="batch"
+            ),
+        ),
+    ]
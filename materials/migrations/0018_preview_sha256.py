@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:43
+
+from django.db import migrations, models
+
+
+def fill_preview_sha256(apps, schema_editor):
+    """Переносит SHA-256 превью из описания его копий."""
+
+    for model_name in ("Course", "Lesson"):
+        model = apps.get_model("materials", model_name)
+        objects = []
+        for instance in model.objects.exclude(preview_renditions={}).only("id", "preview_renditions"):
+            instance.preview_sha256 = instance.preview_renditions.get("sha256", "")
+            objects.append(instance)
+        model.objects.bulk_update(objects, ["preview_sha256"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("materials", "0017_pendingnotification_batch"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="course",
+            name="preview_sha256",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                default="",
+                editable=False,
+                help_text="SHA-256 превью, по которому адресуются его копии",
+                max_length=64,
+                verbose_name="preview sha256",
+            ),
+        ),
+        migrations.AddField(
+            model_name="lesson",
+            name="preview_sha256",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                default="",
+                editable=False,
+                help_text="SHA-256 превью, по которому адресуются его копии",
+                max_length=64,
+                verbose_name="preview sha256",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="course",
+            name="preview",
+            field=models.ImageField(
+                blank=True,
+                db_index=True,
+                help_text="Загрузите картинку",
+                null=True,
+                upload_to="materials/preview",
+                verbose_name="preview",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="lesson",
+            name="preview",
+            field=models.ImageField(
+                blank=True,
+                db_index=True,
+                help_text="Загрузите картинку",
+                null=True,
+                upload_to="materials/preview",
+                verbose_name="preview",
+            ),
+        ),
+        migrations.RunPython(fill_preview_sha256, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 from users.models import User
 
@@ -8,15 +9,32 @@ class Course(models.Model):
 
     name = models.CharField(max_length=255, unique=True, verbose_name="name", help_text="Название курса")
     preview = models.ImageField(
-        upload_to="materials/preview", blank=True, null=True, verbose_name="preview", help_text="Загрузите картинку"
+        upload_to="materials/preview",
+        blank=True,
+        null=True,
+        db_index=True,
+        verbose_name="preview",
+        help_text="Загрузите картинку",
+    )
+    preview_renditions = models.JSONField(
+        default=dict, blank=True, verbose_name="preview renditions", help_text="Уменьшенные копии превью"
+    )
+    preview_sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        default="",
+        editable=False,
+        db_index=True,
+        verbose_name="preview sha256",
+        help_text="SHA-256 превью, по которому адресуются его копии",
     )
     description = models.TextField(blank=True, null=True, verbose_name="description", help_text="Укажите описание")
     owner = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, verbose_name="owner")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="update_at")
     last_notification_at = models.DateTimeField(blank=True, null=True)
-    notification_pending = models.BooleanField(default=False)
 
     class Meta:
+        indexes = [models.Index(fields=["updated_at", "id"], name="course_updated_idx")]
         verbose_name = "Курс"
         verbose_name_plural = "Курсы"
 
@@ -30,19 +48,56 @@ class Lesson(models.Model):
     name = models.CharField(max_length=255, unique=True, verbose_name="name", help_text="Название урока")
     description = models.TextField(blank=True, null=True, verbose_name="description", help_text="Укажите описание")
     preview = models.ImageField(
-        upload_to="materials/preview", blank=True, null=True, verbose_name="preview", help_text="Загрузите картинку"
+        upload_to="materials/preview",
+        blank=True,
+        null=True,
+        db_index=True,
+        verbose_name="preview",
+        help_text="Загрузите картинку",
+    )
+    preview_renditions = models.JSONField(
+        default=dict, blank=True, verbose_name="preview renditions", help_text="Уменьшенные копии превью"
+    )
+    preview_sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        default="",
+        editable=False,
+        db_index=True,
+        verbose_name="preview sha256",
+        help_text="SHA-256 превью, по которому адресуются его копии",
     )
     video = models.URLField(
         max_length=500, blank=True, null=True, verbose_name="video", help_text="Укажите ссылку на видео"
     )
+    video_id = models.CharField(
+        max_length=32, blank=True, null=True, editable=False, db_index=True, verbose_name="video id"
+    )
+    video_metadata = models.ForeignKey(
+        "VideoMetadata",
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        editable=False,
+        related_name="lessons",
+        verbose_name="video metadata",
+    )
     course = models.ForeignKey(
         Course, on_delete=models.SET_NULL, blank=True, null=True, verbose_name="course", help_text="Укажите курс"
     )
     owner = models.ForeignKey(
         User, on_delete=models.SET_NULL, blank=True, null=True, verbose_name="owner", help_text="Укажите владельца"
     )
+    rank = models.BigIntegerField(
+        blank=True, null=True, editable=False, verbose_name="rank", help_text="Позиция урока в курсе, с промежутками"
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="update_at")
 
     class Meta:
+        indexes = [
+            models.Index(fields=["updated_at", "id"], name="lesson_updated_idx"),
+            models.Index(fields=["course", "rank"], name="lesson_course_rank_idx"),
+        ]
         verbose_name = "Урок"
         verbose_name_plural = "Уроки"
 
@@ -50,6 +105,56 @@ class Lesson(models.Model):
         return self.name
 
 
+class NotificationDelivery(models.Model):
+    """Журнал доставки уведомлений об обновлении курса: одна запись на получателя и канал.
+
+    Рассылка ``batch`` пропускает получателей, которым она уже доставлена, поэтому
+    повторный запуск задачи продолжает рассылку, а не отправляет сообщения заново.
+    """
+
+    class Channel(models.TextChoices):
+        """Каналы доставки."""
+
+        EMAIL = "email", "Email"
+        TELEGRAM = "telegram", "Telegram"
+
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, verbose_name="course", related_name="notification_deliveries"
+    )
+    batch = models.PositiveBigIntegerField(verbose_name="batch", help_text="ID последнего события рассылки")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="user", related_name="+")
+    channel = models.CharField(max_length=16, choices=Channel.choices, verbose_name="channel")
+    delivered_at = models.DateTimeField(auto_now_add=True, verbose_name="delivered_at")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["course", "batch", "user", "channel"], name="notification_delivery_unique")
+        ]
+        verbose_name = "Доставка уведомления"
+        verbose_name_plural = "Доставки уведомлений"
+
+    def __str__(self):
+        return f"{self.course_id}/{self.batch} -> {self.user_id} ({self.channel})"
+
+
+class VideoMetadata(models.Model):
+    """Метаданные видео, общие для всех уроков с этим видео."""
+
+    video_id = models.CharField(max_length=32, unique=True, verbose_name="video id")
+    title = models.CharField(max_length=255, blank=True, verbose_name="title")
+    duration = models.PositiveIntegerField(blank=True, null=True, verbose_name="duration", help_text="В секундах")
+    thumbnail_url = models.URLField(max_length=500, blank=True, verbose_name="thumbnail url")
+    is_available = models.BooleanField(default=True, verbose_name="is available", help_text="Видео найдено")
+    checked_at = models.DateTimeField(db_index=True, verbose_name="checked_at", help_text="Когда данные проверены")
+
+    class Meta:
+        verbose_name = "Метаданные видео"
+        verbose_name_plural = "Метаданные видео"
+
+    def __str__(self):
+        return self.title or self.video_id
+
+
 class Subscription(models.Model):
     """Модель подписки пользователя на курс."""
 
@@ -71,8 +176,128 @@ class Subscription(models.Model):
     class Meta:
         ordering = ["-created_at"]
         unique_together = ("user", "course")
+        indexes = [models.Index(fields=["user", "updated_at", "id"], name="subscription_updated_idx")]
         verbose_name = "Подписка"
         verbose_name_plural = "Подписки"
 
     def __str__(self):
         return f"{self.user} - {self.course}"
+
+
+class LessonProgress(models.Model):
+    """Прогресс пользователя по уроку: когда урок последний раз просмотрен и когда пройден.
+
+    Отметки сначала попадают в буфер (materials.progress) и переносятся в таблицу пачками.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="user", related_name="lesson_progress")
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, verbose_name="lesson", related_name="progress")
+    viewed_at = models.DateTimeField(blank=True, null=True, verbose_name="viewed_at")
+    completed_at = models.DateTimeField(blank=True, null=True, verbose_name="completed_at")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="update_at")
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["user", "lesson"], name="lesson_progress_unique")]
+        verbose_name = "Прогресс по уроку"
+        verbose_name_plural = "Прогресс по урокам"
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.lesson_id}"
+
+
+class Tombstone(models.Model):
+    """Запись об удалённом курсе, уроке или подписке для инкрементальной синхронизации клиентов.
+
+    Хранится SYNC_TOMBSTONE_RETENTION_DAYS дней: клиент, не синхронизировавшийся дольше,
+    загружает данные заново.
+    """
+
+    class Kind(models.TextChoices):
+        """Виды удалённых объектов."""
+
+        COURSE = "course", "Course"
+        LESSON = "lesson", "Lesson"
+        SUBSCRIPTION = "subscription", "Subscription"
+
+    kind = models.CharField(max_length=16, choices=Kind.choices, verbose_name="kind")
+    object_id = models.PositiveBigIntegerField(verbose_name="object id")
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        verbose_name="user",
+        related_name="+",
+        help_text="Владелец курса или урока, пользователь подписки",
+    )
+    deleted_at = models.DateTimeField(default=timezone.now, verbose_name="deleted_at")
+
+    class Meta:
+        indexes = [models.Index(fields=["deleted_at", "id"], name="tombstone_deleted_idx")]
+        verbose_name = "Удалённый объект"
+        verbose_name_plural = "Удалённые объекты"
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id}"
+
+
+class CourseUpdateEvent(models.Model):
+    """Событие обновления курса (transactional outbox).
+
+    Записывается в одной транзакции с изменением курса или урока и разбирается
+    задачей dispatch_course_update_events.
+    """
+
+    class EventType(models.TextChoices):
+        """Виды изменений курса."""
+
+        COURSE_UPDATED = "course_updated", "Course updated"
+        LESSON_CREATED = "lesson_created", "Lesson created"
+        LESSON_UPDATED = "lesson_updated", "Lesson updated"
+
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, verbose_name="course", related_name="update_events")
+    event_type = models.CharField(max_length=32, choices=EventType.choices, verbose_name="event_type")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="payload", help_text="Что изменилось")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="created_at")
+    available_at = models.DateTimeField(
+        default=timezone.now, verbose_name="available_at", help_text="Не доставлять раньше этого времени"
+    )
+    processed_at = models.DateTimeField(blank=True, null=True, verbose_name="processed_at")
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(
+                fields=["available_at", "id"],
+                name="course_event_pending_idx",
+                condition=models.Q(processed_at__isnull=True),
+            ),
+        ]
+        verbose_name = "Событие обновления курса"
+        verbose_name_plural = "События обновления курсов"
+
+    def __str__(self):
+        return f"{self.event_type} #{self.course_id}"
+
+
+class PendingNotification(models.Model):
+    """Отложенное уведомление об обновлении курса для дайджеста.
+
+    На пару пользователь–курс хранится не более одной записи, повторные обновления курса
+    в пределах окна дайджеста схлопываются: запись получает ``batch`` последней рассылки.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="user", related_name="pending_notifications")
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, verbose_name="course", related_name="pending_notifications"
+    )
+    batch = models.PositiveBigIntegerField(default=0, verbose_name="batch", help_text="ID последнего события рассылки")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="created_at")
+
+    class Meta:
+        unique_together = ("user", "course")
+        verbose_name = "Отложенное уведомление"
+        verbose_name_plural = "Отложенные уведомления"
+
+    def __str__(self):
+        return f"{self.user} - {self.course}"
@@ -0,0 +1,233 @@
+from datetime import UTC, datetime
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.db import transaction
+from django.utils import timezone
+
+from config.cache import cache_key
+from materials.models import Lesson, LessonProgress
+from users.models import User
+
+PROGRESS_NAMESPACE = "progress"
+PROGRESS_FLUSH_SCHEDULED_KEY = cache_key(PROGRESS_NAMESPACE, "flush-scheduled")
+# Поля буфера: v:<lesson_id> — время просмотра, c:<lesson_id> — время прохождения (в микросекундах)
+VIEWED, COMPLETED = "v", "c"
+
+# Удаляет перенесённые в таблицу поля хеша, если их значения не изменились после чтения;
+# возвращает число оставшихся полей
+DISCARD_FLUSHED_SCRIPT = """
+for i = 1, #ARGV, 2 do
+    if redis.call("HGET", KEYS[1], ARGV[i]) == ARGV[i + 1] then
+        redis.call("HDEL", KEYS[1], ARGV[i])
+    end
+end
+return redis.call("HLEN", KEYS[1])
+"""
+
+
+def _timestamp(moment):
+    return str(int(moment.timestamp() * 1_000_000))
+
+
+def _datetime(timestamp):
+    return datetime.fromtimestamp(int(timestamp) / 1_000_000, tz=UTC)
+
+
+class RedisProgressBuffer:
+    """Буфер отметок в Redis: хеш на пару пользователь–курс и множество хешей, ожидающих переноса."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.dirty_key = self._key("dirty")
+
+    def _key(self, *parts):
+        return self.backend.make_and_validate_key(cache_key(PROGRESS_NAMESPACE, *parts))
+
+    def _client(self):
+        return self.backend._cache.get_client(write=True)
+
+    def add(self, member, viewed, completed):
+        key = self._key(member)
+        pipeline = self._client().pipeline(transaction=False)
+        for field, value in viewed.items():
+            pipeline.hset(key, field, value)
+        for field, value in completed.items():
+            # Время прохождения не перезаписывается повторными отметками
+            pipeline.hsetnx(key, field, value)
+        pipeline.sadd(self.dirty_key, member)
+        pipeline.execute()
+
+    def read(self, member):
+        return {field.decode(): value.decode() for field, value in self._client().hgetall(self._key(member)).items()}
+
+    def pop_dirty(self, count):
+        return [member.decode() for member in self._client().spop(self.dirty_key, count) or []]
+
+    def mark_dirty(self, members):
+        if members:
+            self._client().sadd(self.dirty_key, *members)
+
+    def discard(self, member, fields):
+        args = [item for field_value in fields.items() for item in field_value]
+        return self._client().eval(DISCARD_FLUSHED_SCRIPT, 1, self._key(member), *args)
+
+
+class CacheProgressBuffer:
+    """Буфер отметок в обычном кеше Django для разработки и тестов; операции не атомарны."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.dirty_key = cache_key(PROGRESS_NAMESPACE, "dirty")
+
+    def add(self, member, viewed, completed):
+        key = cache_key(PROGRESS_NAMESPACE, member)
+        fields = self.backend.get(key, {})
+        fields.update(viewed)
+        for field, value in completed.items():
+            fields.setdefault(field, value)
+        self.backend.set(key, fields, timeout=None)
+        self.mark_dirty([member])
+
+    def read(self, member):
+        return self.backend.get(cache_key(PROGRESS_NAMESPACE, member), {})
+
+    def pop_dirty(self, count):
+        dirty = sorted(self.backend.get(self.dirty_key, set()))
+        self.backend.set(self.dirty_key, set(dirty[count:]), timeout=None)
+        return dirty[:count]
+
+    def mark_dirty(self, members):
+        if members:
+            self.backend.set(self.dirty_key, self.backend.get(self.dirty_key, set()) | set(members), timeout=None)
+
+    def discard(self, member, fields):
+        key = cache_key(PROGRESS_NAMESPACE, member)
+        remaining = {field: value for field, value in self.backend.get(key, {}).items() if fields.get(field) != value}
+        if remaining:
+            self.backend.set(key, remaining, timeout=None)
+        else:
+            self.backend.delete(key)
+        return len(remaining)
+
+
+def get_progress_buffer():
+    """Буфер отметок: Redis-хеши, если кеш по умолчанию — Redis, иначе сам кеш."""
+
+    backend = caches["default"]
+    if isinstance(backend, RedisCache):
+        return RedisProgressBuffer(backend)
+    return CacheProgressBuffer(backend)
+
+
+def record_lesson_progress(user_id, lesson, completed=False):
+    """Отмечает просмотр (и прохождение) урока в буфере, не обращаясь к базе данных на запись."""
+
+    timestamp = _timestamp(timezone.now())
+    completed_fields = {f"{COMPLETED}:{lesson.pk}": timestamp} if completed else {}
+    get_progress_buffer().add(f"{user_id}:{lesson.course_id}", {f"{VIEWED}:{lesson.pk}": timestamp}, completed_fields)
+    schedule_progress_flush()
+
+
+def schedule_progress_flush():
+    """Планирует перенос буфера в таблицу через LESSON_PROGRESS_FLUSH_DELAY секунд, если он ещё не запланирован."""
+
+    from materials.tasks import flush_lesson_progress  # tasks импортирует progress
+
+    delay = settings.LESSON_PROGRESS_FLUSH_DELAY
+    if cache.add(PROGRESS_FLUSH_SCHEDULED_KEY, True, timeout=delay):
+        flush_lesson_progress.apply_async(countdown=delay)
+
+
+def flush_progress_buffer(batch_size):
+    """Переносит до ``batch_size`` пар пользователь–курс из буфера в LessonProgress.
+
+    Записи сливаются с уже сохранёнными: время прохождения не затирается, время просмотра берётся
+    последнее. Из буфера удаляются только поля, не изменившиеся за время переноса. Возвращает число
+    обработанных пар и число записанных строк.
+    """
+
+    buffer = get_progress_buffer()
+    members = buffer.pop_dirty(batch_size)
+    if not members:
+        return 0, 0
+
+    try:
+        buffered = {member: buffer.read(member) for member in members}
+        progress = {}
+        for member, fields in buffered.items():
+            user_id = int(member.split(":")[0])
+            for field, value in fields.items():
+                kind, lesson_id = field.split(":")
+                entry = progress.setdefault((user_id, int(lesson_id)), {"viewed_at": None, "completed_at": None})
+                entry["viewed_at" if kind == VIEWED else "completed_at"] = _datetime(value)
+
+        with transaction.atomic():
+            # Урок или пользователь могли быть удалены, пока отметка ждала переноса
+            existing_lessons = set(
+                Lesson.objects.filter(pk__in={lesson_id for _, lesson_id in progress}).values_list("pk", flat=True)
+            )
+            existing_users = set(
+                User.objects.filter(pk__in={user_id for user_id, _ in progress}).values_list("pk", flat=True)
+            )
+            saved = {
+                (row.user_id, row.lesson_id): row
+                for row in LessonProgress.objects.filter(user_id__in=existing_users, lesson_id__in=existing_lessons)
+            }
+            rows = []
+            for (user_id, lesson_id), entry in progress.items():
+                if lesson_id not in existing_lessons or user_id not in existing_users:
+                    continue
+                row = saved.get((user_id, lesson_id))
+                viewed = [moment for moment in (entry["viewed_at"], row and row.viewed_at) if moment]
+                completed = [moment for moment in (entry["completed_at"], row and row.completed_at) if moment]
+                rows.append(
+                    LessonProgress(
+                        user_id=user_id,
+                        lesson_id=lesson_id,
+                        viewed_at=max(viewed, default=None),
+                        completed_at=min(completed, default=None),
+                    )
+                )
+            LessonProgress.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=["user", "lesson"],
+                update_fields=["viewed_at", "completed_at", "updated_at"],
+            )
+    except BaseException:
+        buffer.mark_dirty(members)
+        raise
+
+    buffer.mark_dirty([member for member, fields in buffered.items() if buffer.discard(member, fields)])
+    return len(members), len(rows)
+
+
+def course_progress(user_id, course_id):
+    """Прогресс пользователя по курсу с учётом ещё не перенесённых из буфера отметок."""
+
+    lesson_ids = set(Lesson.objects.filter(course_id=course_id).values_list("pk", flat=True))
+    viewed, completed = set(), set()
+    for lesson_id, viewed_at, completed_at in LessonProgress.objects.filter(
+        user_id=user_id, lesson_id__in=lesson_ids
+    ).values_list("lesson_id", "viewed_at", "completed_at"):
+        if viewed_at:
+            viewed.add(lesson_id)
+        if completed_at:
+            completed.add(lesson_id)
+
+    for field in get_progress_buffer().read(f"{user_id}:{course_id}"):
+        kind, lesson_id = field.split(":")
+        (viewed if kind == VIEWED else completed).add(int(lesson_id))
+
+    viewed &= lesson_ids
+    completed &= lesson_ids
+    return {
+        "course": course_id,
+        "lessons": len(lesson_ids),
+        "viewed": len(viewed),
+        "completed": len(completed),
+        "percent": round(100 * len(completed) / len(lesson_ids), 1) if lesson_ids else 0.0,
+        "completed_lessons": sorted(completed),
+    }
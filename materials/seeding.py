@@ -0,0 +1,291 @@
+import io
+import json
+import math
+import random
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from materials.models import Course, Lesson, Subscription
+from materials.services import LESSON_RANK_GAP
+from users.models import Payment, User
+
+# Конец периода, в котором генерируются даты; фиксирован, чтобы данные зависели только от seed
+SEED_UNTIL = datetime(2025, 1, 1, tzinfo=timezone.utc)
+SEED_YEARS = 3
+# Скачки оплат по месяцам: пики в сентябре, январе и ноябре, провал летом
+MONTH_WEIGHTS = (1.3, 1.1, 1.0, 0.9, 0.8, 0.6, 0.5, 0.7, 1.4, 1.2, 1.3, 1.0)
+# Популярность курсов по закону Ципфа: k-й по популярности курс набирает ~1/k^s подписчиков
+COURSE_POPULARITY_EXPONENT = 1.1
+
+FIRST_NAMES = (
+    "Alexander Maria Dmitry Anna Ivan Elena Sergey Olga Andrey Natalia "
+    "Mikhail Irina Nikolay Tatiana Pavel Svetlana Artem Ekaterina Maxim Yulia"
+).split()
+LAST_NAMES = (
+    "Ivanov Smirnov Kuznetsov Popov Vasiliev Petrov Sokolov Mikhailov Novikov "
+    "Fedorov Morozov Volkov Alekseev Lebedev Semenov Egorov Pavlov Kozlov"
+).split()
+CITIES = ("Москва", "Санкт-Петербург", "Новосибирск", "Екатеринбург", "Казань", "Нижний Новгород", "Самара")
+CITY_WEIGHTS = tuple(accumulate((40, 20, 8, 8, 8, 8, 8)))
+TOPICS = (
+    "Python",
+    "Django",
+    "SQL",
+    "PostgreSQL",
+    "Docker",
+    "Linux",
+    "JavaScript",
+    "Алгоритмы",
+    "Машинное обучение",
+    "Анализ данных",
+    "Тестирование",
+    "DevOps",
+)
+LEVELS = ("для начинающих", "с нуля", "для профессионалов", "на практике", "продвинутый курс", "интенсив")
+
+
+def _copy_value(value):
+    """Значение в текстовом формате COPY."""
+
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, ensure_ascii=False)
+    elif isinstance(value, datetime):
+        value = value.isoformat()
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+class TableWriter:
+    """Пакетная запись строк в таблицу модели в обход ORM: COPY в PostgreSQL, INSERT пачками в других СУБД.
+
+    Строки — словари по attname полей; отсутствующие поля получают значение по умолчанию.
+    Даты auto_now_add записываются как есть, сигналы моделей не вызываются.
+    """
+
+    def __init__(self, model, batch_size):
+        self.model = model
+        self.batch_size = batch_size
+        self.fields = model._meta.concrete_fields
+        self.defaults = {field.attname: field.get_default() for field in self.fields}
+        self.rows = []
+        self.written = 0
+
+    def add(self, row):
+        self.rows.append([row.get(field.attname, self.defaults[field.attname]) for field in self.fields])
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        columns = ", ".join(connection.ops.quote_name(field.column) for field in self.fields)
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                self._copy(cursor.cursor, f"COPY {table} ({columns}) FROM STDIN")
+            else:
+                placeholders = ", ".join(["%s"] * len(self.fields))
+                cursor.executemany(
+                    f"INSERT INTO {table} ({columns}) VALUES ({placeholders})",
+                    [
+                        [field.get_db_prep_save(value, connection) for field, value in zip(self.fields, row)]
+                        for row in self.rows
+                    ],
+                )
+        self.written += len(self.rows)
+        self.rows = []
+
+    def _copy(self, cursor, sql):
+        buffer = io.StringIO()
+        for row in self.rows:
+            buffer.write("\t".join(_copy_value(value) for value in row))
+            buffer.write("\n")
+        buffer.seek(0)
+        if hasattr(cursor, "copy_expert"):
+            cursor.copy_expert(sql, buffer)
+        else:
+            # psycopg 3
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+
+def _next_pk(model):
+    return (model.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+
+
+class DatasetGenerator:
+    """Генератор синтетических данных: одинаковый seed на одинаковой базе даёт одинаковые строки."""
+
+    def __init__(self, seed, until=SEED_UNTIL):
+        self.rng = random.Random(seed)
+        self.until = until.timestamp()
+        self.since = (until - timedelta(days=365 * SEED_YEARS)).timestamp()
+        self.max_month_weight = max(MONTH_WEIGHTS)
+
+    def moment(self, since=None):
+        """Случайный момент после ``since`` с сезонностью по месяцам (выборка с отклонением)."""
+
+        since = self.since if since is None else since
+        while True:
+            timestamp = self.rng.uniform(since, self.until)
+            moment = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+            if self.rng.random() * self.max_month_weight < MONTH_WEIGHTS[moment.month - 1]:
+                return moment
+
+    def joined(self):
+        """Дата регистрации: число регистраций растёт к концу периода."""
+
+        return datetime.fromtimestamp(
+            self.since + (self.until - self.since) * math.sqrt(self.rng.random()), tz=timezone.utc
+        )
+
+    def user(self, pk):
+        first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+        return {
+            "id": pk,
+            "password": UNUSABLE_PASSWORD_PREFIX,
+            "first_name": first,
+            "last_name": last,
+            "email": f"{first}.{last}.{pk}@example.com".lower(),
+            "is_active": self.rng.random() < 0.95,
+            "date_joined": self.joined(),
+            "phone": f"79{self.rng.randrange(10**9):09d}" if self.rng.random() < 0.6 else None,
+            "city": self.rng.choices(CITIES, cum_weights=CITY_WEIGHTS)[0],
+            "email_notifications": self.rng.random() < 0.8,
+            "telegram_notifications": self.rng.random() < 0.3,
+        }
+
+    def course(self, pk, owner_id):
+        topic = self.rng.choice(TOPICS)
+        return {
+            "id": pk,
+            "name": f"{topic} {self.rng.choice(LEVELS)} #{pk}",
+            "description": f"Курс по теме «{topic}».",
+            "owner_id": owner_id,
+            "updated_at": self.moment(),
+        }
+
+    def lessons_count(self, mean):
+        """Число уроков курса: логнормальное распределение со средним ``mean``."""
+
+        return max(1, round(self.rng.lognormvariate(math.log(mean) - 0.125, 0.5)))
+
+    def subscriptions_count(self, mean, limit):
+        """Число подписок пользователя: экспоненциальное распределение, многие ни на что не подписаны."""
+
+        return min(limit, int(self.rng.expovariate(1 / mean))) if mean else 0
+
+    def price(self):
+        return max(990, int(round(self.rng.lognormvariate(math.log(15000), 0.6), -2)))
+
+
+def seed_dataset(
+    users, courses, lessons_per_course, subscriptions_per_user, paid_share, seed, batch_size, until=SEED_UNTIL
+):
+    """Заполняет базу синтетическими пользователями, курсами, уроками, подписками и платежами.
+
+    Данные дописываются после существующих строк с явными ID, счётчики ID затем сдвигаются.
+    Популярность курсов распределена по Ципфу, даты подписок и платежей — с сезонностью.
+    Возвращает число записанных строк по моделям.
+    """
+
+    generator = DatasetGenerator(seed, until)
+    rng = generator.rng
+    writers = {model: TableWriter(model, batch_size) for model in (User, Course, Lesson, Subscription, Payment)}
+
+    with transaction.atomic():
+        first_user = _next_pk(User)
+        # Время регистрации пользователей нужно для дат подписок; массив float занимает 8 байт на пользователя
+        joined = array("d")
+        for pk in range(first_user, first_user + users):
+            row = generator.user(pk)
+            joined.append(row["date_joined"].timestamp())
+            writers[User].add(row)
+        writers[User].flush()
+
+        # Авторами курсов становятся первые 2% пользователей
+        authors = max(1, users // 50)
+        first_course = _next_pk(Course)
+        course_ids = list(range(first_course, first_course + courses))
+        prices = {}
+        next_lesson = _next_pk(Lesson)
+        for pk in course_ids:
+            owner_id = first_user + rng.randrange(authors) if users else None
+            course = generator.course(pk, owner_id)
+            writers[Course].add(course)
+            prices[pk] = generator.price()
+            for position in range(1, generator.lessons_count(lessons_per_course) + 1):
+                writers[Lesson].add(
+                    {
+                        "id": next_lesson,
+                        "name": f"{course['name']}: урок {position}",
+                        "description": f"Урок {position} курса «{course['name']}».",
+                        "course_id": pk,
+                        "owner_id": owner_id,
+                        "rank": position * LESSON_RANK_GAP,
+                        "updated_at": course["updated_at"],
+                    }
+                )
+                next_lesson += 1
+        writers[Course].flush()
+        writers[Lesson].flush()
+
+        if course_ids:
+            popular = course_ids[:]
+            rng.shuffle(popular)
+            popularity = list(accumulate(1 / rank**COURSE_POPULARITY_EXPONENT for rank in range(1, len(popular) + 1)))
+            course_type_id = ContentType.objects.get_for_model(Course).pk
+            next_subscription, next_payment = _next_pk(Subscription), _next_pk(Payment)
+            for index in range(users):
+                user_id = first_user + index
+                wanted = generator.subscriptions_count(subscriptions_per_user, len(popular))
+                chosen = set()
+                for _ in range(wanted * 10):
+                    if len(chosen) == wanted:
+                        break
+                    chosen.add(popular[bisect_left(popularity, rng.random() * popularity[-1])])
+                for course_id in sorted(chosen):
+                    created_at = generator.moment(joined[index])
+                    writers[Subscription].add(
+                        {
+                            "id": next_subscription,
+                            "user_id": user_id,
+                            "course_id": course_id,
+                            "created_at": created_at,
+                            "updated_at": created_at,
+                            "is_active": rng.random() < 0.9,
+                        }
+                    )
+                    next_subscription += 1
+                    if rng.random() < paid_share:
+                        writers[Payment].add(
+                            {
+                                "id": next_payment,
+                                "payment_method": rng.choices(Payment.PaymentMethod.values, cum_weights=(30, 100))[0],
+                                "amount": prices[course_id],
+                                "user_id": user_id,
+                                "payment_date": created_at,
+                                "content_type_id": course_type_id,
+                                "object_id": course_id,
+                            }
+                        )
+                        next_payment += 1
+        writers[Subscription].flush()
+        writers[Payment].flush()
+
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), list(writers)):
+                cursor.execute(sql)
+
+    return {model._meta.verbose_name_plural: writer.written for model, writer in writers.items()}
@@ -1,20 +1,40 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 from rest_framework.fields import SerializerMethodField
 
-from materials.models import Course, Lesson, Subscription
+from config.values_serializers import ValuesSerializer
+from materials.models import Course, Lesson, Subscription, VideoMetadata
+from materials.services import ordered_lessons
 from materials.validators import validate_link_verification
 
 
+class ImageRenditionsField(serializers.Field):
+    """Ссылки на уменьшенные копии изображения: {"thumb": url, ...}."""
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get("request")
+        urls = {}
+        for name, path in value.get("files", {}).items():
+            url = default_storage.url(path)
+            urls[name] = request.build_absolute_uri(url) if request is not None else url
+        return urls
+
+
 class CourseSerializer(serializers.ModelSerializer):
     """Сериалайзер курса."""
 
+    preview_renditions = ImageRenditionsField()
     lessons = SerializerMethodField()
     count_lesson = SerializerMethodField()
     subscription = SerializerMethodField()
 
     def get_lessons(self, course):
-        """Возвращает список названий уроков курса."""
-        return [lesson.name for lesson in Lesson.objects.filter(course=course)]
+        """Возвращает список названий уроков курса в порядке программы."""
+        return list(ordered_lessons(course.pk).values_list("name", flat=True))
 
     def get_count_lesson(self, course):
         """Возвращает количество уроков в курсе."""
@@ -25,28 +45,63 @@ class CourseSerializer(serializers.ModelSerializer):
         request = self.context.get("request")
 
         if request and request.user.is_authenticated:
-            return Subscription.objects.filter(user=request.user, course=course).exists()
+            return Subscription.objects.filter(user_id=request.user.pk, course=course).exists()
         return False
 
     class Meta:
         model = Course
-        fields = "__all__"
+        exclude = ("preview_sha256",)
 
 
 class LessonSerializer(serializers.ModelSerializer):
     """Сериалайзер урока."""
 
     video = serializers.URLField(validators=[validate_link_verification])
+    preview_renditions = ImageRenditionsField()
 
     class Meta:
         model = Lesson
-        fields = "__all__"
+        exclude = ("video_metadata", "rank", "updated_at", "preview_sha256")
+
+
+class LessonReorderSerializer(serializers.Serializer):
+    """Новый порядок всех уроков курса."""
+
+    lessons = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
+
+class LessonMoveSerializer(serializers.Serializer):
+    """Урок, после которого ставится перемещаемый урок; null — в начало курса."""
+
+    after = serializers.PrimaryKeyRelatedField(queryset=Lesson.objects.all(), allow_null=True)
+
+
+class LessonProgressSerializer(serializers.Serializer):
+    """Отметка просмотра урока."""
+
+    completed = serializers.BooleanField(default=False)
+
+
+class VideoMetadataSerializer(serializers.ModelSerializer):
+    """Сериалайзер метаданных видео."""
+
+    class Meta:
+        model = VideoMetadata
+        fields = ("video_id", "title", "duration", "thumbnail_url", "is_available")
+
+
+class LessonValuesSerializer(ValuesSerializer):
+    """Быстрый сериализатор списка уроков, совместимый с LessonSerializer."""
+
+    model_serializer = LessonSerializer
 
 
 class LessonDetailSerializer(serializers.ModelSerializer):
     """Детальный сериалайзер урока."""
 
     course_info = SerializerMethodField()
+    preview_renditions = ImageRenditionsField()
+    video_metadata = VideoMetadataSerializer(read_only=True)
 
     def get_course_info(self, obj):
         """Возвращает краткую информацию о курсе."""
@@ -60,4 +115,13 @@ class LessonDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Lesson
-        fields = ("id", "name", "description", "preview", "video", "course_info")
+        fields = (
+            "id",
+            "name",
+            "description",
+            "preview",
+            "preview_renditions",
+            "video",
+            "video_metadata",
+            "course_info",
+        )
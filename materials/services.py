@@ -1,9 +1,326 @@
-import requests
+from bisect import bisect_left
 
-from config import settings
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q
+from django.utils import timezone
+
+from config.clients import http_session
+from materials.models import (Course, CourseUpdateEvent, Lesson, NotificationDelivery, Subscription, Tombstone,
+                              VideoMetadata)
+from materials.video import parse_video_id
+
+OUTBOX_DISPATCH_SCHEDULED_KEY = "materials:outbox:dispatch-scheduled"
+VIDEO_INGEST_SCHEDULED_KEY = "materials:video:ingest-scheduled"
+LESSON_REBALANCE_SCHEDULED_KEY = "materials:lessons:rebalance-scheduled:{}"
+
+# Промежуток между рангами соседних уроков; при промежутке меньше LESSON_RANK_MIN_GAP
+# ранги курса пересчитываются в фоне
+LESSON_RANK_GAP = 1 << 16
+LESSON_RANK_MIN_GAP = 16
 
 
 def send_telegram_message(chat_id, message):
     """Отправка сообщения в Телеграм."""
     params = {"chat_id": chat_id, "text": message}
-    requests.get(f"{settings.TELEGRAM_URL}{settings.TELEGRAM_TOKEN}/sendMessage", params=params)
+    http_session().get(f"{settings.TELEGRAM_URL}{settings.TELEGRAM_TOKEN}/sendMessage", params=params)
+
+
+def record_course_event(course, event_type, payload=None):
+    """Записывает событие обновления курса в outbox.
+
+    Вызывается внутри транзакции, изменяющей курс или урок; разбор outbox
+    планируется только после её фиксации.
+    """
+
+    event = CourseUpdateEvent.objects.create(course=course, event_type=event_type, payload=payload or {})
+    transaction.on_commit(schedule_course_events_dispatch)
+    return event
+
+
+def schedule_course_events_dispatch(eta=None):
+    """Планирует разбор outbox через OUTBOX_DISPATCH_DELAY секунд или к моменту ``eta``.
+
+    ``eta`` дальше OUTBOX_SWEEP_INTERVAL не планируется: такие события разберёт страховочный
+    запуск, а задача не ждёт в брокере дольше visibility_timeout. В кеше хранится время уже
+    запланированного запуска: повторные изменения новых задач не создают, новая задача
+    ставится, только если разбор нужен раньше запланированного.
+    """
+
+    from materials.tasks import dispatch_course_update_events  # tasks импортирует services
+
+    delay = settings.OUTBOX_DISPATCH_DELAY
+    now = timezone.now()
+    countdown = delay
+    if eta is not None:
+        countdown = min(max(delay, (eta - now).total_seconds()), settings.OUTBOX_SWEEP_INTERVAL)
+    run_at = now.timestamp() + countdown
+    timeout = countdown + delay
+    if not cache.add(OUTBOX_DISPATCH_SCHEDULED_KEY, run_at, timeout=timeout):
+        scheduled = cache.get(OUTBOX_DISPATCH_SCHEDULED_KEY)
+        if scheduled is not None and scheduled <= run_at:
+            return
+        cache.set(OUTBOX_DISPATCH_SCHEDULED_KEY, run_at, timeout=timeout)
+    dispatch_course_update_events.apply_async(countdown=countdown)
+
+
+def schedule_image_renditions(instance, field_name):
+    """Планирует генерацию копий изображения после фиксации транзакции, если исходник изменился."""
+
+    from materials.tasks import generate_image_renditions  # tasks импортирует services
+
+    field_file = getattr(instance, field_name)
+    renditions = getattr(instance, f"{field_name}_renditions")
+    if renditions.get("source") == (field_file.name or None):
+        return
+
+    transaction.on_commit(lambda: generate_image_renditions.delay(instance._meta.label, instance.pk, field_name))
+
+
+def link_lesson_video(lesson):
+    """Обновляет ID видео урока по ссылке и привязывает уже загруженные метаданные этого видео."""
+
+    video_id = parse_video_id(lesson.video)
+    if video_id == lesson.video_id:
+        return
+    lesson.video_id = video_id
+    lesson.video_metadata = VideoMetadata.objects.filter(video_id=video_id).first() if video_id else None
+
+
+def schedule_video_metadata_ingestion():
+    """Планирует загрузку метаданных видео через VIDEO_METADATA_DELAY секунд, если она ещё не запланирована."""
+
+    from materials.tasks import ingest_video_metadata  # tasks импортирует services
+
+    delay = settings.VIDEO_METADATA_DELAY
+    if cache.add(VIDEO_INGEST_SCHEDULED_KEY, True, timeout=delay):
+        ingest_video_metadata.apply_async(countdown=delay)
+
+
+def store_video_metadata(video_ids, fetched):
+    """Сохраняет полученные от провайдера метаданные; видео, которых нет в ответе, помечаются недоступными."""
+
+    now = timezone.now()
+    VideoMetadata.objects.bulk_create(
+        [
+            (
+                VideoMetadata(video_id=video_id, checked_at=now, is_available=True, **fetched[video_id])
+                if video_id in fetched
+                else VideoMetadata(video_id=video_id, checked_at=now, is_available=False)
+            )
+            for video_id in video_ids
+        ],
+        update_conflicts=True,
+        unique_fields=["video_id"],
+        update_fields=["title", "duration", "thumbnail_url", "is_available", "checked_at"],
+    )
+
+
+def course_delivery_stats(course, limit=20):
+    """Статистика доставки последних ``limit`` рассылок курса."""
+
+    channel_counts = {
+        channel: Count("id", filter=Q(channel=channel)) for channel in NotificationDelivery.Channel.values
+    }
+    return list(
+        NotificationDelivery.objects.filter(course=course)
+        .values("batch")
+        .annotate(
+            recipients=Count("user", distinct=True),
+            **channel_counts,
+            started_at=Min("delivered_at"),
+            finished_at=Max("delivered_at"),
+        )
+        .order_by("-batch")[:limit]
+    )
+
+
+def record_tombstone(instance):
+    """Записывает удаление курса, урока или подписки для инкрементальной синхронизации."""
+
+    kind, user_id = {
+        Course: (Tombstone.Kind.COURSE, instance.__dict__.get("owner_id")),
+        Lesson: (Tombstone.Kind.LESSON, instance.__dict__.get("owner_id")),
+        Subscription: (Tombstone.Kind.SUBSCRIPTION, instance.__dict__.get("user_id")),
+    }[type(instance)]
+    Tombstone.objects.create(kind=kind, object_id=instance.pk, user_id=user_id)
+
+
+def touch_courses(course_ids):
+    """Обновляет updated_at курсов, у которых изменились уроки."""
+
+    if course_ids:
+        Course.objects.filter(pk__in=course_ids).update(updated_at=timezone.now())
+
+
+def touch_course_lessons(course_id):
+    """Обновляет updated_at уроков курса: при удалении курса они остаются без него (SET_NULL)."""
+
+    Lesson.objects.filter(course_id=course_id).update(updated_at=timezone.now())
+
+
+def next_lesson_rank(course_id):
+    """Ранг для урока, добавляемого в конец курса."""
+
+    last = Lesson.objects.filter(course_id=course_id).aggregate(rank=Max("rank"))["rank"]
+    return LESSON_RANK_GAP if last is None else last + LESSON_RANK_GAP
+
+
+def ordered_lessons(course_id):
+    """Уроки курса в порядке программы."""
+
+    return Lesson.objects.filter(course_id=course_id).order_by("rank", "id")
+
+
+def _increasing_subsequence(values):
+    """Индексы самой длинной строго возрастающей подпоследовательности ``values``."""
+
+    tails, tail_indices, previous = [], [], [None] * len(values)
+    for index, value in enumerate(values):
+        position = bisect_left(tails, value)
+        if position:
+            previous[index] = tail_indices[position - 1]
+        if position == len(tails):
+            tails.append(value)
+            tail_indices.append(index)
+        else:
+            tails[position] = value
+            tail_indices[position] = index
+
+    result, index = [], tail_indices[-1] if tail_indices else None
+    while index is not None:
+        result.append(index)
+        index = previous[index]
+    return result[::-1]
+
+
+def _ranks_between(low, high, count):
+    """``count`` возрастающих рангов строго между ``low`` и ``high`` (None — край курса) и шаг между ними."""
+
+    if low is None and high is None:
+        return [LESSON_RANK_GAP * (i + 1) for i in range(count)], LESSON_RANK_GAP
+    if high is None:
+        return [low + LESSON_RANK_GAP * (i + 1) for i in range(count)], LESSON_RANK_GAP
+    if low is None:
+        return [high - LESSON_RANK_GAP * (count - i) for i in range(count)], LESSON_RANK_GAP
+    step = (high - low) // (count + 1)
+    return [low + step * (i + 1) for i in range(count)], step
+
+
+def _assign_ranks(lessons):
+    """Назначает ранги урокам в заданном порядке, меняя как можно меньше строк.
+
+    Уроки из самой длинной подпоследовательности, уже упорядоченной по рангу, сохраняют ранги,
+    остальные получают ранги в промежутках между ними. Если места в промежутке не хватает,
+    ранги всех уроков пересчитываются. Возвращает изменённые уроки и наименьший использованный шаг.
+    """
+
+    kept = set(_increasing_subsequence([lesson.rank for lesson in lessons if lesson.rank is not None]))
+    ranked = [index for index, lesson in enumerate(lessons) if lesson.rank is not None]
+    kept = {ranked[i] for i in kept}
+
+    assigned, min_step, run = [], LESSON_RANK_GAP, []
+    for index in range(len(lessons) + 1):
+        if index < len(lessons) and index not in kept:
+            run.append(lessons[index])
+            continue
+        if run:
+            low = lessons[index - len(run) - 1].rank if index > len(run) else None
+            high = lessons[index].rank if index < len(lessons) else None
+            ranks, step = _ranks_between(low, high, len(run))
+            if step < 1:
+                return _renumber(lessons), LESSON_RANK_GAP
+            assigned.extend(zip(run, ranks))
+            min_step = min(min_step, step)
+            run = []
+
+    for lesson, rank in assigned:
+        lesson.rank = rank
+    return [lesson for lesson, _ in assigned], min_step
+
+
+def _renumber(lessons):
+    """Равномерно пересчитывает ранги уроков; возвращает уроки, ранг которых изменился."""
+
+    changed = []
+    for index, lesson in enumerate(lessons):
+        rank = LESSON_RANK_GAP * (index + 1)
+        if lesson.rank != rank:
+            lesson.rank = rank
+            changed.append(lesson)
+    return changed
+
+
+def _save_ranks(course_id, lessons, min_step=LESSON_RANK_GAP):
+    """Сохраняет ранги одним bulk_update и планирует перебалансировку, если промежутки стали малы."""
+
+    if lessons:
+        now = timezone.now()
+        for lesson in lessons:
+            lesson.updated_at = now
+        Lesson.objects.bulk_update(lessons, ["rank", "updated_at"])
+        touch_courses({course_id})
+    if min_step < LESSON_RANK_MIN_GAP:
+        transaction.on_commit(lambda: schedule_lesson_rebalance(course_id))
+
+
+def reorder_lessons(course, lesson_ids):
+    """Переставляет уроки курса в порядке ``lesson_ids``; список должен содержать все уроки курса.
+
+    Возвращает число уроков, ранг которых изменился.
+    """
+
+    with transaction.atomic():
+        lessons = {lesson.pk: lesson for lesson in ordered_lessons(course.pk).select_for_update().only("id", "rank")}
+        if len(lesson_ids) != len(set(lesson_ids)) or set(lesson_ids) != set(lessons):
+            raise ValueError("Список должен содержать каждый урок курса ровно один раз")
+
+        changed, min_step = _assign_ranks([lessons[lesson_id] for lesson_id in lesson_ids])
+        _save_ranks(course.pk, changed, min_step)
+    return len(changed)
+
+
+def move_lesson(lesson, after=None):
+    """Перемещает урок сразу после урока ``after`` того же курса или, если он не указан, в начало курса."""
+
+    if lesson.course_id is None:
+        raise ValueError("Урок не привязан к курсу")
+    if after is not None and (after.course_id != lesson.course_id or after.pk == lesson.pk):
+        raise ValueError("Урок можно переместить только относительно другого урока того же курса")
+
+    with transaction.atomic():
+        lessons = [
+            item
+            for item in ordered_lessons(lesson.course_id).select_for_update().only("id", "rank")
+            if item.pk != lesson.pk
+        ]
+        position = 0
+        if after is not None:
+            # Урок after мог быть удалён или перенесён в другой курс после проверки выше
+            position = next((i + 1 for i, item in enumerate(lessons) if item.pk == after.pk), None)
+            if position is None:
+                raise ValueError("Урок, после которого нужно поставить урок, больше не входит в курс")
+        moved = Lesson(pk=lesson.pk, rank=None)
+        changed, min_step = _assign_ranks(lessons[:position] + [moved] + lessons[position:])
+        _save_ranks(lesson.course_id, changed, min_step)
+    lesson.rank = moved.rank
+
+
+def rebalance_lesson_ranks(course_id):
+    """Равномерно пересчитывает ранги уроков курса; возвращает число изменённых уроков."""
+
+    with transaction.atomic():
+        changed = _renumber(list(ordered_lessons(course_id).select_for_update().only("id", "rank")))
+        _save_ranks(course_id, changed)
+    return len(changed)
+
+
+def schedule_lesson_rebalance(course_id):
+    """Планирует перебалансировку рангов курса, если она ещё не запланирована."""
+
+    from materials.tasks import rebalance_course_lessons  # tasks импортирует services
+
+    delay = settings.LESSON_REBALANCE_DELAY
+    if cache.add(LESSON_REBALANCE_SCHEDULED_KEY.format(course_id), True, timeout=delay):
+        rebalance_course_lessons.apply_async((course_id,), countdown=delay)
@@ -0,0 +1,99 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from materials.media import forget_media_entitlements, forget_media_owners
+from materials.models import Course, Lesson, Subscription
+from materials.services import (link_lesson_video, next_lesson_rank, record_tombstone, schedule_image_renditions,
+                                schedule_video_metadata_ingestion, touch_course_lessons, touch_courses)
+from users.models import Payment
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Lesson)
+def course_preview_renditions(sender, instance, **kwargs):
+    """Обновляет копии превью курса или урока после сохранения."""
+
+    schedule_image_renditions(instance, "preview")
+
+
+@receiver(pre_save, sender=Lesson)
+def lesson_video_id(sender, instance, raw=False, **kwargs):
+    """Обновляет ID видео урока перед сохранением."""
+
+    if not raw:
+        link_lesson_video(instance)
+
+
+@receiver(pre_save, sender=Lesson)
+def lesson_rank(sender, instance, raw=False, **kwargs):
+    """Ставит новый урок и урок, перенесённый в другой курс, в конец программы курса."""
+
+    if raw or instance.course_id is None:
+        return
+    moved = getattr(instance, "_loaded_course_id", None) not in (None, instance.course_id)
+    if instance.rank is None or moved:
+        instance.rank = next_lesson_rank(instance.course_id)
+
+
+@receiver(post_save, sender=Lesson)
+def lesson_video_metadata(sender, instance, raw=False, **kwargs):
+    """Планирует загрузку метаданных видео, которого ещё нет в VideoMetadata."""
+
+    if not raw and instance.video_id and instance.video_metadata_id is None:
+        transaction.on_commit(schedule_video_metadata_ingestion)
+
+
+@receiver(post_init, sender=Lesson)
+def remember_lesson_course(sender, instance, **kwargs):
+    """Запоминает курс загруженного урока, чтобы при переносе обновить и прежний курс."""
+
+    instance._loaded_course_id = instance.__dict__.get("course_id")
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def lesson_touches_course(sender, instance, raw=False, **kwargs):
+    """Изменение урока меняет updated_at его курса: по нему строятся изменения каталога."""
+
+    if not raw:
+        touch_courses({instance.course_id, getattr(instance, "_loaded_course_id", None)} - {None})
+    instance._loaded_course_id = instance.course_id
+
+
+@receiver(pre_delete, sender=Course)
+def course_lessons_detached(sender, instance, **kwargs):
+    """Уроки удаляемого курса остаются без курса: клиенты получают их в изменениях."""
+
+    touch_course_lessons(instance.pk)
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_delete, sender=Subscription)
+def object_tombstone(sender, instance, **kwargs):
+    """Оставляет запись об удалении: клиенты получают её в изменениях."""
+
+    record_tombstone(instance)
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def media_entitlements_changed(sender, instance, raw=False, **kwargs):
+    """Подписка или платёж меняют доступ пользователя к защищённым файлам."""
+
+    if not raw:
+        transaction.on_commit(lambda: forget_media_entitlements(instance.user_id))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def media_owners_changed(sender, instance, raw=False, **kwargs):
+    """Перенос урока, смена владельца или удаление меняют доступ к превью объекта."""
+
+    if not raw:
+        transaction.on_commit(lambda: forget_media_owners(instance))
@@ -0,0 +1,185 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max
+
+from materials.models import Course, Lesson, Tombstone
+
+MANIFEST_NAME = "latest.json"
+# Снимок публикуется без проверки доступа: в нём только сведения для витрины каталога.
+# Ссылки на видео и превью отдаются владельцу, модератору и подписчикам через API
+COURSE_FIELDS = ("id", "name", "description", "updated_at")
+LESSON_FIELDS = ("id", "course_id", "name")
+
+
+def catalogue_version(updated_at):
+    """Версия каталога: время последнего изменения или удаления курса в микросекундах."""
+
+    if updated_at is None:
+        return 0
+    return int(updated_at.timestamp() * 1_000_000)
+
+
+def version_datetime(version):
+    return datetime.fromtimestamp(version / 1_000_000, tz=timezone.utc)
+
+
+def course_tombstones():
+    return Tombstone.objects.filter(kind=Tombstone.Kind.COURSE)
+
+
+def current_catalogue_version():
+    changed = [
+        Course.objects.aggregate(at=Max("updated_at"))["at"],
+        course_tombstones().aggregate(at=Max("deleted_at"))["at"],
+    ]
+    return max(catalogue_version(at) for at in changed)
+
+
+def catalogue_entries(courses):
+    """Записи каталога для строк ``courses.values(*COURSE_FIELDS)``: курс с кратким списком уроков.
+
+    Уроки загружаются одним запросом на весь набор курсов.
+    """
+
+    courses = list(courses.values(*COURSE_FIELDS))
+    lessons = {}
+    for lesson in (
+        Lesson.objects.filter(course_id__in=[course["id"] for course in courses])
+        .order_by("course_id", "rank", "id")
+        .values(*LESSON_FIELDS)
+    ):
+        lessons.setdefault(lesson.pop("course_id"), []).append(lesson)
+
+    for course in courses:
+        course["lessons"] = lessons.get(course["id"], [])
+    return courses
+
+
+def read_manifest():
+    """Описание последнего снимка или None, если снимок ещё не собран."""
+
+    try:
+        with open(os.path.join(settings.CATALOGUE_SNAPSHOT_ROOT, MANIFEST_NAME), encoding="utf-8") as manifest:
+            return json.load(manifest)
+    except FileNotFoundError:
+        return None
+
+
+def _write_atomic(path, write):
+    """Пишет файл через временный файл в том же каталоге: nginx не отдаст недописанный снимок."""
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            write(file)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def build_catalogue_snapshot(chunk_size=None, force=False):
+    """Собирает снимок каталога в CATALOGUE_SNAPSHOT_ROOT и обновляет latest.json.
+
+    Снимок — gzip-файл NDJSON, по строке на курс, с версией каталога в имени. Если каталог не
+    менялся с прошлого снимка, новый файл не создаётся. Хранятся CATALOGUE_SNAPSHOT_KEEP последних снимков.
+    """
+
+    chunk_size = chunk_size or settings.CATALOGUE_SNAPSHOT_CHUNK_SIZE
+    root = settings.CATALOGUE_SNAPSHOT_ROOT
+    os.makedirs(root, exist_ok=True)
+
+    version = current_catalogue_version()
+    manifest = read_manifest()
+    if manifest and manifest["version"] == version and not force:
+        return manifest
+
+    name = f"catalogue-{version}.ndjson.gz"
+    stats = {"courses": 0, "sha256": hashlib.sha256()}
+
+    def write(file):
+        # mtime=0: одинаковое содержимое даёт одинаковый файл и хеш
+        with gzip.GzipFile(fileobj=file, mode="wb", mtime=0) as archive:
+            last_id = 0
+            while True:
+                entries = catalogue_entries(Course.objects.filter(pk__gt=last_id).order_by("pk")[:chunk_size])
+                for entry in entries:
+                    line = json.dumps(entry, cls=DjangoJSONEncoder, ensure_ascii=False).encode() + b"\n"
+                    archive.write(line)
+                    stats["sha256"].update(line)
+                stats["courses"] += len(entries)
+                if len(entries) < chunk_size:
+                    break
+                last_id = entries[-1]["id"]
+
+    _write_atomic(os.path.join(root, name), write)
+
+    manifest = {
+        "version": version,
+        "url": f"{settings.CATALOGUE_SNAPSHOT_URL}{name}",
+        "courses": stats["courses"],
+        "sha256": stats["sha256"].hexdigest(),
+        "generated_at": datetime.now(tz=timezone.utc).isoformat(),
+    }
+    _write_atomic(
+        os.path.join(root, MANIFEST_NAME), lambda file: file.write(json.dumps(manifest, ensure_ascii=False).encode())
+    )
+
+    snapshots = sorted(
+        (entry for entry in os.listdir(root) if entry.startswith("catalogue-") and entry.endswith(".ndjson.gz")),
+        key=lambda entry: int(entry.split("-")[1].split(".")[0]),
+    )
+    for outdated in snapshots[: -settings.CATALOGUE_SNAPSHOT_KEEP]:
+        os.unlink(os.path.join(root, outdated))
+
+    return manifest
+
+
+def catalogue_changes(since, limit=None):
+    """Курсы, изменённые и удалённые после версии ``since``, с запасом CATALOGUE_CHANGES_OVERLAP секунд.
+
+    Запас покрывает транзакции, зафиксированные позже, чем было записано их updated_at; клиенты
+    применяют изменения идемпотентно. Если изменений больше ``limit`` или записи об удалениях
+    старше версии клиента уже удалены, клиенту следует скачать снимок.
+    """
+
+    limit = limit or settings.CATALOGUE_CHANGES_LIMIT
+    snapshot_required = {
+        "version": current_catalogue_version(),
+        "snapshot_required": True,
+        "courses": [],
+        "deleted": [],
+    }
+    changed = Course.objects.order_by("updated_at", "pk")
+    deleted = course_tombstones().order_by("deleted_at", "pk")
+    if since:
+        border = version_datetime(max(since - settings.CATALOGUE_CHANGES_OVERLAP * 1_000_000, 0))
+        if border < datetime.now(tz=timezone.utc) - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS):
+            return snapshot_required
+        changed = changed.filter(updated_at__gt=border)
+        deleted = deleted.filter(deleted_at__gt=border)
+
+    entries = catalogue_entries(changed[: limit + 1])
+    deleted = list(deleted.values_list("object_id", "deleted_at")[: limit + 1 - len(entries)])
+    if len(entries) + len(deleted) > limit:
+        return snapshot_required
+
+    versions = [since]
+    if entries:
+        versions.append(catalogue_version(entries[-1]["updated_at"]))
+    if deleted:
+        versions.append(catalogue_version(deleted[-1][1]))
+    return {
+        "version": max(versions),
+        "snapshot_required": False,
+        "courses": entries,
+        "deleted": sorted({object_id for object_id, _ in deleted}),
+    }
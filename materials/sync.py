@@ -0,0 +1,148 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import F, Q
+from django.utils import timezone
+
+from materials.models import Course, Lesson, Subscription, Tombstone
+from materials.snapshots import catalogue_version, version_datetime
+from users.permissions import is_moderator
+
+# Ключ в ответе и поля, которые отдаются клиенту, для каждого вида объектов
+SYNC_FIELDS = {
+    Tombstone.Kind.COURSE: ("courses", ("id", "name", "description", "preview")),
+    Tombstone.Kind.LESSON: ("lessons", ("id", "course_id", "rank", "name", "description", "video")),
+    Tombstone.Kind.SUBSCRIPTION: ("subscriptions", ("id", "course_id", "is_active")),
+}
+# Потоки изменений в порядке выдачи объектов с одинаковым временем: вид объекта (None — записи
+# об удалениях), поле времени и поля строки. Номер потока входит в токен продолжения страницы
+SYNC_STREAMS = (
+    *((kind, "updated_at", fields) for kind, (_, fields) in SYNC_FIELDS.items()),
+    (None, "deleted_at", ("kind", "object_id")),
+)
+
+
+def parse_token(token):
+    """Позиция из токена синхронизации: (время, поток, pk); пустой токен означает полную загрузку.
+
+    Токен — версия (время в микросекундах) или «версия.поток.pk» для продолжения страницы:
+    объекты с тем же временем отдаются после объекта ``pk`` потока с номером ``поток``.
+    """
+
+    if not token:
+        return None
+    version, *position = (int(part) for part in token.split("."))
+    if version < 0 or len(position) not in (0, 2) or any(part < 0 for part in position):
+        raise ValueError("Некорректный токен синхронизации")
+    if not version:
+        return None
+    stream, pk = position or (len(SYNC_STREAMS), 0)
+    return version_datetime(version), stream, pk
+
+
+def format_token(position):
+    at, stream, pk = position
+    if stream >= len(SYNC_STREAMS):
+        return str(catalogue_version(at))
+    return f"{catalogue_version(at)}.{stream}.{pk}"
+
+
+def sync_querysets(user):
+    """Объекты и записи об удалениях, которые видит пользователь, — как в списках API."""
+
+    if user.is_superuser or is_moderator(user):
+        courses, lessons = Course.objects.all(), Lesson.objects.all()
+        tombstones = Tombstone.objects.filter(~Q(kind=Tombstone.Kind.SUBSCRIPTION) | Q(user_id=user.pk))
+    else:
+        courses, lessons = Course.objects.filter(owner_id=user.pk), Lesson.objects.filter(owner_id=user.pk)
+        tombstones = Tombstone.objects.filter(user_id=user.pk)
+
+    querysets = {
+        Tombstone.Kind.COURSE: courses,
+        Tombstone.Kind.LESSON: lessons,
+        Tombstone.Kind.SUBSCRIPTION: Subscription.objects.filter(user_id=user.pk),
+    }
+    return querysets, tombstones
+
+
+def _read_stream(queryset, field, stream, position, limit, fields):
+    """До ``limit`` строк потока после позиции ``position`` в порядке (``field``, pk).
+
+    Строки с тем же временем, что и позиция, идут после неё, только если поток стоит позже
+    потока позиции или у строки больший pk, поэтому страница не растёт из-за одинаковых времён.
+    """
+
+    queryset = queryset.order_by(field, "pk")
+    if position is not None:
+        at, position_stream, position_pk = position
+        after = Q(**{f"{field}__gt": at})
+        if stream > position_stream:
+            after |= Q(**{field: at})
+        elif stream == position_stream:
+            after |= Q(**{field: at, "pk__gt": position_pk})
+        queryset = queryset.filter(after)
+    return [
+        ((row[field], stream, row.pop("_pk")), row) for row in queryset.values(field, *fields, _pk=F("pk"))[:limit]
+    ]
+
+
+def collect_changes(user, token=None, limit=None):
+    """Изменения с момента ``token``: добавленные и изменённые объекты, ID удалённых и новый токен.
+
+    Изменения упорядочены по времени, затем по потоку и pk; в ответе не больше ``limit`` объектов.
+    Новый токен не сдвигается ближе SYNC_CHANGES_OVERLAP секунд к текущему моменту, поэтому
+    транзакции, зафиксированные позже своего updated_at, попадут в следующий ответ; клиент применяет
+    изменения идемпотентно. Если изменений больше ``limit``, ``has_more=True`` и клиенту нужно сразу
+    запросить следующую страницу. Если токен старше срока хранения записей об удалениях,
+    ``reset=True``: клиент удаляет локальные данные и загружает их заново.
+    """
+
+    limit = limit or settings.SYNC_CHANGES_LIMIT
+    now = timezone.now()
+    position = parse_token(token)
+    reset = position is not None and position[0] < now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    if reset:
+        position = None
+
+    querysets, tombstones = sync_querysets(user)
+    querysets[None] = tombstones
+    rows = sorted(
+        (
+            row
+            for stream, (kind, field, fields) in enumerate(SYNC_STREAMS)
+            for row in _read_stream(querysets[kind], field, stream, position, limit + 1, fields)
+        ),
+        key=lambda row: row[0],
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if has_more:
+        next_position = rows[-1][0]
+    else:
+        stable = now - timedelta(seconds=settings.SYNC_CHANGES_OVERLAP)
+        if position is not None and position[0] >= stable:
+            next_position = position
+        else:
+            next_position = (stable, len(SYNC_STREAMS), 0)
+
+    upserts = {key: [] for key, _ in SYNC_FIELDS.values()}
+    deletes = {key: [] for key, _ in SYNC_FIELDS.values()}
+    for (_, stream, _), row in rows:
+        kind, field, _ = SYNC_STREAMS[stream]
+        del row[field]
+        if kind is None:
+            deletes[SYNC_FIELDS[row["kind"]][0]].append(row["object_id"])
+        else:
+            upserts[SYNC_FIELDS[kind][0]].append(row)
+    for course in upserts["courses"]:
+        course["preview"] = default_storage.url(course["preview"]) if course["preview"] else None
+
+    return {
+        "token": format_token(next_position),
+        "has_more": has_more,
+        "reset": reset,
+        "upserts": upserts,
+        "deletes": deletes,
+    }
@@ -1,69 +1,423 @@
 import logging
 from datetime import timedelta
+from functools import partial
+from itertools import groupby
 
 from celery import shared_task
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
 from django.core.mail import send_mail
 from django.db import transaction
+from django.db.models import Max, Min, Q
 from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
 
+from config.metrics import NOTIFICATIONS_SENT
 from config.settings import DEFAULT_FROM_EMAIL
-from materials.models import Course, Subscription
-from materials.services import send_telegram_message
+from materials.images import build_renditions
+from materials.models import (Course, CourseUpdateEvent, Lesson, NotificationDelivery, PendingNotification,
+                              Subscription, Tombstone, VideoMetadata)
+from materials.progress import PROGRESS_FLUSH_SCHEDULED_KEY, flush_progress_buffer
+from materials.services import (OUTBOX_DISPATCH_SCHEDULED_KEY, VIDEO_INGEST_SCHEDULED_KEY, rebalance_lesson_ranks,
+                                schedule_course_events_dispatch, send_telegram_message, store_video_metadata)
+from materials.snapshots import build_catalogue_snapshot
+from materials.video import get_video_provider
+from users.models import User
 
 logger = logging.getLogger(__name__)
 
 
-@shared_task
-def send_information_about_course_update(course_id):
-    """Отправляет сообщение пользователю об обновлении курса."""
+def notify_user(user, subject, message, skip=(), on_sent=None):
+    """Отправляет пользователю уведомление по включённым у него каналам, кроме ``skip``.
+
+    После каждой успешной отправки вызывает ``on_sent(channel)``, так что отправленное
+    учитывается, даже если следующий канал завершится ошибкой.
+    """
+
+    on_sent = on_sent or (lambda channel: None)
+
+    if NotificationDelivery.Channel.EMAIL not in skip:
+        if not user.email:
+            logger.warning(f"User {user.id} has no email")
+        elif user.email_notifications:
+            send_mail(
+                subject=subject,
+                message=message,
+                from_email=DEFAULT_FROM_EMAIL,
+                recipient_list=[user.email],
+            )
+            on_sent(NotificationDelivery.Channel.EMAIL)
+            NOTIFICATIONS_SENT.labels(NotificationDelivery.Channel.EMAIL).inc()
+            logger.info(f"Email sent to {user.email}")
+
+    if NotificationDelivery.Channel.TELEGRAM not in skip and user.tg_chat_id and user.telegram_notifications:
+        send_telegram_message(user.tg_chat_id, message)
+        on_sent(NotificationDelivery.Channel.TELEGRAM)
+        NOTIFICATIONS_SENT.labels(NotificationDelivery.Channel.TELEGRAM).inc()
+        logger.info(f"Telegram message sent to {user.tg_chat_id}")
+
+
+# Ошибки requests наследуют OSError, поэтому requests не импортируется при загрузке задач
+@shared_task(autoretry_for=(OSError,), retry_backoff=True, max_retries=5)
+def send_information_about_course_update(course_id, batch=None, chunk_size=None, last_user_id=0):
+    """Отправляет подписчикам сообщение об обновлении курса.
+
+    Запуск обрабатывает одну пачку из ``chunk_size`` подписчиков после ``last_user_id`` и ставит
+    задачу следующей пачки, поэтому лимит времени и повторы относятся к пачке, а не ко всей рассылке.
+    Доставленные сообщения записываются в NotificationDelivery: повторный запуск той же рассылки
+    ``batch`` пропускает уже уведомлённых получателей и продолжает с недоставленных.
+    В режиме дайджеста уведомления не отправляются сразу, а откладываются до flush_notification_digests.
+    """
     course = Course.objects.filter(id=course_id).first()
     if not course:
         return
 
-    subscriptions = Subscription.objects.filter(
-        course=course,
-        is_active=True,
-    ).select_related("user")
+    if batch is None:
+        # Задачи, поставленные до появления журнала доставки
+        batch = course.update_events.filter(processed_at__isnull=False).aggregate(batch=Max("id"))["batch"] or 0
+
+    if settings.COURSE_NOTIFICATION_DIGEST:
+        PendingNotification.objects.bulk_create(
+            (
+                PendingNotification(user_id=user_id, course=course, batch=batch)
+                for user_id in Subscription.objects.filter(course=course, is_active=True).values_list(
+                    "user_id", flat=True
+                )
+            ),
+            update_conflicts=True,
+            unique_fields=["user", "course"],
+            update_fields=["batch"],
+        )
+        return
 
+    chunk_size = chunk_size or settings.NOTIFICATION_CHUNK_SIZE
     message = f"Материалы курса «{course.name}» были обновлены"
+    users = list(
+        User.objects.filter(subscriptions__course=course, subscriptions__is_active=True, pk__gt=last_user_id)
+        .only("id", "email", "tg_chat_id", "email_notifications", "telegram_notifications")
+        .order_by("pk")[:chunk_size]
+    )
+    if not users:
+        return 0
 
-    for subscription in subscriptions:
-        user = subscription.user
-        if not user.email:
-            logger.warning(f"User {user.id} has no email")
-            continue
+    delivered = {}
+    for user_id, channel in NotificationDelivery.objects.filter(
+        course=course, batch=batch, user_id__in=[user.pk for user in users]
+    ).values_list("user_id", "channel"):
+        delivered.setdefault(user_id, set()).add(channel)
+
+    deliveries = []
+    try:
+        for user in users:
+            notify_user(
+                user,
+                "Обновление курса",
+                message,
+                skip=delivered.get(user.pk, ()),
+                on_sent=lambda channel, user=user: deliveries.append(
+                    NotificationDelivery(course=course, batch=batch, user=user, channel=channel)
+                ),
+            )
+    finally:
+        # Отправленное до ошибки тоже фиксируется, чтобы повторный запуск его пропустил
+        NotificationDelivery.objects.bulk_create(deliveries, ignore_conflicts=True)
+
+    if len(users) == chunk_size:
+        send_information_about_course_update.delay(
+            course_id, batch=batch, chunk_size=chunk_size, last_user_id=users[-1].pk
+        )
+    return len(deliveries)
+
+
+@shared_task
+def flush_notification_digests(chunk_size=None):
+    """Отправляет накопленные уведомления дайджестом: одно сообщение на пользователя за окно.
+
+    Пользователи обрабатываются пачками по ``chunk_size``. Доставленные каналы записываются в
+    NotificationDelivery по рассылкам ``batch`` отложенных уведомлений: если отправка пользователю
+    завершилась ошибкой, его уведомления остаются до следующего окна, а уже доставленные каналы
+    не повторяются.
+    """
 
-        send_mail(
-            subject="Обновление курса",
-            message=message,
-            from_email=DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
+    chunk_size = chunk_size or settings.NOTIFICATION_CHUNK_SIZE
+    pending = PendingNotification.objects.filter(created_at__lte=timezone.now())
+    user_ids = list(pending.order_by("user_id").values_list("user_id", flat=True).distinct())
+
+    sent = 0
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start : start + chunk_size]
+        notifications = list(
+            pending.filter(user_id__in=chunk).select_related("user", "course").order_by("user_id", "course__name")
         )
+        delivered = {}
+        for course_id, batch, user_id, channel in NotificationDelivery.objects.filter(
+            user_id__in=chunk, batch__in={notification.batch for notification in notifications}
+        ).values_list("course_id", "batch", "user_id", "channel"):
+            delivered.setdefault((course_id, batch, user_id), set()).add(channel)
+
+        for user_id, user_notifications in groupby(notifications, key=lambda notification: notification.user_id):
+            user_notifications = list(user_notifications)
+            course_names = "\n".join(f"— {notification.course.name}" for notification in user_notifications)
+            # Канал пропускается, только если по нему доставлены все курсы дайджеста
+            skip = set.intersection(
+                *(
+                    delivered.get((notification.course_id, notification.batch, user_id), set())
+                    for notification in user_notifications
+                )
+            )
+            deliveries = []
+            try:
+                notify_user(
+                    user_notifications[0].user,
+                    "Обновление курсов",
+                    f"Материалы курсов были обновлены:\n{course_names}",
+                    skip=skip,
+                    on_sent=lambda channel, user_notifications=user_notifications: deliveries.extend(
+                        NotificationDelivery(
+                            course_id=notification.course_id,
+                            batch=notification.batch,
+                            user_id=notification.user_id,
+                            channel=channel,
+                        )
+                        for notification in user_notifications
+                    ),
+                )
+            except OSError:
+                logger.exception(f"Digest to user {user_id} failed")
+                continue
+            finally:
+                NotificationDelivery.objects.bulk_create(deliveries, ignore_conflicts=True)
+            PendingNotification.objects.filter(
+                id__in=[notification.id for notification in user_notifications]
+            ).delete()
+            sent += 1
+
+    if sent:
+        logger.info(f"Digest sent to {sent} users")
+    return sent
+
+
+def notification_allowed_at(course, now):
+    """Возвращает момент, начиная с которого по курсу можно отправить уведомление.
 
-        logger.info(f"Email sent to {user.email}")
+    Уведомления по одному курсу отправляются не чаще, чем раз в COURSE_NOTIFICATION_INTERVAL.
+    """
 
-        if hasattr(user, "tg_chat_id") and user.tg_chat_id:
-            send_telegram_message(user.tg_chat_id, message)
-            logger.info(f"Telegram message sent to {user.tg_chat_id}")
+    if not course.last_notification_at:
+        return now
+    return max(now, course.last_notification_at + settings.COURSE_NOTIFICATION_INTERVAL)
 
 
 @shared_task
-def four_hours_notification():
-    """Отправляет уведомления об обновлении курсов,
-    если с момента последнего уведомления прошло более 4 часов."""
+def dispatch_course_update_events(batch_size=None):
+    """Разбирает outbox событий обновления курсов пачками и запускает рассылку уведомлений.
+
+    События курсов, по которым уведомление уже отправлялось недавно, откладываются
+    до окончания интервала; повторный запуск планируется один, к самому раннему из них.
+    """
 
-    courses = Course.objects.filter(notification_pending=True)
-    time_now = timezone.now()
-    four_hours_ago = time_now - timedelta(hours=4)
+    batch_size = batch_size or settings.OUTBOX_DISPATCH_BATCH_SIZE
+    # Изменения, зафиксированные после начала разбора, должны запланировать следующий запуск.
+    # Метка более позднего запланированного запуска остаётся, чтобы не ставить его повторно
+    scheduled = cache.get(OUTBOX_DISPATCH_SCHEDULED_KEY)
+    if scheduled is not None and scheduled <= timezone.now().timestamp():
+        cache.delete(OUTBOX_DISPATCH_SCHEDULED_KEY)
 
-    for course in courses:
+    dispatched = 0
+    while True:
         with transaction.atomic():
-            course = Course.objects.select_for_update().get(id=course.id)
+            now = timezone.now()
+            events = list(
+                CourseUpdateEvent.objects.select_for_update(skip_locked=True)
+                .filter(processed_at__isnull=True, available_at__lte=now)
+                .order_by("course_id", "id")[:batch_size]
+            )
+            for course_id, course_events in groupby(events, key=lambda event: event.course_id):
+                event_ids = [event.id for event in course_events]
+                course = Course.objects.select_for_update().get(id=course_id)
 
-            if not course.notification_pending:
-                continue
-            if not course.last_notification_at or course.last_notification_at < four_hours_ago:
-                send_information_about_course_update.delay(course.id)
-                course.last_notification_at = time_now
-                course.notification_pending = False
-                course.save(update_fields=["last_notification_at", "notification_pending"])
+                allowed_at = notification_allowed_at(course, now)
+                if allowed_at > now:
+                    CourseUpdateEvent.objects.filter(id__in=event_ids).update(available_at=allowed_at)
+                    continue
+
+                course.last_notification_at = now
+                course.save(update_fields=["last_notification_at"])
+                # Одна рассылка закрывает все готовые события курса, в том числе не попавшие в пачку:
+                # иначе следующая пачка отложила бы их и подписчики получили бы второе уведомление
+                pending = CourseUpdateEvent.objects.filter(
+                    course_id=course_id, processed_at__isnull=True, available_at__lte=now
+                )
+                batch = pending.aggregate(batch=Max("id"))["batch"]
+                dispatched += pending.update(processed_at=now)
+                transaction.on_commit(partial(send_information_about_course_update.delay, course_id, batch=batch))
+
+        if len(events) < batch_size:
+            break
+
+    deferred_until = CourseUpdateEvent.objects.filter(processed_at__isnull=True).aggregate(
+        deferred_until=Min("available_at")
+    )["deferred_until"]
+    if deferred_until is not None:
+        schedule_course_events_dispatch(eta=deferred_until)
+
+    if dispatched:
+        logger.info(f"Dispatched {dispatched} course update events")
+    return dispatched
+
+
+@shared_task
+def prune_course_update_events():
+    """Удаляет обработанные события outbox старше OUTBOX_RETENTION_DAYS дней."""
+
+    border = timezone.now() - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+    deleted, _ = CourseUpdateEvent.objects.filter(processed_at__lt=border).delete()
+    return deleted
+
+
+@shared_task
+def export_catalogue_snapshot(force=False):
+    """Пересобирает снимок каталога курсов, если каталог изменился."""
+
+    return build_catalogue_snapshot(force=force)
+
+
+@shared_task
+def prune_notification_deliveries():
+    """Удаляет записи журнала доставки старше NOTIFICATION_DELIVERY_RETENTION_DAYS дней."""
+
+    border = timezone.now() - timedelta(days=settings.NOTIFICATION_DELIVERY_RETENTION_DAYS)
+    deleted, _ = NotificationDelivery.objects.filter(delivered_at__lt=border).delete()
+    return deleted
+
+
+@shared_task
+def flush_lesson_progress(batch_size=None):
+    """Переносит отметки прогресса из буфера в LessonProgress, по LESSON_PROGRESS_FLUSH_BATCH_SIZE пар за запуск."""
+
+    batch_size = batch_size or settings.LESSON_PROGRESS_FLUSH_BATCH_SIZE
+    cache.delete(PROGRESS_FLUSH_SCHEDULED_KEY)
+    flushed, written = flush_progress_buffer(batch_size)
+    if flushed == batch_size:
+        flush_lesson_progress.delay(batch_size=batch_size)
+    return written
+
+
+@shared_task
+def rebalance_course_lessons(course_id):
+    """Равномерно пересчитывает ранги уроков курса, когда промежутки между ними исчерпываются."""
+
+    return rebalance_lesson_ranks(course_id)
+
+
+@shared_task
+def prune_tombstones():
+    """Удаляет записи об удалённых объектах старше SYNC_TOMBSTONE_RETENTION_DAYS дней."""
+
+    border = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=border).delete()
+    return deleted
+
+
+@shared_task
+def four_hours_notification():
+    """Совместимость с ранее сохранёнными расписаниями beat: разбирает outbox событий."""
+
+    return dispatch_course_update_events()
+
+
+@shared_task
+def generate_image_renditions(model_label, pk, field_name):
+    """Генерирует уменьшенные копии изображения ``field_name`` и сохраняет их в ``<field_name>_renditions``."""
+
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    if not instance:
+        return
+
+    field_file = getattr(instance, field_name)
+    renditions_field = f"{field_name}_renditions"
+    if field_file and getattr(instance, renditions_field).get("source") == field_file.name:
+        return
+
+    renditions = {}
+    if field_file:
+        try:
+            renditions = build_renditions(field_file)
+        except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as exc:
+            logger.warning(f"Cannot process {model_label} {pk} {field_name}: {exc}")
+            renditions = {"source": field_file.name, "files": {}}
+
+    # Изображение могло смениться, пока задача работала: тогда копии сгенерирует следующий запуск
+    if field_file:
+        unchanged = Q(**{field_name: field_file.name})
+    else:
+        unchanged = Q(**{f"{field_name}__isnull": True}) | Q(**{field_name: ""})
+    model.objects.filter(unchanged, pk=pk).update(
+        **{renditions_field: renditions, f"{field_name}_sha256": renditions.get("sha256", "")}
+    )
+    return renditions
+
+
+@shared_task(autoretry_for=(OSError,), retry_backoff=True, max_retries=5)
+def ingest_video_metadata(after_pk=0, batch_size=None):
+    """Привязывает метаданные видео к урокам без них, по VIDEO_METADATA_BATCH_SIZE уроков за запуск.
+
+    У провайдера запрашиваются только видео, которых ещё нет в VideoMetadata, поэтому общее
+    для нескольких уроков видео загружается один раз. Следующая пачка обрабатывается новым
+    запуском с курсором ``after_pk``; при сетевой ошибке запуск повторяется с той же пачки.
+    """
+
+    batch_size = batch_size or settings.VIDEO_METADATA_BATCH_SIZE
+    if not after_pk:
+        cache.delete(VIDEO_INGEST_SCHEDULED_KEY)
+
+    lessons = list(
+        Lesson.objects.filter(pk__gt=after_pk, video_id__isnull=False, video_metadata__isnull=True)
+        .order_by("pk")
+        .values_list("pk", "video_id")[:batch_size]
+    )
+    if not lessons:
+        return 0
+
+    lesson_ids = {}
+    for pk, video_id in lessons:
+        lesson_ids.setdefault(video_id, []).append(pk)
+
+    missing = set(lesson_ids) - set(
+        VideoMetadata.objects.filter(video_id__in=lesson_ids).values_list("video_id", flat=True)
+    )
+    if missing:
+        store_video_metadata(missing, get_video_provider().fetch(missing))
+
+    linked = 0
+    for video_id, metadata_pk in VideoMetadata.objects.filter(video_id__in=lesson_ids).values_list("video_id", "pk"):
+        # Ссылка на видео могла смениться, пока шла загрузка
+        linked += Lesson.objects.filter(pk__in=lesson_ids[video_id], video_id=video_id).update(
+            video_metadata_id=metadata_pk
+        )
+
+    if len(lessons) == batch_size:
+        ingest_video_metadata.delay(after_pk=lessons[-1][0], batch_size=batch_size)
+    return linked
+
+
+@shared_task(autoretry_for=(OSError,), retry_backoff=True, max_retries=5)
+def refresh_video_metadata(batch_size=None):
+    """Перепроверяет метаданные видео старше VIDEO_METADATA_TTL_HOURS, начиная с самых старых."""
+
+    batch_size = batch_size or settings.VIDEO_METADATA_BATCH_SIZE
+    stale_before = timezone.now() - timedelta(hours=settings.VIDEO_METADATA_TTL_HOURS)
+    video_ids = list(
+        VideoMetadata.objects.filter(checked_at__lt=stale_before)
+        .order_by("checked_at")
+        .values_list("video_id", flat=True)[:batch_size]
+    )
+    if not video_ids:
+        return 0
+
+    store_video_metadata(video_ids, get_video_provider().fetch(video_ids))
+    if len(video_ids) == batch_size:
+        refresh_video_metadata.delay(batch_size=batch_size)
+    return len(video_ids)
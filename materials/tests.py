@@ -1,10 +1,47 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+from django.conf import settings
 from django.contrib.auth.models import Group
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
 
-from materials.models import Course, Lesson, Subscription
-from users.models import User
+from materials.images import rendition_digest
+from materials.models import (Course, CourseUpdateEvent, Lesson, LessonProgress, NotificationDelivery,
+                              PendingNotification, Subscription, Tombstone, VideoMetadata)
+from materials.progress import record_lesson_progress
+from materials.seeding import SEED_UNTIL
+from materials.serializers import LessonSerializer, LessonValuesSerializer
+from materials.services import (LESSON_RANK_GAP, move_lesson, ordered_lessons, reorder_lessons,
+                                schedule_course_events_dispatch)
+from materials.snapshots import build_catalogue_snapshot, catalogue_version
+from materials.tasks import (dispatch_course_update_events, export_catalogue_snapshot, flush_lesson_progress,
+                             flush_notification_digests, generate_image_renditions, ingest_video_metadata,
+                             prune_course_update_events, prune_tombstones, rebalance_course_lessons,
+                             refresh_video_metadata, send_information_about_course_update)
+from materials.video import StubVideoProvider, parse_video_id
+from users.models import Payment, User
+from users.serializers import UserTokenObtainPairSerializer
 
 
 class LessonTestCase(APITestCase):
@@ -74,9 +111,11 @@ class LessonTestCase(APITestCase):
                 {
                     "id": self.lesson.pk,
                     "video": self.lesson.video,
+                    "video_id": "34Rp6KVGIEM",
                     "name": self.lesson.name,
                     "description": self.lesson.description,
                     "preview": None,
+                    "preview_renditions": {},
                     "course": self.course.pk,
                     "owner": self.user.pk,
                 },
@@ -294,3 +333,1157 @@ class SubscriptionTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("error", response.data)
         self.assertEqual(response.data["error"], "course_id is required")
+
+
+class CourseUpdateOutboxTestCase(APITestCase):
+    """Тесты outbox событий обновления курсов и их разбора."""
+
+    def setUp(self):
+        self.user = User.objects.create(email="admin@example.com")
+        self.course = Course.objects.create(name="Python", description="Вводный курс Python", owner=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_course_update_writes_event(self):
+        """Обновление курса записывает событие с изменёнными полями."""
+
+        url = reverse("materials:course-detail", args=(self.course.pk,))
+        with patch("materials.services.schedule_course_events_dispatch") as mock_schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.patch(url, data={"description": "Новое описание"})
+
+        event = CourseUpdateEvent.objects.get()
+        self.assertEqual(event.course, self.course)
+        self.assertEqual(event.event_type, CourseUpdateEvent.EventType.COURSE_UPDATED)
+        self.assertEqual(event.payload, {"fields": ["description"]})
+        mock_schedule.assert_called_once()
+
+    def test_lesson_create_writes_event(self):
+        """Создание урока в курсе записывает событие курса."""
+
+        url = reverse("materials:lesson-create")
+        data = {
+            "name": "Основы Django",
+            "video": "https://www.youtube.com/watch?v=J84Pit-TN2A",
+            "course": self.course.pk,
+        }
+        self.client.post(url, data=data)
+
+        lesson = Lesson.objects.get()
+        event = CourseUpdateEvent.objects.get()
+        self.assertEqual(event.event_type, CourseUpdateEvent.EventType.LESSON_CREATED)
+        self.assertEqual(event.payload, {"lesson": lesson.pk})
+
+    @patch("materials.tasks.send_information_about_course_update.delay")
+    def test_dispatch_sends_notification_once_per_course(self, mock_send):
+        """Несколько событий курса приводят к одной рассылке и помечаются обработанными."""
+
+        CourseUpdateEvent.objects.create(course=self.course, event_type=CourseUpdateEvent.EventType.COURSE_UPDATED)
+        last = CourseUpdateEvent.objects.create(
+            course=self.course, event_type=CourseUpdateEvent.EventType.LESSON_CREATED
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            dispatched = dispatch_course_update_events(batch_size=10)
+
+        self.assertEqual(dispatched, 2)
+        mock_send.assert_called_once_with(self.course.pk, batch=last.pk)
+        self.assertFalse(CourseUpdateEvent.objects.filter(processed_at__isnull=True).exists())
+        self.course.refresh_from_db()
+        self.assertIsNotNone(self.course.last_notification_at)
+
+    @patch("materials.tasks.send_information_about_course_update.delay")
+    def test_dispatch_closes_course_events_beyond_batch(self, mock_send):
+        """События курса, не поместившиеся в пачку, закрываются той же рассылкой, а не откладываются."""
+
+        events = [
+            CourseUpdateEvent.objects.create(course=self.course, event_type=CourseUpdateEvent.EventType.COURSE_UPDATED)
+            for _ in range(3)
+        ]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            dispatched = dispatch_course_update_events(batch_size=2)
+
+        self.assertEqual(dispatched, 3)
+        mock_send.assert_called_once_with(self.course.pk, batch=events[-1].pk)
+        self.assertFalse(CourseUpdateEvent.objects.filter(processed_at__isnull=True).exists())
+
+    @patch("materials.tasks.dispatch_course_update_events.apply_async")
+    @patch("materials.tasks.send_information_about_course_update.delay")
+    def test_dispatch_defers_recently_notified_course(self, mock_send, mock_redispatch):
+        """События курса, уведомлённого менее 4 часов назад, откладываются до конца интервала.
+
+        Повторные разборы не ставят новых отложенных задач, пока запланированная не выполнена.
+        """
+
+        cache.clear()
+        self.course.last_notification_at = timezone.now() - timedelta(hours=1)
+        self.course.save()
+        event = CourseUpdateEvent.objects.create(
+            course=self.course, event_type=CourseUpdateEvent.EventType.COURSE_UPDATED
+        )
+
+        for _ in range(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                dispatched = dispatch_course_update_events()
+
+        event.refresh_from_db()
+        self.assertEqual(dispatched, 0)
+        mock_send.assert_not_called()
+        self.assertIsNone(event.processed_at)
+        self.assertEqual(event.available_at, self.course.last_notification_at + timedelta(hours=4))
+        mock_redispatch.assert_called_once()
+        # Отложенный запуск не дальше страховочного: дольше visibility_timeout задача в брокере не ждёт
+        self.assertEqual(mock_redispatch.call_args.kwargs["countdown"], settings.OUTBOX_SWEEP_INTERVAL)
+
+    @patch("materials.tasks.dispatch_course_update_events.apply_async")
+    def test_earlier_dispatch_replaces_later_one(self, mock_dispatch):
+        """Изменение, которое нужно разобрать раньше запланированного запуска, ставит новую задачу."""
+
+        cache.clear()
+        schedule_course_events_dispatch(eta=timezone.now() + timedelta(hours=3))
+        schedule_course_events_dispatch(eta=timezone.now() + timedelta(hours=3))
+        schedule_course_events_dispatch()
+        schedule_course_events_dispatch()
+
+        self.assertEqual(mock_dispatch.call_count, 2)
+        self.assertEqual(mock_dispatch.call_args.kwargs["countdown"], settings.OUTBOX_DISPATCH_DELAY)
+
+    def test_prune_processed_events(self):
+        """Обработанные события старше срока хранения удаляются, необработанные остаются."""
+
+        old = timezone.now() - timedelta(days=settings.OUTBOX_RETENTION_DAYS + 1)
+        CourseUpdateEvent.objects.create(
+            course=self.course, event_type=CourseUpdateEvent.EventType.COURSE_UPDATED, processed_at=old
+        )
+        recent = CourseUpdateEvent.objects.create(
+            course=self.course, event_type=CourseUpdateEvent.EventType.COURSE_UPDATED, processed_at=timezone.now()
+        )
+        pending = CourseUpdateEvent.objects.create(
+            course=self.course, event_type=CourseUpdateEvent.EventType.COURSE_UPDATED
+        )
+
+        self.assertEqual(prune_course_update_events(), 1)
+        self.assertEqual(set(CourseUpdateEvent.objects.values_list("pk", flat=True)), {recent.pk, pending.pk})
+
+
+@patch("materials.tasks.send_telegram_message")
+class CourseUpdateNotificationTestCase(TestCase):
+    """Тесты рассылки уведомлений об обновлении курсов и дайджеста."""
+
+    def setUp(self):
+        self.user = User.objects.create(email="student@example.com", tg_chat_id="42")
+        self.python = Course.objects.create(name="Python")
+        self.django = Course.objects.create(name="Django")
+        Subscription.objects.create(user=self.user, course=self.python)
+        Subscription.objects.create(user=self.user, course=self.django)
+
+    def test_sends_email_and_telegram_immediately(self, mock_telegram):
+        """Без дайджеста уведомление отправляется сразу по обоим каналам."""
+
+        send_information_about_course_update(self.python.pk)
+
+        self.assertEqual(len(mail.outbox), 1)
+        mock_telegram.assert_called_once_with("42", "Материалы курса «Python» были обновлены")
+
+    def test_respects_channel_preferences(self, mock_telegram):
+        """Отключённые пользователем каналы не используются."""
+
+        self.user.email_notifications = False
+        self.user.save()
+
+        send_information_about_course_update(self.python.pk)
+
+        self.assertEqual(len(mail.outbox), 0)
+        mock_telegram.assert_called_once()
+
+    @override_settings(COURSE_NOTIFICATION_DIGEST=True)
+    def test_digest_sends_one_message_per_user(self, mock_telegram):
+        """В режиме дайджеста обновления нескольких курсов уходят одним сообщением."""
+
+        send_information_about_course_update(self.python.pk)
+        send_information_about_course_update(self.django.pk)
+        send_information_about_course_update(self.python.pk)
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(PendingNotification.objects.count(), 2)
+
+        self.assertEqual(flush_notification_digests(), 1)
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("Django", mail.outbox[0].body)
+        self.assertIn("Python", mail.outbox[0].body)
+        mock_telegram.assert_called_once()
+        self.assertFalse(PendingNotification.objects.exists())
+
+    @override_settings(COURSE_NOTIFICATION_DIGEST=True)
+    def test_digest_failure_is_isolated_and_not_repeated(self, mock_telegram):
+        """Ошибка отправки одному пользователю не прерывает дайджест, а повтор не дублирует доставленное."""
+
+        other = User.objects.create(email="other@example.com")
+        Subscription.objects.create(user=other, course=self.python)
+        send_information_about_course_update(self.python.pk)
+
+        mock_telegram.side_effect = OSError("Telegram недоступен")
+        with self.assertLogs("materials.tasks", level="ERROR"):
+            self.assertEqual(flush_notification_digests(), 1)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(list(PendingNotification.objects.values_list("user_id", flat=True)), [self.user.pk])
+
+        mock_telegram.side_effect = None
+        self.assertEqual(flush_notification_digests(), 1)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mock_telegram.call_count, 2)
+        self.assertFalse(PendingNotification.objects.exists())
+
+
+@patch("materials.tasks.send_telegram_message")
+class NotificationDeliveryTestCase(APITestCase):
+    """Тесты журнала доставки уведомлений."""
+
+    def setUp(self):
+        self.owner = User.objects.create(email="owner@example.com")
+        self.course = Course.objects.create(name="Python", owner=self.owner)
+        self.students = [User.objects.create(email=f"student{i}@example.com") for i in range(3)]
+        for student in self.students:
+            Subscription.objects.create(user=student, course=self.course)
+
+    def fan_out(self, course_id, **kwargs):
+        """Выполняет рассылку вместе с задачами следующих пачек; возвращает число доставленных сообщений."""
+
+        runs = [kwargs]
+        sent = 0
+        with patch("materials.tasks.send_information_about_course_update.delay") as delay:
+            delay.side_effect = lambda course_id, **next_kwargs: runs.append(next_kwargs)
+            while runs:
+                sent += send_information_about_course_update(course_id, **runs.pop(0)) or 0
+        return sent
+
+    def test_retry_skips_delivered_recipients(self, mock_telegram):
+        """Повторный запуск рассылки не отправляет сообщения тем, кому они уже доставлены."""
+
+        self.assertEqual(self.fan_out(self.course.pk, batch=1, chunk_size=2), 3)
+        self.assertEqual(self.fan_out(self.course.pk, batch=1, chunk_size=2), 0)
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(NotificationDelivery.objects.filter(batch=1).count(), 3)
+
+        send_information_about_course_update(self.course.pk, batch=2)
+        self.assertEqual(len(mail.outbox), 6)
+
+    def test_failed_fan_out_resumes_after_delivered_recipients(self, mock_telegram):
+        """Рассылка, упавшая на середине, продолжается с недоставленных получателей."""
+
+        self.students[2].tg_chat_id = "42"
+        self.students[2].save()
+        mock_telegram.side_effect = OSError("telegram is down")
+
+        with self.assertRaises(OSError):
+            self.fan_out(self.course.pk, batch=1, chunk_size=2)
+        self.assertEqual(len(mail.outbox), 3)
+
+        # Повтор упавшей задачи — той же пачки с тем же курсором
+        mock_telegram.side_effect = None
+        self.fan_out(self.course.pk, batch=1, chunk_size=2, last_user_id=self.students[1].pk)
+
+        self.assertEqual(len(mail.outbox), 3)
+        mock_telegram.assert_called_with("42", "Материалы курса «Python» были обновлены")
+        self.assertEqual(NotificationDelivery.objects.filter(batch=1).count(), 4)
+
+    def test_each_chunk_is_a_separate_task(self, mock_telegram):
+        """Каждая пачка подписчиков обрабатывается своим запуском, следующая ставится с курсором."""
+
+        with patch("materials.tasks.send_information_about_course_update.delay") as delay:
+            self.assertEqual(send_information_about_course_update(self.course.pk, batch=1, chunk_size=2), 2)
+        delay.assert_called_once_with(self.course.pk, batch=1, chunk_size=2, last_user_id=self.students[1].pk)
+        self.assertEqual(len(mail.outbox), 2)
+
+        cursor = self.students[1].pk
+        with patch("materials.tasks.send_information_about_course_update.delay") as delay:
+            sent = send_information_about_course_update(self.course.pk, batch=1, chunk_size=2, last_user_id=cursor)
+        self.assertEqual(sent, 1)
+        delay.assert_not_called()
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(NotificationDelivery.objects.filter(batch=1).count(), 3)
+
+    def test_notification_stats(self, mock_telegram):
+        """Владелец курса видит статистику доставки по рассылкам."""
+
+        send_information_about_course_update(self.course.pk, batch=7)
+        self.client.force_authenticate(user=self.owner)
+
+        response = self.client.get(reverse("materials:course-notification-stats", args=(self.course.pk,)))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = response.json()
+        self.assertEqual(len(stats), 1)
+        self.assertEqual(
+            {key: stats[0][key] for key in ("batch", "recipients", "email", "telegram")},
+            {"batch": 7, "recipients": 3, "email": 3, "telegram": 0},
+        )
+
+
+class LessonValuesSerializerTestCase(TestCase):
+    """Тесты быстрого сериализатора списка уроков."""
+
+    def test_matches_lesson_serializer_output(self):
+        """JSON быстрого пути побайтно совпадает с LessonSerializer."""
+
+        user = User.objects.create(email="admin@example.com")
+        course = Course.objects.create(name="Python", owner=user)
+        Lesson.objects.create(
+            name="Введение",
+            course=course,
+            owner=user,
+            preview="materials/preview/intro.png",
+            video="https://youtube.com",
+        )
+        Lesson.objects.create(name="Без курса", description="Описание")
+        request = Request(APIRequestFactory().get("/materials/lesson/"))
+        context = {"request": request}
+        queryset = Lesson.objects.order_by("id")
+
+        expected = JSONRenderer().render(LessonSerializer(queryset, many=True, context=context).data)
+        serializer = LessonValuesSerializer(context=context)
+        actual = JSONRenderer().render(serializer.many(serializer.values(queryset)))
+
+        self.assertEqual(actual, expected)
+
+
+class ImageRenditionsTestCase(APITestCase):
+    """Тесты генерации уменьшенных копий превью."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = self.settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.user = User.objects.create(email="admin@example.com")
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def upload(self, name, content=None):
+        if content is None:
+            buffer = BytesIO()
+            Image.new("RGB", (1920, 1080), "red").save(buffer, format="PNG")
+            content = buffer.getvalue()
+        return SimpleUploadedFile(name, content, content_type="image/png")
+
+    def test_generates_renditions_and_exposes_urls(self):
+        """Копии создаются в формате WebP в пределах заданных размеров и попадают в ответ API."""
+
+        course = Course.objects.create(name="Python", owner=self.user, preview=self.upload("python.png"))
+
+        generate_image_renditions("materials.Course", course.pk, "preview")
+
+        course.refresh_from_db()
+        files = course.preview_renditions["files"]
+        self.assertEqual(set(files), {"thumb", "card"})
+        self.assertEqual(course.preview_sha256, course.preview_renditions["sha256"])
+        self.assertEqual(rendition_digest(files["thumb"]), course.preview_sha256)
+        with default_storage.open(files["thumb"]) as thumb:
+            image = Image.open(thumb)
+            self.assertEqual((image.format, image.size), ("WEBP", (320, 180)))
+
+        response = self.client.get(reverse("materials:course-detail", args=(course.pk,)))
+        self.assertEqual(
+            response.json()["preview_renditions"]["thumb"], f"http://testserver/media/{files['thumb']}"
+        )
+
+    def test_same_image_shares_renditions(self):
+        """Одинаковые изображения используют одни и те же файлы копий."""
+
+        course = Course.objects.create(name="Python", preview=self.upload("python.png"))
+        lesson = Lesson.objects.create(name="Введение", preview=self.upload("intro.png"))
+
+        generate_image_renditions("materials.Course", course.pk, "preview")
+        generate_image_renditions("materials.Lesson", lesson.pk, "preview")
+
+        course.refresh_from_db()
+        lesson.refresh_from_db()
+        self.assertNotEqual(course.preview.name, lesson.preview.name)
+        self.assertEqual(course.preview_renditions["files"], lesson.preview_renditions["files"])
+
+    def test_invalid_image_has_no_renditions(self):
+        """Файл, который не удаётся декодировать, не получает копий."""
+
+        course = Course.objects.create(name="Python", preview=self.upload("broken.png", b"not an image"))
+
+        generate_image_renditions("materials.Course", course.pk, "preview")
+
+        course.refresh_from_db()
+        self.assertEqual(course.preview_renditions, {"source": course.preview.name, "files": {}})
+
+
+@override_settings(VIDEO_METADATA_PROVIDER="materials.video.StubVideoProvider")
+class VideoMetadataTestCase(APITestCase):
+    """Тесты загрузки метаданных видео уроков."""
+
+    def setUp(self):
+        self.user = User.objects.create(email="admin@example.com")
+        self.client.force_authenticate(user=self.user)
+        self.first = Lesson.objects.create(
+            name="Первый", owner=self.user, video="https://www.youtube.com/watch?v=34Rp6KVGIEM&t=10"
+        )
+        self.second = Lesson.objects.create(name="Второй", owner=self.user, video="https://youtu.be/34Rp6KVGIEM")
+        self.third = Lesson.objects.create(
+            name="Третий", owner=self.user, video="https://youtube.com/shorts/lKo-F3gSl7I"
+        )
+
+    def test_parse_video_id(self):
+        """ID видео извлекается из разных форм ссылок YouTube."""
+
+        self.assertEqual(parse_video_id("https://www.youtube.com/embed/34Rp6KVGIEM"), "34Rp6KVGIEM")
+        self.assertEqual(parse_video_id("https://youtu.be/34Rp6KVGIEM?t=5"), "34Rp6KVGIEM")
+        self.assertIsNone(parse_video_id("https://youtube.com"))
+        self.assertEqual(self.first.video_id, "34Rp6KVGIEM")
+
+    def test_invalid_video_id_is_ignored(self):
+        """ID видео неверной длины или с недопустимыми символами не сохраняется."""
+
+        self.assertIsNone(parse_video_id(f"https://www.youtube.com/watch?v={'a' * 40}"))
+        self.assertIsNone(parse_video_id("https://youtu.be/34Rp6KVGIE"))
+        self.assertIsNone(parse_video_id("https://www.youtube.com/embed/34Rp6KVGIE!"))
+
+        lesson = Lesson.objects.create(
+            name="Длинный", owner=self.user, video=f"https://www.youtube.com/watch?v={'a' * 40}"
+        )
+        self.assertIsNone(lesson.video_id)
+
+    @override_settings(VIDEO_METADATA_PROVIDER="")
+    def test_missing_provider_fails_loudly(self):
+        """Без провайдера загрузка метаданных завершается ошибкой, а не сохраняет заглушки."""
+
+        with self.assertRaises(ImproperlyConfigured):
+            ingest_video_metadata()
+        self.assertFalse(VideoMetadata.objects.exists())
+
+    def test_shared_video_is_fetched_once(self):
+        """Общее для уроков видео запрашивается у провайдера один раз."""
+
+        with patch.object(StubVideoProvider, "fetch", autospec=True, side_effect=StubVideoProvider.fetch) as fetch:
+            self.assertEqual(ingest_video_metadata(), 3)
+            self.assertEqual(ingest_video_metadata(), 0)
+
+        fetch.assert_called_once()
+        self.assertEqual(set(fetch.call_args.args[1]), {"34Rp6KVGIEM", "lKo-F3gSl7I"})
+        self.assertEqual(VideoMetadata.objects.count(), 2)
+
+        lesson = Lesson.objects.create(name="Четвёртый", owner=self.user, video="https://youtu.be/lKo-F3gSl7I")
+        self.assertEqual(lesson.video_metadata.video_id, "lKo-F3gSl7I")
+
+    def test_missing_video_marked_unavailable(self):
+        """Видео, которого нет у провайдера, сохраняется как недоступное и не запрашивается повторно."""
+
+        with patch.object(StubVideoProvider, "fetch", return_value={}):
+            ingest_video_metadata()
+
+        self.first.refresh_from_db()
+        self.assertFalse(self.first.video_metadata.is_available)
+
+    def test_refresh_stale_metadata(self):
+        """Устаревшие метаданные перепроверяются у провайдера."""
+
+        ingest_video_metadata()
+        VideoMetadata.objects.update(title="old", checked_at=timezone.now() - timedelta(days=2))
+
+        self.assertEqual(refresh_video_metadata(), 2)
+        self.assertFalse(VideoMetadata.objects.filter(title="old").exists())
+
+    def test_lesson_detail_includes_metadata(self):
+        """Детальная информация об уроке содержит метаданные без обращения к провайдеру."""
+
+        ingest_video_metadata()
+
+        with patch.object(StubVideoProvider, "fetch") as fetch:
+            response = self.client.get(reverse("materials:lesson-get", args=(self.first.pk,)))
+
+        fetch.assert_not_called()
+        self.assertEqual(
+            response.json()["video_metadata"],
+            {
+                "video_id": "34Rp6KVGIEM",
+                "title": "Video 34Rp6KVGIEM",
+                "duration": 0,
+                "thumbnail_url": "https://i.ytimg.com/vi/34Rp6KVGIEM/hqdefault.jpg",
+                "is_available": True,
+            },
+        )
+
+
+class CatalogueSnapshotTestCase(APITestCase):
+    """Тесты снимка каталога и изменений каталога."""
+
+    def setUp(self):
+        self.snapshot_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.snapshot_root, ignore_errors=True)
+        settings_override = override_settings(CATALOGUE_SNAPSHOT_ROOT=self.snapshot_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create(email="catalogue@example.com")
+        self.client.force_authenticate(user=self.user)
+        self.python = Course.objects.create(name="Python", owner=self.user)
+        self.django = Course.objects.create(name="Django", owner=self.user)
+        self.lesson = Lesson.objects.create(name="Введение", course=self.python, owner=self.user)
+
+    def read_snapshot(self, manifest):
+        path = os.path.join(self.snapshot_root, manifest["url"].rsplit("/", 1)[1])
+        with gzip.open(path, "rt", encoding="utf-8") as snapshot:
+            return [json.loads(line) for line in snapshot]
+
+    def test_snapshot_contains_courses_with_lessons(self):
+        """Снимок содержит по строке на курс с кратким списком уроков, описание доступно через API."""
+
+        manifest = export_catalogue_snapshot(force=False)
+        entries = self.read_snapshot(manifest)
+
+        self.assertEqual(manifest["courses"], 2)
+        self.assertEqual([entry["name"] for entry in entries], ["Python", "Django"])
+        self.assertEqual(entries[0]["lessons"], [{"id": self.lesson.pk, "name": "Введение"}])
+        self.assertEqual(entries[1]["lessons"], [])
+
+        response = self.client.get(reverse("materials:catalogue-snapshot"))
+        self.assertEqual(response.json(), manifest)
+
+    def test_snapshot_not_rebuilt_without_changes(self):
+        """Неизменившийся каталог не пересобирается, изменение урока даёт новую версию."""
+
+        first = build_catalogue_snapshot(chunk_size=1)
+        self.assertEqual(build_catalogue_snapshot(), first)
+
+        self.lesson.name = "Новое введение"
+        self.lesson.save()
+
+        second = build_catalogue_snapshot(chunk_size=1)
+        self.assertGreater(second["version"], first["version"])
+        self.assertEqual(self.read_snapshot(second)[0]["lessons"][0]["name"], "Новое введение")
+
+    def test_snapshot_publishes_only_catalogue_fields(self):
+        """В публичный снимок не попадают ссылки на видео и превью."""
+
+        Lesson.objects.filter(pk=self.lesson.pk).update(video="https://www.youtube.com/watch?v=34Rp6KVGIEM")
+        Course.objects.filter(pk=self.python.pk).update(preview="materials/preview/python.png")
+
+        entry = self.read_snapshot(build_catalogue_snapshot())[0]
+
+        self.assertEqual(set(entry), {"id", "name", "description", "updated_at", "lessons"})
+        self.assertEqual(set(entry["lessons"][0]), {"id", "name"})
+
+    @override_settings(CATALOGUE_CHANGES_OVERLAP=0)
+    def test_deleted_course_changes_version(self):
+        """Удаление курса даёт новую версию: снимок пересобирается, изменения сообщают об удалении."""
+
+        first = build_catalogue_snapshot()
+        django_id = self.django.pk
+        self.django.delete()
+
+        second = build_catalogue_snapshot()
+        self.assertGreater(second["version"], first["version"])
+        self.assertEqual([entry["name"] for entry in self.read_snapshot(second)], ["Python"])
+
+        response = self.client.get(reverse("materials:catalogue-changes"), {"since": first["version"]})
+        data = response.json()
+        self.assertFalse(data["snapshot_required"])
+        self.assertEqual(data["courses"], [])
+        self.assertEqual(data["deleted"], [django_id])
+        self.assertEqual(data["version"], second["version"])
+
+    def test_changes_since_expired_version_require_snapshot(self):
+        """Версия старше срока хранения записей об удалениях требует скачать снимок."""
+
+        since = catalogue_version(timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS + 1))
+
+        response = self.client.get(reverse("materials:catalogue-changes"), {"since": since})
+
+        self.assertTrue(response.json()["snapshot_required"])
+
+    def test_manifest_missing(self):
+        """Пока снимок не собран, описание снимка недоступно."""
+
+        response = self.client.get(reverse("materials:catalogue-snapshot"))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(CATALOGUE_CHANGES_OVERLAP=0)
+    def test_changes_since_version(self):
+        """Изменения каталога содержат курсы, изменённые после версии клиента."""
+
+        version = build_catalogue_snapshot()["version"]
+        Lesson.objects.create(name="Модели", course=self.django, owner=self.user)
+
+        response = self.client.get(reverse("materials:catalogue-changes"), {"since": version})
+        data = response.json()
+
+        self.assertFalse(data["snapshot_required"])
+        self.assertEqual([course["id"] for course in data["courses"]], [self.django.pk])
+        self.assertGreater(data["version"], version)
+
+    @override_settings(CATALOGUE_CHANGES_LIMIT=1)
+    def test_changes_over_limit_require_snapshot(self):
+        """Если изменений больше лимита, клиенту предлагается скачать снимок."""
+
+        response = self.client.get(reverse("materials:catalogue-changes"), {"since": 0})
+
+        self.assertTrue(response.json()["snapshot_required"])
+        self.assertEqual(response.json()["courses"], [])
+
+    def test_changes_invalid_since(self):
+        """Некорректная версия отклоняется."""
+
+        for since in ("abc", "-1", "100000000000000000000"):
+            response = self.client.get(reverse("materials:catalogue-changes"), {"since": since})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(SYNC_CHANGES_OVERLAP=0)
+class SyncChangesTestCase(APITestCase):
+    """Тесты инкрементальной синхронизации."""
+
+    def setUp(self):
+        self.user = User.objects.create(email="sync@example.com")
+        self.other = User.objects.create(email="other-sync@example.com")
+        self.client.force_authenticate(user=self.user)
+        self.course = Course.objects.create(name="Python", owner=self.user)
+        self.lesson = Lesson.objects.create(name="Введение", course=self.course, owner=self.user)
+        self.subscription = Subscription.objects.create(user=self.user, course=self.course)
+        Course.objects.create(name="Чужой курс", owner=self.other)
+
+    def get_changes(self, since=None):
+        params = {"since": since} if since is not None else {}
+        response = self.client.get(reverse("materials:changes"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_full_sync(self):
+        """Без токена отдаются все доступные пользователю объекты."""
+
+        data = self.get_changes()
+
+        self.assertFalse(data["has_more"])
+        self.assertEqual(
+            data["upserts"]["courses"],
+            [{"id": self.course.pk, "name": "Python", "description": None, "preview": None}],
+        )
+        self.assertEqual([lesson["id"] for lesson in data["upserts"]["lessons"]], [self.lesson.pk])
+        self.assertEqual(
+            data["upserts"]["subscriptions"],
+            [{"id": self.subscription.pk, "course_id": self.course.pk, "is_active": True}],
+        )
+        self.assertEqual(data["deletes"], {"courses": [], "lessons": [], "subscriptions": []})
+
+    def test_changes_since_token(self):
+        """По токену отдаются только изменения и удаления после него; изменение урока обновляет курс."""
+
+        token = self.get_changes()["token"]
+        self.lesson.name = "Новое введение"
+        self.lesson.save()
+        subscription_id = self.subscription.pk
+        self.subscription.delete()
+
+        data = self.get_changes(token)
+
+        self.assertEqual([course["id"] for course in data["upserts"]["courses"]], [self.course.pk])
+        self.assertEqual([lesson["name"] for lesson in data["upserts"]["lessons"]], ["Новое введение"])
+        self.assertEqual(data["deletes"]["subscriptions"], [subscription_id])
+        self.assertEqual(self.get_changes(data["token"])["upserts"]["lessons"], [])
+
+    def test_deletes_are_scoped_to_user(self):
+        """Пользователь не получает записи об удалении чужих объектов."""
+
+        token = self.get_changes()["token"]
+        Course.objects.get(name="Чужой курс").delete()
+
+        self.assertEqual(self.get_changes(token)["deletes"]["courses"], [])
+
+    def read_all_pages(self, since=None):
+        """Проходит все страницы изменений; возвращает страницы."""
+
+        pages = [self.get_changes(since)]
+        while pages[-1]["has_more"]:
+            pages.append(self.get_changes(pages[-1]["token"]))
+        return pages
+
+    @override_settings(SYNC_CHANGES_LIMIT=1)
+    def test_pagination(self):
+        """Изменения сверх лимита отдаются следующими страницами, в каждой не больше лимита объектов."""
+
+        second = Lesson.objects.create(name="Переменные", course=self.course, owner=self.user)
+
+        pages = self.read_all_pages()
+
+        self.assertEqual(len(pages), 4)
+        for page in pages:
+            self.assertLessEqual(sum(len(rows) for rows in page["upserts"].values()), 1)
+        lessons = [lesson["id"] for page in pages for lesson in page["upserts"]["lessons"]]
+        self.assertEqual(sorted(lessons), [self.lesson.pk, second.pk])
+
+    @override_settings(SYNC_CHANGES_LIMIT=2)
+    def test_pagination_with_equal_timestamps(self):
+        """Объекты с одинаковым updated_at делятся на страницы по pk, а не отдаются одной страницей."""
+
+        lessons = [
+            Lesson.objects.create(name=f"Урок {i}", course=self.course, owner=self.user).pk for i in range(4)
+        ]
+        Lesson.objects.update(updated_at=timezone.now() - timedelta(days=1))
+
+        pages = self.read_all_pages()
+
+        for page in pages:
+            self.assertLessEqual(sum(len(rows) for rows in page["upserts"].values()), 2)
+        received = [lesson["id"] for page in pages for lesson in page["upserts"]["lessons"]]
+        self.assertEqual(received, sorted([self.lesson.pk, *lessons]))
+
+    def test_deleted_course_detaches_lessons(self):
+        """Уроки удалённого курса приходят в изменениях без курса."""
+
+        token = self.get_changes()["token"]
+        Lesson.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        self.course.delete()
+
+        data = self.get_changes(token)
+
+        self.assertEqual(
+            [(lesson["id"], lesson["course_id"]) for lesson in data["upserts"]["lessons"]], [(self.lesson.pk, None)]
+        )
+
+    def test_expired_token_resets(self):
+        """Токен старше срока хранения записей об удалениях требует полной загрузки."""
+
+        data = self.get_changes("1")
+
+        self.assertTrue(data["reset"])
+        self.assertEqual([course["id"] for course in data["upserts"]["courses"]], [self.course.pk])
+
+    def test_invalid_token(self):
+        """Некорректный токен отклоняется."""
+
+        for token in ("abc", "-1", "9" * 30, "1.2", "1.-1.0"):
+            response = self.client.get(reverse("materials:changes"), {"since": token})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_prune_tombstones(self):
+        """Устаревшие записи об удалениях удаляются."""
+
+        self.lesson.delete()
+        Tombstone.objects.update(deleted_at=timezone.now() - timedelta(days=60))
+
+        self.assertEqual(prune_tombstones(), 1)
+        self.assertFalse(Tombstone.objects.exists())
+
+
+class LessonOrderTestCase(APITestCase):
+    """Тесты порядка уроков в курсе."""
+
+    def setUp(self):
+        self.user = User.objects.create(email="order@example.com")
+        self.client.force_authenticate(user=self.user)
+        self.course = Course.objects.create(name="Python", owner=self.user)
+        self.lessons = [
+            Lesson.objects.create(name=f"Урок {number}", course=self.course, owner=self.user) for number in range(1, 6)
+        ]
+        self.ids = [lesson.pk for lesson in self.lessons]
+
+    def ranks(self):
+        return dict(Lesson.objects.filter(course=self.course).values_list("id", "rank"))
+
+    def order(self):
+        return list(ordered_lessons(self.course.pk).values_list("id", flat=True))
+
+    def test_new_lessons_appended_with_gaps(self):
+        """Новые уроки добавляются в конец курса с промежутками между рангами."""
+
+        self.assertEqual(self.order(), self.ids)
+        self.assertEqual(sorted(self.ranks().values()), [LESSON_RANK_GAP * number for number in range(1, 6)])
+
+    def test_reorder_changes_only_moved_lessons(self):
+        """Перестановка меняет ранги только переставленных уроков одним запросом на запись."""
+
+        new_order = [self.ids[3], *self.ids[:3], self.ids[4]]
+        before = self.ranks()
+
+        response = self.client.post(
+            reverse("materials:course-reorder", args=(self.course.pk,)), {"lessons": new_order}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {"lessons": new_order, "changed": 1})
+        self.assertEqual(self.order(), new_order)
+        after = self.ranks()
+        self.assertEqual([pk for pk in self.ids if before[pk] != after[pk]], [self.ids[3]])
+
+    def test_reorder_single_bulk_update(self):
+        """Новый порядок сохраняется одним запросом UPDATE уроков (и обновлением курса) в точке сохранения."""
+
+        with self.assertNumQueries(5):
+            reorder_lessons(self.course, self.ids[::-1])
+        self.assertEqual(self.order(), self.ids[::-1])
+
+    def test_reorder_requires_all_lessons(self):
+        """Список без части уроков курса отклоняется."""
+
+        response = self.client.post(
+            reverse("materials:course-reorder", args=(self.course.pk,)), {"lessons": self.ids[:-1]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_move_lesson(self):
+        """Перемещение урока меняет ранг только этого урока."""
+
+        response = self.client.post(
+            reverse("materials:lesson-move", args=(self.ids[0],)), {"after": self.ids[2]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["lessons"], [self.ids[1], self.ids[2], self.ids[0], *self.ids[3:]])
+
+        self.client.post(reverse("materials:lesson-move", args=(self.ids[4],)), {"after": None}, format="json")
+        self.assertEqual(self.order()[0], self.ids[4])
+
+    def test_move_after_lesson_removed_concurrently(self):
+        """Урок after, удалённый или перенесённый после проверки, даёт ошибку, а не падение."""
+
+        after = self.lessons[2]
+        other = Course.objects.create(name="Django", owner=self.user)
+        Lesson.objects.filter(pk=after.pk).update(course=other)
+
+        with self.assertRaises(ValueError):
+            move_lesson(self.lessons[0], after=after)
+
+        deleted = self.lessons[3]
+        Lesson.objects.filter(pk=deleted.pk).delete()
+        with self.assertRaises(ValueError):
+            move_lesson(self.lessons[0], after=deleted)
+        self.assertEqual(self.order()[0], self.ids[0])
+
+    def test_exhausted_gap_rebalances(self):
+        """Когда промежуток исчерпан, ранги пересчитываются, а малые промежутки планируют перебалансировку."""
+
+        Lesson.objects.filter(pk__in=self.ids[:2]).update(rank=10)
+        Lesson.objects.filter(pk=self.ids[1]).update(rank=11)
+
+        with patch("materials.tasks.rebalance_course_lessons.apply_async") as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                move_lesson(self.lessons[4], after=self.lessons[0])
+
+        self.assertEqual(self.order(), [self.ids[0], self.ids[4], *self.ids[1:4]])
+        apply_async.assert_not_called()
+
+        Lesson.objects.filter(pk=self.ids[1]).update(rank=LESSON_RANK_GAP * 2 + 20)
+        with patch("materials.tasks.rebalance_course_lessons.apply_async") as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                move_lesson(self.lessons[2], after=self.lessons[4])
+        apply_async.assert_called_once()
+
+        self.assertEqual(rebalance_course_lessons(self.course.pk), 2)
+        self.assertEqual(sorted(self.ranks().values()), [LESSON_RANK_GAP * number for number in range(1, 6)])
+        self.assertEqual(self.order(), [self.ids[0], self.ids[4], self.ids[2], self.ids[1], self.ids[3]])
+
+    def test_course_lessons_in_curriculum_order(self):
+        """Курс отдаёт названия уроков в порядке программы."""
+
+        reorder_lessons(self.course, self.ids[::-1])
+
+        response = self.client.get(reverse("materials:course-detail", args=(self.course.pk,)))
+        self.assertEqual(response.json()["lessons"], [f"Урок {number}" for number in range(5, 0, -1)])
+
+
+@patch("materials.tasks.flush_lesson_progress.apply_async")
+class LessonProgressTestCase(APITestCase):
+    """Тесты буферизованного прогресса по урокам."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="progress@example.com")
+        self.client.force_authenticate(user=self.user)
+        self.course = Course.objects.create(name="Python", owner=self.user)
+        self.lessons = [
+            Lesson.objects.create(name=f"Урок {number}", course=self.course, owner=self.user) for number in range(1, 5)
+        ]
+
+    def mark(self, lesson, completed=False):
+        return self.client.post(
+            reverse("materials:lesson-progress", args=(lesson.pk,)), {"completed": completed}, format="json"
+        )
+
+    def test_mark_does_not_write_to_database(self, apply_async):
+        """Отметка попадает в буфер без записи в базу, перенос планируется один раз."""
+
+        with self.assertNumQueries(0):
+            record_lesson_progress(self.user.pk, self.lessons[0], completed=True)
+        self.assertEqual(self.mark(self.lessons[1]).status_code, status.HTTP_202_ACCEPTED)
+
+        self.assertFalse(LessonProgress.objects.exists())
+        apply_async.assert_called_once()
+
+    def test_course_progress_reads_buffer_and_table(self, apply_async):
+        """Процент прохождения учитывает и перенесённые, и ещё буферизованные отметки."""
+
+        self.mark(self.lessons[0], completed=True)
+        flush_lesson_progress()
+        self.mark(self.lessons[1], completed=True)
+        self.mark(self.lessons[2])
+
+        response = self.client.get(reverse("materials:course-progress", args=(self.course.pk,)))
+
+        self.assertEqual(
+            response.json(),
+            {
+                "course": self.course.pk,
+                "lessons": 4,
+                "viewed": 3,
+                "completed": 2,
+                "percent": 50.0,
+                "completed_lessons": [self.lessons[0].pk, self.lessons[1].pk],
+            },
+        )
+
+    def test_progress_requires_access_to_course(self, apply_async):
+        """Отмечать уроки и видеть прогресс могут владелец, подписчик и покупатель, но не посторонний."""
+
+        stranger = User.objects.create(email="stranger@example.com")
+        self.client.force_authenticate(user=stranger)
+        course_progress_url = reverse("materials:course-progress", args=(self.course.pk,))
+        self.assertEqual(self.mark(self.lessons[0]).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get(course_progress_url).status_code, status.HTTP_403_FORBIDDEN)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(user=stranger, amount=100, item=self.lessons[0])
+        self.assertEqual(self.mark(self.lessons[0]).status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.mark(self.lessons[1]).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get(course_progress_url).status_code, status.HTTP_200_OK)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.create(user=stranger, course=self.course)
+        self.assertEqual(self.mark(self.lessons[1]).status_code, status.HTTP_202_ACCEPTED)
+
+    def test_flush_merges_with_saved_progress(self, apply_async):
+        """Перенос пишет строки пачкой и не затирает время прохождения последующими просмотрами."""
+
+        self.mark(self.lessons[0], completed=True)
+        self.mark(self.lessons[1])
+        self.assertEqual(flush_lesson_progress(), 2)
+        completed_at = LessonProgress.objects.get(lesson=self.lessons[0]).completed_at
+
+        self.mark(self.lessons[0])
+        self.mark(self.lessons[0], completed=True)
+        self.assertEqual(flush_lesson_progress(), 1)
+
+        progress = LessonProgress.objects.get(lesson=self.lessons[0])
+        self.assertEqual(progress.completed_at, completed_at)
+        self.assertGreater(progress.viewed_at, completed_at)
+        self.assertEqual(LessonProgress.objects.count(), 2)
+        self.assertEqual(flush_lesson_progress(), 0)
+
+    def test_flush_skips_deleted_lessons(self, apply_async):
+        """Отметки удалённых уроков не переносятся."""
+
+        self.mark(self.lessons[0], completed=True)
+        self.mark(self.lessons[3])
+        self.lessons[3].delete()
+
+        self.assertEqual(flush_lesson_progress(), 1)
+        self.assertEqual(list(LessonProgress.objects.values_list("lesson_id", flat=True)), [self.lessons[0].pk])
+
+
+class SeedDatasetTestCase(TestCase):
+    """Тесты генерации синтетических данных."""
+
+    def seed(self, **options):
+        options = {"users": 200, "courses": 15, "lessons_per_course": 4, "seed": 7, "batch_size": 64, **options}
+        call_command("seed_dataset", stdout=StringIO(), **options)
+
+    def snapshot(self):
+        return (
+            list(User.objects.order_by("pk").values_list("pk", "email", "date_joined", "is_active")),
+            list(Lesson.objects.order_by("pk").values_list("pk", "course_id", "name", "rank")),
+            list(Subscription.objects.order_by("pk").values_list("user_id", "course_id", "created_at")),
+            list(Payment.objects.order_by("pk").values_list("user_id", "object_id", "amount", "payment_date")),
+        )
+
+    def test_seed_dataset(self):
+        """Команда заполняет все таблицы связанными данными с сохранёнными датами и порядком уроков."""
+
+        self.seed()
+
+        self.assertEqual(User.objects.count(), 200)
+        self.assertEqual(Course.objects.count(), 15)
+        self.assertTrue(Subscription.objects.exists())
+        self.assertTrue(Payment.objects.exists())
+        self.assertFalse(Lesson.objects.filter(course__isnull=True).exists())
+        for course_id in Course.objects.values_list("pk", flat=True)[:3]:
+            lessons = list(ordered_lessons(course_id).values_list("rank", flat=True))
+            self.assertEqual(lessons, [LESSON_RANK_GAP * (i + 1) for i in range(len(lessons))])
+        self.assertFalse(Payment.objects.filter(payment_date__gte=SEED_UNTIL).exists())
+        for subscription in Subscription.objects.select_related("user")[:50]:
+            self.assertGreaterEqual(subscription.created_at, subscription.user.date_joined)
+
+        # Счётчики ID сдвинуты: новые объекты создаются после сгенерированных
+        self.assertGreater(User.objects.create(email="new@example.com").pk, 200)
+
+    def test_seed_dataset_is_deterministic(self):
+        """Одинаковый seed на пустой базе даёт одинаковые данные, другой seed — другие."""
+
+        self.seed()
+        first = self.snapshot()
+        Payment.objects.all().delete()
+        Course.objects.all().delete()
+        Lesson.objects.all().delete()
+        User.objects.all().delete()
+
+        self.seed()
+        self.assertEqual(self.snapshot(), first)
+
+        Payment.objects.all().delete()
+        Course.objects.all().delete()
+        Lesson.objects.all().delete()
+        User.objects.all().delete()
+        self.seed(seed=8)
+        self.assertNotEqual(self.snapshot(), first)
+
+
+@override_settings(MEDIA_ACCEL_REDIRECT=True, MEDIA_ACCEL_PREFIX="/protected-media/")
+class ProtectedMediaTestCase(APITestCase):
+    """Тесты проверки доступа к загруженным файлам и заголовка X-Accel-Redirect."""
+
+    preview = "materials/preview/python.png"
+    digest = "ab" * 32
+    thumb = f"renditions/ab/{digest}_thumb.webp"
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create(email="owner@example.com")
+        self.student = User.objects.create(email="student@example.com")
+        self.course = Course.objects.create(
+            name="Python",
+            owner=self.owner,
+            preview=self.preview,
+            preview_renditions={"source": self.preview, "sha256": self.digest, "files": {"thumb": self.thumb}},
+            preview_sha256=self.digest,
+        )
+        self.lesson = Lesson.objects.create(
+            name="Введение",
+            course=self.course,
+            owner=self.owner,
+            preview="materials/preview/intro.png",
+            preview_renditions={"source": "materials/preview/intro.png"},
+        )
+
+    def get(self, path, user=None):
+        self.client.force_authenticate(user=user)
+        return self.client.get(f"/media/{path}")
+
+    def assertAccelRedirect(self, response, path):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{path}")
+        self.assertNotIn("Content-Type", response)
+        self.assertEqual(response.content, b"")
+
+    def test_owner_and_moderator_get_file(self):
+        """Владелец и модератор получают превью и его копии."""
+
+        self.assertAccelRedirect(self.get(self.preview, self.owner), self.preview)
+        self.assertAccelRedirect(self.get(self.thumb, self.owner), self.thumb)
+        self.assertIn("private", self.get(self.preview, self.owner)["Cache-Control"])
+
+        moderator = User.objects.create(email="moder@example.com")
+        moderator.groups.add(Group.objects.create(name="moders"))
+        self.assertAccelRedirect(self.get(self.thumb, moderator), self.thumb)
+
+    def test_subscriber_and_payer_get_file(self):
+        """Подписчик курса получает файлы курса и уроков, покупатель урока — только файлы урока."""
+
+        Subscription.objects.create(user=self.student, course=self.course)
+        self.assertAccelRedirect(self.get(self.preview, self.student), self.preview)
+        self.assertAccelRedirect(self.get("materials/preview/intro.png", self.student), "materials/preview/intro.png")
+
+        payer = User.objects.create(email="payer@example.com")
+        Payment.objects.create(user=payer, amount=100, item=self.lesson)
+        self.assertAccelRedirect(self.get("materials/preview/intro.png", payer), "materials/preview/intro.png")
+        self.assertEqual(self.get(self.preview, payer).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_access_denied(self):
+        """Посторонний получает 403, анонимный пользователь — 401, неизвестный или чужой путь — 404."""
+
+        self.assertEqual(self.get(self.preview, self.student).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.get(self.preview).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.get("materials/preview/missing.png", self.owner).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.get("../config/settings.py", self.owner).status_code, status.HTTP_404_NOT_FOUND)
+        foreign_rendition = f"renditions/cd/{self.digest}_thumb.webp"
+        self.assertEqual(self.get(foreign_rendition, self.owner).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_owners_resolved_by_indexed_columns(self):
+        """Владелец файла ищется по индексированным путём и SHA-256 столбцам, без разбора JSON копий."""
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertAccelRedirect(self.get(self.thumb, self.owner), self.thumb)
+            self.assertAccelRedirect(self.get(self.preview, self.owner), self.preview)
+        self.assertFalse(any("preview_renditions" in query["sql"] for query in queries.captured_queries))
+
+    def test_avatar_is_public(self):
+        """Аватары открыты всем и кешируются публично."""
+
+        User.objects.filter(pk=self.owner.pk).update(avatar="users/avatars/owner.png")
+        response = self.get("users/avatars/owner.png")
+        self.assertAccelRedirect(response, "users/avatars/owner.png")
+        self.assertIn("public", response["Cache-Control"])
+
+    def test_entitlements_are_cached_and_invalidated(self):
+        """Доступ по JWT проверяется по кешу без запросов к базе и пересчитывается после новой подписки."""
+
+        token = UserTokenObtainPairSerializer.get_token(self.student).access_token
+        self.client.get(f"/media/{self.preview}", HTTP_AUTHORIZATION=f"Bearer {token}")
+        with self.assertNumQueries(0):
+            response = self.client.get(f"/media/{self.preview}", HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            subscription = Subscription.objects.create(user=self.student, course=self.course)
+        self.assertAccelRedirect(self.get(self.preview, self.student), self.preview)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            subscription.delete()
+        self.assertEqual(self.get(self.preview, self.student).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_owners_invalidated_when_lesson_moves(self):
+        """После переноса урока в другой курс доступ к его превью сразу определяется новым курсом."""
+
+        intro = "materials/preview/intro.png"
+        other_owner = User.objects.create(email="other@example.com")
+        other_course = Course.objects.create(name="Django", owner=other_owner)
+        Subscription.objects.create(user=self.student, course=other_course)
+        self.assertAccelRedirect(self.get(intro, self.owner), intro)
+        self.assertEqual(self.get(intro, self.student).status_code, status.HTTP_403_FORBIDDEN)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lesson.course = other_course
+            self.lesson.owner = other_owner
+            self.lesson.save()
+        self.assertAccelRedirect(self.get(intro, self.student), intro)
+        self.assertEqual(self.get(intro, self.owner).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_media_is_throttled(self):
+        """Запросы к файлам ограничены отдельными лимитами для анонимных и авторизованных."""
+
+        rates = {"media": "2/min", "media.anon": "1/min"}
+        with self.settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates}):
+            self.assertEqual(self.get(self.preview).status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertEqual(self.get(self.preview).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+            self.assertAccelRedirect(self.get(self.preview, self.owner), self.preview)
+            self.assertAccelRedirect(self.get(self.preview, self.owner), self.preview)
+            self.assertEqual(self.get(self.preview, self.owner).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_serves_file_without_nginx(self):
+        """Без MEDIA_ACCEL_REDIRECT файл отдаёт Django."""
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        os.makedirs(os.path.join(media_root, "materials", "preview"))
+        with open(os.path.join(media_root, self.preview), "wb") as file:
+            file.write(b"png")
+
+        with self.settings(MEDIA_ROOT=media_root, MEDIA_ACCEL_REDIRECT=False):
+            response = self.get(self.preview, self.owner)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("X-Accel-Redirect", response)
+        self.assertEqual(b"".join(response.streaming_content), b"png")
@@ -2,8 +2,10 @@ from django.urls import path
 from rest_framework.routers import SimpleRouter
 
 from materials.apps import MaterialsConfig
-from materials.views import (CourseViewSet, LessonCreateAPIView, LessonDestroyAPIView, LessonListAPIView,
-                             LessonRetrieveAPIView, LessonUpdateAPIView, SubscriptionAPIView)
+from materials.views import (CatalogueChangesAPIView, CatalogueSnapshotAPIView, ChangesAPIView, CourseProgressAPIView,
+                             CourseViewSet, LessonCreateAPIView, LessonDestroyAPIView, LessonListAPIView,
+                             LessonMoveAPIView, LessonProgressAPIView, LessonRetrieveAPIView, LessonUpdateAPIView,
+                             SubscriptionAPIView)
 
 app_name = MaterialsConfig.name
 
@@ -16,8 +18,14 @@ urlpatterns = [
     path("lesson/<int:pk>/", LessonRetrieveAPIView.as_view(), name="lesson-get"),
     path("lesson/<int:pk>/update/", LessonUpdateAPIView.as_view(), name="lesson-update"),
     path("lesson/<int:pk>/delete/", LessonDestroyAPIView.as_view(), name="lesson-delete"),
+    path("lesson/<int:pk>/move/", LessonMoveAPIView.as_view(), name="lesson-move"),
+    path("lesson/<int:pk>/progress/", LessonProgressAPIView.as_view(), name="lesson-progress"),
+    path("<int:pk>/progress/", CourseProgressAPIView.as_view(), name="course-progress"),
     path("lesson/create/", LessonCreateAPIView.as_view(), name="lesson-create"),
     path("subscription/", SubscriptionAPIView.as_view(), name="subs-create-delete"),
+    path("catalogue/", CatalogueSnapshotAPIView.as_view(), name="catalogue-snapshot"),
+    path("catalogue/changes/", CatalogueChangesAPIView.as_view(), name="catalogue-changes"),
+    path("changes/", ChangesAPIView.as_view(), name="changes"),
 ]
 
 urlpatterns += router.urls
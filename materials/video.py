@@ -0,0 +1,98 @@
+import re
+from urllib.parse import parse_qs, urlparse
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.dateparse import parse_duration
+from django.utils.module_loading import import_string
+
+from config.clients import http_session
+
+YOUTUBE_VIDEOS_URL = "https://www.googleapis.com/youtube/v3/videos"
+# Столько ID принимает один запрос к YouTube Data API
+YOUTUBE_MAX_IDS = 50
+# ID видео YouTube: 11 символов base64url
+VIDEO_ID_RE = re.compile(r"[A-Za-z0-9_-]{11}")
+
+
+def _extract_video_id(url):
+    parsed = urlparse(url)
+    host = parsed.netloc.lower()
+    path = parsed.path.strip("/")
+
+    if host == "youtu.be":
+        return path.split("/")[0]
+    if host.endswith("youtube.com"):
+        if path == "watch":
+            return parse_qs(parsed.query).get("v", [None])[0]
+        prefix, _, video_id = path.partition("/")
+        if prefix in ("embed", "shorts", "live", "v"):
+            return video_id.split("/")[0]
+    return None
+
+
+def parse_video_id(url):
+    """Возвращает ID видео YouTube из ссылки или None, если ссылка не на видео или ID некорректен."""
+
+    if not url:
+        return None
+    video_id = _extract_video_id(url)
+    if video_id is None or not VIDEO_ID_RE.fullmatch(video_id):
+        return None
+    return video_id
+
+
+class StubVideoProvider:
+    """Провайдер для локальной разработки и тестов: метаданные строятся по ID без сетевых запросов."""
+
+    def fetch(self, video_ids):
+        """Возвращает словарь {video_id: метаданные}; отсутствующие видео в него не попадают."""
+
+        return {
+            video_id: {
+                "title": f"Video {video_id}",
+                "duration": 0,
+                "thumbnail_url": f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+            }
+            for video_id in video_ids
+        }
+
+
+class YouTubeVideoProvider:
+    """Метаданные из YouTube Data API v3: по одному запросу на YOUTUBE_MAX_IDS видео."""
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key or settings.YOUTUBE_API_KEY
+
+    def fetch(self, video_ids):
+        video_ids = list(video_ids)
+        result = {}
+        for start in range(0, len(video_ids), YOUTUBE_MAX_IDS):
+            response = http_session().get(
+                YOUTUBE_VIDEOS_URL,
+                params={
+                    "part": "snippet,contentDetails",
+                    "id": ",".join(video_ids[start : start + YOUTUBE_MAX_IDS]),
+                    "key": self.api_key,
+                },
+                timeout=settings.VIDEO_METADATA_TIMEOUT,
+            )
+            response.raise_for_status()
+            for item in response.json().get("items", []):
+                duration = parse_duration(item["contentDetails"]["duration"])
+                thumbnails = item["snippet"].get("thumbnails", {})
+                thumbnail = thumbnails.get("high") or thumbnails.get("default") or {}
+                result[item["id"]] = {
+                    "title": item["snippet"]["title"],
+                    "duration": int(duration.total_seconds()) if duration else None,
+                    "thumbnail_url": thumbnail.get("url", ""),
+                }
+        return result
+
+
+def get_video_provider():
+    """Провайдер метаданных из настройки VIDEO_METADATA_PROVIDER."""
+
+    if not settings.VIDEO_METADATA_PROVIDER:
+        raise ImproperlyConfigured("Укажите YOUTUBE_API_KEY или VIDEO_METADATA_PROVIDER")
+    return import_string(settings.VIDEO_METADATA_PROVIDER)()
@@ -1,14 +1,31 @@
-from drf_spectacular.utils import OpenApiResponse, extend_schema, extend_schema_view
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.static import serve
+from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, extend_schema, extend_schema_view
 from rest_framework import status
-from rest_framework.generics import (CreateAPIView, DestroyAPIView, ListAPIView, RetrieveAPIView, UpdateAPIView,
-                                     get_object_or_404)
+from rest_framework.decorators import action
+from rest_framework.generics import (CreateAPIView, DestroyAPIView, GenericAPIView, ListAPIView, RetrieveAPIView,
+                                     UpdateAPIView, get_object_or_404)
+from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
-from materials.models import Course, Lesson, Subscription
+from config.values_serializers import ValuesListMixin
+from materials.media import access_scope, can_access_media, media_owners, normalize_media_path
+from materials.models import Course, CourseUpdateEvent, Lesson, Subscription
 from materials.paginators import CustomPagination
-from materials.serializers import CourseSerializer, LessonDetailSerializer, LessonSerializer
-from users.permissions import IsModer, IsOwner
+from materials.progress import course_progress, record_lesson_progress
+from materials.serializers import (CourseSerializer, LessonDetailSerializer, LessonMoveSerializer,
+                                   LessonProgressSerializer, LessonReorderSerializer, LessonSerializer,
+                                   LessonValuesSerializer)
+from materials.services import (course_delivery_stats, move_lesson, ordered_lessons, record_course_event,
+                                reorder_lessons)
+from materials.snapshots import catalogue_changes, read_manifest, version_datetime
+from materials.sync import collect_changes
+from users.permissions import IsModer, IsOwner, is_moderator
 
 
 @extend_schema(tags=["Курсы"])
@@ -31,22 +48,24 @@ class CourseViewSet(ModelViewSet):
         """Назначает владельца курса текущим пользователем."""
 
         course = serializer.save()
-        course.owner = self.request.user
+        course.owner_id = self.request.user.pk
         course.save()
 
     def perform_update(self, serializer):
-        """Обновляет курс и меняет флаг notification_pending = True."""
+        """Обновляет курс и в той же транзакции записывает событие в outbox уведомлений."""
 
-        course = serializer.save()
-        course.notification_pending = True
-        course.save(update_fields=["notification_pending"])
+        with transaction.atomic():
+            course = serializer.save()
+            record_course_event(
+                course, CourseUpdateEvent.EventType.COURSE_UPDATED, {"fields": sorted(serializer.validated_data)}
+            )
 
     def get_queryset(self):
         """Возвращает доступные пользователю курсы."""
 
-        if self.request.user.is_superuser or self.request.user.groups.filter(name="moders").exists():
+        if self.request.user.is_superuser or is_moderator(self.request.user):
             return Course.objects.all()
-        return Course.objects.filter(owner=self.request.user)
+        return Course.objects.filter(owner_id=self.request.user.pk)
 
     def get_permissions(self):
         """Определяет права доступа в зависимости от действия."""
@@ -56,12 +75,48 @@ class CourseViewSet(ModelViewSet):
         elif self.action in [
             "retrieve",
             "update",
+            "notification_stats",
+            "reorder",
         ]:
             self.permission_classes = (IsModer | IsOwner,)
         elif self.action == "destroy":
             self.permission_classes = (IsOwner,)
         return super().get_permissions()
 
+    @extend_schema(
+        description="Статистика доставки последних рассылок об обновлении курса (владелец или модератор)",
+        responses={200: OpenApiResponse(description="Список рассылок: получатели и доставки по каналам")},
+    )
+    @action(detail=True, methods=["get"], url_path="notification-stats")
+    def notification_stats(self, request, pk=None):
+        """Возвращает число доставленных уведомлений по рассылкам курса."""
+
+        return Response(course_delivery_stats(self.get_object()))
+
+    @extend_schema(
+        description=(
+            "Задаёт новый порядок уроков курса (владелец или модератор). Список должен содержать все уроки курса; "
+            "меняются ранги только переставленных уроков."
+        ),
+        request=LessonReorderSerializer,
+        responses={
+            200: OpenApiResponse(description="Уроки курса в новом порядке и число изменённых уроков"),
+            400: OpenApiResponse(description="Список не совпадает с уроками курса"),
+        },
+    )
+    @action(detail=True, methods=["post"], serializer_class=LessonReorderSerializer)
+    def reorder(self, request, pk=None):
+        """Переставляет уроки курса одним запросом."""
+
+        course = self.get_object()
+        serializer = LessonReorderSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            changed = reorder_lessons(course, serializer.validated_data["lessons"])
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"lessons": list(ordered_lessons(course.pk).values_list("id", flat=True)), "changed": changed})
+
 
 @extend_schema(tags=["Уроки"])
 class LessonCreateAPIView(CreateAPIView):
@@ -71,39 +126,37 @@ class LessonCreateAPIView(CreateAPIView):
     permission_classes = (~IsModer,)
 
     def perform_create(self, serializer):
-        """Создаёт урок и помечает связанный курс как требующий уведомления."""
+        """Создаёт урок и в той же транзакции записывает событие курса в outbox уведомлений."""
 
-        lesson = serializer.save()
-        lesson.owner = self.request.user
-        lesson.save()
+        with transaction.atomic():
+            lesson = serializer.save()
+            lesson.owner_id = self.request.user.pk
+            lesson.save()
 
-        course = lesson.course
-        if not course:
-            return
-
-        course.notification_pending = True
-        course.save(update_fields=["notification_pending"])
+            if lesson.course:
+                record_course_event(lesson.course, CourseUpdateEvent.EventType.LESSON_CREATED, {"lesson": lesson.id})
 
 
 @extend_schema(tags=["Уроки"], description="Список уроков с учётом прав доступа пользователя")
-class LessonListAPIView(ListAPIView):
+class LessonListAPIView(ValuesListMixin, ListAPIView):
     """Получение списка уроков."""
 
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
+    values_serializer_class = LessonValuesSerializer
     pagination_class = CustomPagination
 
     def get_queryset(self):
-        if self.request.user.is_superuser or self.request.user.groups.filter(name="moders").exists():
+        if self.request.user.is_superuser or is_moderator(self.request.user):
             return Lesson.objects.all()
-        return Lesson.objects.filter(owner=self.request.user)
+        return Lesson.objects.filter(owner_id=self.request.user.pk)
 
 
 @extend_schema(tags=["Уроки"])
 class LessonRetrieveAPIView(RetrieveAPIView):
     """Получение детальной информации об уроке."""
 
-    queryset = Lesson.objects.all()
+    queryset = Lesson.objects.select_related("course", "video_metadata")
     serializer_class = LessonDetailSerializer
     permission_classes = (IsModer | IsOwner,)
 
@@ -117,18 +170,101 @@ class LessonUpdateAPIView(UpdateAPIView):
     permission_classes = (IsModer | IsOwner,)
 
     def perform_update(self, serializer):
-        """Обновляет урок и помечает связанный курс как требующий уведомления."""
+        """Обновляет урок и в той же транзакции записывает событие курса в outbox уведомлений."""
+
+        with transaction.atomic():
+            lesson = serializer.save()
+            lesson.owner_id = self.request.user.pk
+            lesson.save()
+
+            if lesson.course:
+                record_course_event(
+                    lesson.course,
+                    CourseUpdateEvent.EventType.LESSON_UPDATED,
+                    {"lesson": lesson.id, "fields": sorted(serializer.validated_data)},
+                )
+
+
+@extend_schema(
+    tags=["Уроки"],
+    description="Перемещение урока внутри курса: после урока after или, если after равен null, в начало курса",
+    responses={
+        200: OpenApiResponse(description="Уроки курса в новом порядке"),
+        400: OpenApiResponse(description="Урок after из другого курса"),
+    },
+)
+class LessonMoveAPIView(GenericAPIView):
+    """Перемещение урока внутри курса."""
+
+    queryset = Lesson.objects.all()
+    serializer_class = LessonMoveSerializer
+    permission_classes = (IsModer | IsOwner,)
+
+    def post(self, request, pk):
+        lesson = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            move_lesson(lesson, serializer.validated_data["after"])
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"lessons": list(ordered_lessons(lesson.course_id).values_list("id", flat=True))})
+
+
+@extend_schema(
+    tags=["Прогресс"],
+    description=(
+        "Отметка просмотра урока; при completed=true урок отмечается пройденным. "
+        "Отметка сохраняется в буфер и переносится в базу в фоне."
+    ),
+    request=LessonProgressSerializer,
+    responses={
+        202: OpenApiResponse(description="Отметка принята"),
+        400: OpenApiResponse(description="Урок не привязан к курсу"),
+        403: OpenApiResponse(description="Нет доступа к уроку"),
+    },
+)
+class LessonProgressAPIView(APIView):
+    """Отметка прогресса по уроку: владельцу, модератору, подписчику и покупателю курса или урока."""
+
+    def post(self, request, pk):
+        lesson = get_object_or_404(
+            Lesson.objects.select_related("course").only("id", "course_id", "owner_id", "course__owner_id"), pk=pk
+        )
+        if lesson.course_id is None:
+            return Response({"error": "Урок не привязан к курсу"}, status=status.HTTP_400_BAD_REQUEST)
+        scope = access_scope(
+            courses=[lesson.course_id], lessons=[lesson.pk], owners=[lesson.owner_id, lesson.course.owner_id]
+        )
+        if not can_access_media(request.user, scope):
+            self.permission_denied(request, message="Нет доступа к уроку")
+        serializer = LessonProgressSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        record_lesson_progress(request.user.pk, lesson, serializer.validated_data["completed"])
+        return Response(status=status.HTTP_202_ACCEPTED)
 
-        lesson = serializer.save()
-        lesson.owner = self.request.user
-        lesson.save()
 
-        course = lesson.course
-        if not course:
-            return
+@extend_schema(
+    tags=["Прогресс"],
+    description="Прогресс текущего пользователя по курсу, включая ещё не перенесённые в базу отметки",
+    responses={
+        200: OpenApiResponse(description="Число уроков, просмотренных и пройденных, процент прохождения"),
+        403: OpenApiResponse(description="Нет доступа к курсу"),
+    },
+)
+class CourseProgressAPIView(APIView):
+    """Прогресс по курсу: владельцу, модератору, подписчику и покупателю курса или его уроков."""
 
-        course.notification_pending = True
-        course.save(update_fields=["notification_pending"])
+    def get(self, request, pk):
+        course = get_object_or_404(Course.objects.only("id", "owner_id"), pk=pk)
+        scope = access_scope(
+            courses=[course.pk],
+            lessons=Lesson.objects.filter(course_id=course.pk).values_list("pk", flat=True),
+            owners=[course.owner_id],
+        )
+        if not can_access_media(request.user, scope):
+            self.permission_denied(request, message="Нет доступа к курсу")
+        return Response(course_progress(request.user.pk, course.pk))
 
 
 @extend_schema(tags=["Уроки"], description="Удаление урока (доступно только владельцу)")
@@ -139,6 +275,119 @@ class LessonDestroyAPIView(DestroyAPIView):
     permission_classes = (~IsModer | IsOwner,)
 
 
+@extend_schema(
+    tags=["Каталог"],
+    description="Описание последнего снимка каталога курсов: версия и ссылка на gzip NDJSON файл.",
+    responses={
+        200: OpenApiResponse(description="Описание снимка"),
+        404: OpenApiResponse(description="Снимок ещё не собран"),
+    },
+)
+class CatalogueSnapshotAPIView(APIView):
+    """Описание последнего снимка каталога."""
+
+    def get(self, request):
+        manifest = read_manifest()
+        if manifest is None:
+            return Response({"error": "Снимок каталога ещё не собран"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(manifest)
+
+
+@extend_schema(
+    tags=["Каталог"],
+    description=(
+        "Курсы, изменённые после версии since, и ID удалённых курсов (deleted). Если изменений слишком много "
+        "или версия слишком старая, snapshot_required=true: нужно скачать снимок каталога."
+    ),
+    parameters=[OpenApiParameter(name="since", type=int, description="Версия каталога, полученная ранее")],
+    responses={
+        200: OpenApiResponse(description="Версия каталога, изменённые и удалённые курсы"),
+        400: OpenApiResponse(description="Некорректная версия"),
+    },
+)
+class CatalogueChangesAPIView(APIView):
+    """Изменения каталога после версии клиента."""
+
+    def get(self, request):
+        try:
+            since = int(request.query_params.get("since", 0))
+        except ValueError:
+            return Response({"error": "since должен быть целым числом"}, status=status.HTTP_400_BAD_REQUEST)
+        if since < 0:
+            return Response({"error": "since должен быть неотрицательным"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            version_datetime(since)
+        except (ValueError, OverflowError, OSError):
+            return Response({"error": "since вне допустимого диапазона"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(catalogue_changes(since))
+
+
+@extend_schema(
+    tags=["Синхронизация"],
+    description=(
+        "Изменения курсов, уроков и подписок пользователя после токена since: upserts — добавленные и "
+        "изменённые объекты, deletes — ID удалённых. Следующий запрос делается с полученным token; "
+        "при has_more=true — сразу, при reset=true клиент сначала удаляет локальные данные."
+    ),
+    parameters=[OpenApiParameter(name="since", type=str, description="Токен из предыдущего ответа")],
+    responses={
+        200: OpenApiResponse(description="Изменения и новый токен"),
+        400: OpenApiResponse(description="Некорректный токен"),
+    },
+)
+class ChangesAPIView(APIView):
+    """Инкрементальная синхронизация клиентов."""
+
+    def get(self, request):
+        try:
+            changes = collect_changes(request.user, request.query_params.get("since"))
+        except (ValueError, OverflowError, OSError):
+            return Response({"error": "Некорректный токен синхронизации"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(changes)
+
+
+@extend_schema(
+    tags=["Файлы"],
+    description=(
+        "Превью курсов и уроков и их уменьшенные копии. Доступны владельцу, модератору, подписчику "
+        "и покупателю курса или урока; аватары пользователей открыты всем. Сам файл отдаёт nginx "
+        "по заголовку X-Accel-Redirect."
+    ),
+    responses={
+        200: OpenApiResponse(description="Файл"),
+        401: OpenApiResponse(description="Пользователь не авторизован"),
+        403: OpenApiResponse(description="Нет доступа к файлу"),
+        404: OpenApiResponse(description="Файл не найден"),
+    },
+)
+class ProtectedMediaAPIView(APIView):
+    """Проверка доступа к загруженному файлу и передача его отдачи nginx."""
+
+    permission_classes = (AllowAny,)
+    throttle_scope = "media"
+
+    def get(self, request, path):
+        path = normalize_media_path(path)
+        owners = media_owners(path) if path is not None else None
+        if owners is None:
+            raise Http404
+        if not can_access_media(request.user, owners):
+            self.permission_denied(request, message="Нет доступа к файлу")
+
+        if not settings.MEDIA_ACCEL_REDIRECT:
+            response = serve(request._request, path, document_root=settings.MEDIA_ROOT)
+        else:
+            # Тип файла и заголовки отдачи выставит nginx
+            response = HttpResponse()
+            del response["Content-Type"]
+            response["X-Accel-Redirect"] = f"{settings.MEDIA_ACCEL_PREFIX}{path}"
+        if owners["public"]:
+            patch_cache_control(response, public=True, max_age=settings.MEDIA_ENTITLEMENT_CACHE_TTL)
+        else:
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
 @extend_schema(
     tags=["Подписки"],
     description="Добавляет или удаляет подписку текущего пользователя на курс.",
@@ -160,6 +409,7 @@ class SubscriptionAPIView(CreateAPIView):
     """Подписка или отписка пользователя от курса."""
 
     # permission_classes = (IsAuthenticated,)
+    throttle_scope = "subscription"
 
     def post(self, request, *args, **kwargs):
         user = request.user
@@ -169,7 +419,7 @@ class SubscriptionAPIView(CreateAPIView):
 
         course_item = get_object_or_404(Course, id=course_id)
 
-        subs_item = Subscription.objects.filter(user=user, course=course_item)
+        subs_item = Subscription.objects.filter(user_id=user.pk, course=course_item)
 
         # Если подписка у пользователя на этот курс есть - удаляем ее
         if subs_item.exists():
@@ -177,7 +427,7 @@ class SubscriptionAPIView(CreateAPIView):
             message = "подписка удалена"
         # Если подписки у пользователя на этот курс нет - создаем ее
         else:
-            Subscription.objects.create(user=user, course=course_item)
+            Subscription.objects.create(user_id=user.pk, course=course_item)
             message = "подписка добавлена"
         # Возвращаем ответ в API
         return Response({"message": message}, status=status.HTTP_200_OK)
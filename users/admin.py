@@ -1,15 +1,27 @@
 from django.contrib import admin
 
-from users.models import Payment, User
+from config.admin import ScalableModelAdmin
+from users.models import DeactivationLog, Payment, User
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
-    list_display = ("id", "email")
-    list_filter = ("id", "email")
+class UserAdmin(ScalableModelAdmin):
+    list_display = ("id", "email", "is_active", "is_staff")
+    list_filter = ("is_active", "is_staff")
+    # Поиск по префиксу email использует индекс users_email_pattern_idx
+    search_fields = ("email__startswith",)
 
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(ScalableModelAdmin):
     list_display = ("id", "payment_method", "user", "payment_date", "amount")
-    list_filter = ("id", "payment_method")
+    list_select_related = ("user",)
+    list_filter = ("payment_method",)
+    search_fields = ("user__email__exact",)
+    autocomplete_fields = ("user",)
+
+
+@admin.register(DeactivationLog)
+class DeactivationLogAdmin(ScalableModelAdmin):
+    list_display = ("id", "created_at", "cutoff_date", "first_pk", "last_pk", "users_count")
+    readonly_fields = ("created_at", "cutoff_date", "first_pk", "last_pk", "users_count", "user_ids")
@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from config.cache import cache_key
+from users.models import User
+
+TOKEN_VERSION_CLAIM = "ver"
+USER_CLAIMS = ("is_active", "is_staff", "is_superuser", "is_moderator", TOKEN_VERSION_CLAIM)
+MODERATORS_GROUP = "moders"
+
+
+def token_version_cache_key(user_id):
+    return cache_key("users", "token_version", user_id)
+
+
+def user_claims(user):
+    """Claims access-токена, по которым пользователь восстанавливается без запроса к базе."""
+
+    return {
+        "is_active": user.is_active,
+        "is_staff": user.is_staff,
+        "is_superuser": user.is_superuser,
+        "is_moderator": user.groups.filter(name=MODERATORS_GROUP).exists(),
+        TOKEN_VERSION_CLAIM: user.token_version,
+    }
+
+
+def get_token_version(user_id):
+    """Текущая версия токенов пользователя (кешируется на AUTH_TOKEN_VERSION_CACHE_TTL секунд).
+
+    Для удалённого пользователя возвращает -1, с такой версией токен не совпадёт.
+    """
+
+    key = token_version_cache_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = User.objects.filter(pk=user_id).values_list("token_version", flat=True).first()
+        version = -1 if version is None else version
+        cache.set(key, version, settings.AUTH_TOKEN_VERSION_CACHE_TTL)
+    return version
+
+
+def revoke_user_tokens(user_ids):
+    """Отзывает все выданные пользователям токены, увеличивая версию токенов."""
+
+    User.objects.filter(pk__in=user_ids).update(token_version=F("token_version") + 1)
+    transaction.on_commit(lambda: cache.delete_many([token_version_cache_key(user_id) for user_id in user_ids]))
+
+
+class ClaimsUser(SimpleLazyObject):
+    """Пользователь, восстановленный из подписанных claims access-токена.
+
+    ID, активность и роли берутся из токена. Строка User загружается из базы только при
+    обращении к остальным атрибутам, при сравнении и при присваивании в ForeignKey.
+    """
+
+    def __init__(self, token):
+        # simplejwt записывает ID строкой
+        user_id = User._meta.pk.to_python(token[api_settings.USER_ID_CLAIM])
+        super().__init__(lambda: User.objects.get(**{api_settings.USER_ID_FIELD: user_id}))
+        self.__dict__["_claims"] = {"pk": user_id, **{claim: token[claim] for claim in USER_CLAIMS}}
+
+    pk = property(lambda self: self._claims["pk"])
+    id = pk
+    is_active = property(lambda self: self._claims["is_active"])
+    is_staff = property(lambda self: self._claims["is_staff"])
+    is_superuser = property(lambda self: self._claims["is_superuser"])
+    is_moderator = property(lambda self: self._claims["is_moderator"])
+    token_version = property(lambda self: self._claims[TOKEN_VERSION_CLAIM])
+    is_authenticated = True
+    is_anonymous = False
+
+    def __bool__(self):
+        return True
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWT-аутентификация без запроса к таблицам users и groups на каждый запрос.
+
+    Отзыв токенов проверяется по версии токенов пользователя из кеша. Токены без claims
+    (выпущенные до их появления) проверяются по базе, как в JWTAuthentication.
+    """
+
+    def get_user(self, validated_token):
+        if TOKEN_VERSION_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        if not validated_token.get("is_active"):
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if validated_token[TOKEN_VERSION_CLAIM] != get_token_version(user_id):
+            raise AuthenticationFailed("Токен отозван", code="token_revoked")
+
+        return ClaimsUser(validated_token)
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0010_alter_user_last_login"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeactivationLog",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("cutoff_date", models.DateTimeField(verbose_name="Граница неактивности")),
+                (
+                    "first_pk",
+                    models.PositiveBigIntegerField(help_text="Первый ID диапазона", verbose_name="Начало диапазона"),
+                ),
+                (
+                    "last_pk",
+                    models.PositiveBigIntegerField(help_text="Последний ID диапазона", verbose_name="Конец диапазона"),
+                ),
+                ("users_count", models.PositiveIntegerField(verbose_name="Деактивировано")),
+                ("user_ids", models.JSONField(default=list, verbose_name="ID пользователей")),
+                ("created_at", models.DateTimeField(auto_now_add=True, verbose_name="Дата деактивации")),
+            ],
+            options={
+                "verbose_name": "Журнал деактивации",
+                "verbose_name_plural": "Журнал деактивации",
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
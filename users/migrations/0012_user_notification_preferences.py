@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0011_deactivationlog"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="email_notifications",
+            field=models.BooleanField(
+                default=True, help_text="Получать уведомления по email", verbose_name="email notifications"
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="telegram_notifications",
+            field=models.BooleanField(
+                default=True, help_text="Получать уведомления в Telegram", verbose_name="telegram notifications"
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="tg_chat_id",
+            field=models.CharField(
+                blank=True, help_text="Telegram chat ID", max_length=64, null=True, verbose_name="telegram chat id"
+            ),
+        ),
+    ]
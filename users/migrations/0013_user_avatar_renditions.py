@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0012_user_notification_preferences"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="avatar_renditions",
+            field=models.JSONField(
+                blank=True, default=dict, help_text="Уменьшенные копии аватара", verbose_name="avatar renditions"
+            ),
+        ),
+    ]
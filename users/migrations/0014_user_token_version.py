@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0013_user_avatar_renditions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="token_version",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Увеличивается при отзыве выданных токенов", verbose_name="token version"
+            ),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:44
+
+from django.db import migrations, models
+
+
+def fill_avatar_sha256(apps, schema_editor):
+    """Переносит SHA-256 аватара из описания его копий."""
+
+    User = apps.get_model("users", "User")
+    users = []
+    for user in User.objects.exclude(avatar_renditions={}).only("id", "avatar_renditions"):
+        user.avatar_sha256 = user.avatar_renditions.get("sha256", "")
+        users.append(user)
+    User.objects.bulk_update(users, ["avatar_sha256"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0015_email_pattern_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="avatar_sha256",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                default="",
+                editable=False,
+                help_text="SHA-256 аватара, по которому адресуются его копии",
+                max_length=64,
+                verbose_name="avatar sha256",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="user",
+            name="avatar",
+            field=models.ImageField(
+                blank=True,
+                db_index=True,
+                help_text="Avatar",
+                null=True,
+                upload_to="users/avatars",
+                verbose_name="avatar",
+            ),
+        ),
+        migrations.RunPython(fill_avatar_sha256, migrations.RunPython.noop),
+    ]
@@ -14,7 +14,31 @@ class User(AbstractUser):
     phone = models.CharField(max_length=11, blank=True, null=True, verbose_name="phone", help_text="Phone number")
     city = models.CharField(max_length=255, blank=True, null=True, verbose_name="city", help_text="City")
     avatar = models.ImageField(
-        upload_to="users/avatars", blank=True, null=True, verbose_name="avatar", help_text="Avatar"
+        upload_to="users/avatars", blank=True, null=True, db_index=True, verbose_name="avatar", help_text="Avatar"
+    )
+    avatar_renditions = models.JSONField(
+        default=dict, blank=True, verbose_name="avatar renditions", help_text="Уменьшенные копии аватара"
+    )
+    avatar_sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        default="",
+        editable=False,
+        db_index=True,
+        verbose_name="avatar sha256",
+        help_text="SHA-256 аватара, по которому адресуются его копии",
+    )
+    tg_chat_id = models.CharField(
+        max_length=64, blank=True, null=True, verbose_name="telegram chat id", help_text="Telegram chat ID"
+    )
+    email_notifications = models.BooleanField(
+        default=True, verbose_name="email notifications", help_text="Получать уведомления по email"
+    )
+    telegram_notifications = models.BooleanField(
+        default=True, verbose_name="telegram notifications", help_text="Получать уведомления в Telegram"
+    )
+    token_version = models.PositiveIntegerField(
+        default=0, verbose_name="token version", help_text="Увеличивается при отзыве выданных токенов"
     )
 
     USERNAME_FIELD = "email"
@@ -85,3 +109,22 @@ class Payment(models.Model):
 
     def __str__(self):
         return f"Payment by {self.user}  — {self.amount} for {self.item}"
+
+
+class DeactivationLog(models.Model):
+    """Журнал пакетной деактивации неактивных пользователей: одна запись на пакет."""
+
+    cutoff_date = models.DateTimeField(verbose_name="Граница неактивности")
+    first_pk = models.PositiveBigIntegerField(verbose_name="Начало диапазона", help_text="Первый ID диапазона")
+    last_pk = models.PositiveBigIntegerField(verbose_name="Конец диапазона", help_text="Последний ID диапазона")
+    users_count = models.PositiveIntegerField(verbose_name="Деактивировано")
+    user_ids = models.JSONField(default=list, verbose_name="ID пользователей")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата деактивации")
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "Журнал деактивации"
+        verbose_name_plural = "Журнал деактивации"
+
+    def __str__(self):
+        return f"{self.users_count} users [{self.first_pk}..{self.last_pk}]"
@@ -1,5 +1,17 @@
 from rest_framework import permissions
 
+from users.authentication import MODERATORS_GROUP
+
+
+def is_moderator(user):
+    """Проверяет роль модератора: по claim токена, а без него — по группам пользователя."""
+
+    if not user.is_authenticated:
+        return False
+    if hasattr(user, "_claims"):
+        return user.is_moderator
+    return user.groups.filter(name=MODERATORS_GROUP).exists()
+
 
 class IsModer(permissions.BasePermission):
     """Проверяет, является ли пользователь модератором."""
@@ -7,7 +19,7 @@ class IsModer(permissions.BasePermission):
     message = "Вы не являетесь модератором. У вас не достаточно прав"
 
     def has_permission(self, request, view):
-        return request.user.groups.filter(name="moders").exists()
+        return is_moderator(request.user)
 
 
 class IsOwner(permissions.BasePermission):
@@ -16,7 +28,7 @@ class IsOwner(permissions.BasePermission):
     message = "Вы не являетесь владельцем. У вас не достаточно прав"
 
     def has_object_permission(self, request, view, obj):
-        if obj.owner == request.user:
+        if request.user.is_authenticated and obj.owner_id == request.user.pk:
             return True
         return False
 
@@ -27,4 +39,4 @@ class IsSelfOrAdmin(permissions.BasePermission):
     message = "У вас не достаточно прав"
 
     def has_object_permission(self, request, view, obj):
-        return request.user.is_staff or request.user == obj
+        return request.user.is_staff or request.user.pk == obj.pk
@@ -1,7 +1,17 @@
+from functools import cache
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.utils.crypto import get_random_string
 from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.serializers import ModelSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 
+from config.values_serializers import ValuesSerializer
 from materials.models import Course, Lesson
+from users.authentication import TOKEN_VERSION_CLAIM, user_claims
 from users.models import Payment, User
 
 
@@ -52,6 +62,12 @@ class PublicUserSerializer(serializers.ModelSerializer):
         fields = ("id", "email", "phone", "city")
 
 
+class PublicUserValuesSerializer(ValuesSerializer):
+    """Быстрый сериализатор списка пользователей, совместимый с PublicUserSerializer."""
+
+    model_serializer = PublicUserSerializer
+
+
 class PrivateUserSerializer(serializers.ModelSerializer):
     """Приватный сериализатор пользователя."""
 
@@ -64,6 +80,9 @@ class PrivateUserSerializer(serializers.ModelSerializer):
             "email",
             "phone",
             "city",
+            "tg_chat_id",
+            "email_notifications",
+            "telegram_notifications",
             "payments",
         )
         read_only_fields = ["email", "payments"]
@@ -73,3 +92,54 @@ class PrivateUserSerializer(serializers.ModelSerializer):
 
         user_payments = obj.payment_set.all()
         return PaymentSerializer(user_payments, many=True).data
+
+
+@cache
+def dummy_password_hash():
+    """Хеш случайного пароля: с ним сверяется пароль входа в неизвестную учётную запись."""
+
+    return make_password(get_random_string(32))
+
+
+class UserTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Выдаёт пару токенов с claims для StatelessJWTAuthentication.
+
+    При LOGIN_EARLY_REJECT неизвестная или неактивная учётная запись не загружается, но пароль
+    всё равно хешируется, как в ModelBackend: по времени ответа нельзя узнать, существует ли она.
+    """
+
+    def validate(self, attrs):
+        if settings.LOGIN_EARLY_REJECT and not (
+            User.objects.filter(**{User.USERNAME_FIELD: attrs[self.username_field], "is_active": True}).exists()
+        ):
+            check_password(attrs["password"], dummy_password_hash())
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+
+        return super().validate(attrs)
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token.payload.update(user_claims(user))
+        return token
+
+
+class UserTokenRefreshSerializer(TokenRefreshSerializer):
+    """Обновляет access-токен, заново записывая claims из базы.
+
+    Refresh-токен отозванной версии не принимается, поэтому после отзыва или смены роли
+    новый access-токен можно получить только через повторный вход.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        user = User.objects.filter(pk=refresh.payload.get(api_settings.USER_ID_CLAIM)).first()
+        if (
+            user is None
+            or not user.is_active
+            or refresh.payload.get(TOKEN_VERSION_CLAIM, user.token_version) != user.token_version
+        ):
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+
+        refresh.payload.update(user_claims(user))
+        return super().validate({**attrs, "refresh": str(refresh)})
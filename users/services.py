@@ -1,60 +1,132 @@
-import stripe
-from forex_python.converter import CurrencyRates
+import time
 
-from config.settings import STRIPE_API_KEY
-from users.models import User
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min, Q
 
-stripe.api_key = STRIPE_API_KEY
+from config.cache import cache_key, get_or_compute
+from config.clients import currency_rates, stripe_client
+from config.metrics import FX_LOOKUPS, STRIPE_CALLS, count_call
+from users.authentication import revoke_user_tokens
+from users.models import DeactivationLog, User
+
+
+def fetch_rub_usd_rate():
+    """Курс рубля к доллару из внешнего сервиса."""
+
+    with count_call(FX_LOOKUPS, pair="RUB/USD"):
+        return currency_rates().get_rate("RUB", "USD")
 
 
 def convert_rub_to_usd(amount):
     """Конвертирует рубли в доллары"""
 
-    c = CurrencyRates()
-    rate = c.get_rate("RUB", "USD")
+    rate = get_or_compute(cache_key("fx", "RUB", "USD"), fetch_rub_usd_rate, settings.FX_RATE_CACHE_TTL)
     return int(amount * rate)
 
 
 def create_stripe_product(name):
     """Создаёт Stripe Product для курса или урока"""
 
-    product = stripe.Product.create(name=name)
+    with count_call(STRIPE_CALLS, operation="product.create"):
+        product = stripe_client().Product.create(name=name)
     return product
 
 
 def create_stripe_price(product, amount):
     """Создает цену в страйпе"""
 
-    price = stripe.Price.create(
-        currency="usd",
-        unit_amount=amount * 100,
-        product=product.id,
-    )
+    with count_call(STRIPE_CALLS, operation="price.create"):
+        price = stripe_client().Price.create(
+            currency="usd",
+            unit_amount=amount * 100,
+            product=product.id,
+        )
     return price
 
 
 def create_stripe_checkout_session(price):
     """Создает сессию на оплату в страйпе"""
 
-    session = stripe.checkout.Session.create(
-        success_url="https://127.0.0.1:8000/",
-        line_items=[{"price": price.get("id"), "quantity": 1}],
-        mode="payment",
-    )
+    with count_call(STRIPE_CALLS, operation="checkout.session.create"):
+        session = stripe_client().checkout.Session.create(
+            success_url="https://127.0.0.1:8000/",
+            line_items=[{"price": price.get("id"), "quantity": 1}],
+            mode="payment",
+        )
     return session.get("id"), session.get("url")
 
 
 def retrieve_stripe_checkout_session(session_id):
     """Получает информацию о Stripe Checkout Session по session_id."""
 
-    session = stripe.checkout.Session.retrieve(session_id)
+    with count_call(STRIPE_CALLS, operation="checkout.session.retrieve"):
+        session = stripe_client().checkout.Session.retrieve(session_id)
     return session
 
 
-def deactivate_inactive_users_service(cutoff_date):
-    """Деактивирует пользователей, не заходивших в систему дольше заданного срока."""
+def inactive_users_queryset(cutoff_date):
+    """Активные пользователи, не заходившие с ``cutoff_date``.
+
+    Пользователи без ``last_login`` учитываются по дате регистрации.
+    """
+
+    return User.objects.filter(is_active=True).filter(
+        Q(last_login__lt=cutoff_date) | Q(last_login__isnull=True, date_joined__lt=cutoff_date)
+    )
+
 
-    return User.objects.filter(
-        is_active=True,
-        last_login__lt=cutoff_date,
-    ).update(is_active=False)
+def deactivate_inactive_users_service(
+    cutoff_date, batch_size=None, sleep_seconds=None, dry_run=False, progress_callback=None
+):
+    """Деактивирует пользователей, не заходивших в систему дольше заданного срока.
+
+    Пользователи обходятся диапазонами первичных ключей по ``batch_size`` ID, каждый диапазон
+    фиксируется отдельной транзакцией и записывается в DeactivationLog. Между пакетами делается
+    пауза ``sleep_seconds``. При ``dry_run=True`` только возвращает количество кандидатов.
+    """
+
+    if batch_size is None:
+        batch_size = settings.USER_DEACTIVATION_BATCH_SIZE
+    if sleep_seconds is None:
+        sleep_seconds = settings.USER_DEACTIVATION_BATCH_SLEEP
+
+    candidates = inactive_users_queryset(cutoff_date)
+    if dry_run:
+        return candidates.count()
+
+    bounds = candidates.aggregate(min_pk=Min("pk"), max_pk=Max("pk"))
+    if bounds["min_pk"] is None:
+        return 0
+
+    deactivated = 0
+    start = bounds["min_pk"]
+    while start <= bounds["max_pk"]:
+        end = start + batch_size - 1
+        with transaction.atomic():
+            user_ids = list(
+                candidates.filter(pk__gte=start, pk__lte=end)
+                .select_for_update(skip_locked=True)
+                .order_by("pk")
+                .values_list("pk", flat=True)
+            )
+            if user_ids:
+                User.objects.filter(pk__in=user_ids).update(is_active=False)
+                revoke_user_tokens(user_ids)
+                DeactivationLog.objects.create(
+                    cutoff_date=cutoff_date,
+                    first_pk=start,
+                    last_pk=end,
+                    users_count=len(user_ids),
+                    user_ids=user_ids,
+                )
+
+        deactivated += len(user_ids)
+        if progress_callback:
+            progress_callback(current_pk=min(end, bounds["max_pk"]), max_pk=bounds["max_pk"], deactivated=deactivated)
+
+        start = end + 1
+        if user_ids and sleep_seconds and start <= bounds["max_pk"]:
+            time.sleep(sleep_seconds)
+
+    return deactivated
@@ -0,0 +1,52 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, pre_save
+from django.dispatch import receiver
+
+from materials.services import schedule_image_renditions
+from users.authentication import revoke_user_tokens, token_version_cache_key
+from users.models import User
+
+# Поля пользователя, записываемые в claims access-токена
+CLAIM_FIELDS = ("is_active", "is_staff", "is_superuser")
+
+
+@receiver(pre_save, sender=User)
+def revoke_tokens_on_claims_change(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Отзывает токены пользователя, если изменились поля, записанные в его токены."""
+
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(CLAIM_FIELDS):
+        return
+
+    stored = User.objects.filter(pk=instance.pk).values(*CLAIM_FIELDS).first()
+    if stored is None or all(stored[field] == getattr(instance, field) for field in CLAIM_FIELDS):
+        return
+
+    if update_fields is None:
+        # Новая версия запишется вместе с остальными полями
+        transaction.on_commit(lambda: cache.delete(token_version_cache_key(instance.pk)))
+    else:
+        revoke_user_tokens([instance.pk])
+    instance.token_version += 1
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def revoke_tokens_on_groups_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Отзывает токены при изменении групп: от них зависит claim is_moderator."""
+
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            revoke_user_tokens([instance.pk])
+    elif action in ("post_add", "post_remove") and pk_set:
+        revoke_user_tokens(list(pk_set))
+    elif action == "pre_clear":
+        revoke_user_tokens(list(instance.user_set.values_list("pk", flat=True)))
+
+
+@receiver(post_save, sender=User)
+def user_avatar_renditions(sender, instance, **kwargs):
+    """Обновляет копии аватара пользователя после сохранения."""
+
+    schedule_image_renditions(instance, "avatar")
@@ -2,6 +2,7 @@ import logging
 from datetime import timedelta
 
 from celery import shared_task
+from django.conf import settings
 from django.utils import timezone
 
 from users.services import deactivate_inactive_users_service
@@ -9,11 +10,24 @@ from users.services import deactivate_inactive_users_service
 logger = logging.getLogger(__name__)
 
 
-@shared_task
-def deactivate_inactive_users():
-    """Деактивирует пользователей, не входивших в систему более 30 дней."""
+@shared_task(bind=True)
+def deactivate_inactive_users(self, dry_run=False):
+    """Деактивирует пользователей, не входивших в систему более USER_INACTIVITY_DAYS дней.
 
-    cutoff_date = timezone.now() - timedelta(days=30)
-    deactivated_users = deactivate_inactive_users_service(cutoff_date)
-    logger.info(f"Деактивировано {deactivated_users} пользователей")
+    Прогресс по пакетам публикуется в состоянии задачи PROGRESS.
+    """
+
+    cutoff_date = timezone.now() - timedelta(days=settings.USER_INACTIVITY_DAYS)
+
+    def report_progress(**meta):
+        if self.request.id:
+            self.update_state(state="PROGRESS", meta=meta)
+
+    deactivated_users = deactivate_inactive_users_service(
+        cutoff_date, dry_run=dry_run, progress_callback=report_progress
+    )
+    if dry_run:
+        logger.info(f"К деактивации {deactivated_users} пользователей (dry run)")
+    else:
+        logger.info(f"Деактивировано {deactivated_users} пользователей")
     return deactivated_users
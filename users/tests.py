@@ -1,13 +1,25 @@
+from datetime import timedelta
 from types import SimpleNamespace
 from unittest.mock import patch
 
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, identify_hasher, make_password
+from django.contrib.auth.models import Group
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
 
 from materials.models import Course, Lesson
-from users.models import Payment, User
+from users.models import DeactivationLog, Payment, User
+from users.serializers import PublicUserSerializer
+from users.services import deactivate_inactive_users_service
 
 
 class UserTestCase(APITestCase):
@@ -122,6 +134,16 @@ class UserTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(data, result)
 
+    def test_user_list_matches_public_serializer(self):
+        """Быстрый путь списка пользователей отдаёт тот же JSON, что и PublicUserSerializer."""
+
+        User.objects.create(email="other@example.com", phone="79990000000", city="Москва")
+
+        response = self.client.get(reverse("users:users-list"))
+        expected = JSONRenderer().render(PublicUserSerializer(User.objects.all(), many=True).data)
+
+        self.assertEqual(response.content, expected)
+
 
 class PaymentTestCase(APITestCase):
     """Тесты для API платежей: список платежей и связанные объекты."""
@@ -296,3 +318,183 @@ class PaymentStatusTestCase(APITestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class DeactivateInactiveUsersTestCase(TestCase):
+    """Тесты пакетной деактивации неактивных пользователей."""
+
+    def setUp(self):
+        now = timezone.now()
+        self.cutoff = now - timedelta(days=30)
+        old = now - timedelta(days=60)
+        self.stale = User.objects.create(email="stale@example.com", last_login=old, date_joined=old)
+        self.never_logged = User.objects.create(email="never@example.com", date_joined=old)
+        self.recent = User.objects.create(email="recent@example.com", last_login=now, date_joined=old)
+        self.new = User.objects.create(email="new@example.com")
+
+    def test_deactivates_stale_and_never_logged_in_users(self):
+        """Деактивирует давно не заходивших и не заходивших ни разу старых пользователей."""
+
+        deactivated = deactivate_inactive_users_service(self.cutoff, batch_size=1, sleep_seconds=0)
+
+        self.assertEqual(deactivated, 2)
+        self.assertEqual(
+            set(User.objects.filter(is_active=False).values_list("email", flat=True)),
+            {"stale@example.com", "never@example.com"},
+        )
+
+    def test_writes_audit_record_per_batch(self):
+        """Каждый пакет с деактивациями оставляет запись в журнале."""
+
+        progress = []
+        deactivate_inactive_users_service(
+            self.cutoff, batch_size=1, sleep_seconds=0, progress_callback=lambda **meta: progress.append(meta)
+        )
+
+        logs = DeactivationLog.objects.order_by("first_pk")
+        self.assertEqual([log.user_ids for log in logs], [[self.stale.pk], [self.never_logged.pk]])
+        self.assertEqual(progress[-1]["deactivated"], 2)
+
+    def test_dry_run_only_counts(self):
+        """В режиме dry run пользователи не меняются."""
+
+        self.assertEqual(deactivate_inactive_users_service(self.cutoff, dry_run=True), 2)
+        self.assertFalse(User.objects.filter(is_active=False).exists())
+        self.assertFalse(DeactivationLog.objects.exists())
+
+
+class StatelessJWTAuthenticationTestCase(APITestCase):
+    """Тесты JWT-аутентификации по claims токена."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="jwt@example.com")
+        self.user.set_password("secret-password")
+        self.user.save()
+        self.course = Course.objects.create(name="Course", owner=self.user)
+
+    def login(self):
+        response = self.client.post(
+            reverse("users:login"), {"email": "jwt@example.com", "password": "secret-password"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_request_skips_users_and_groups_tables(self):
+        """Запрос с токеном не обращается к таблицам пользователей и групп."""
+
+        tokens = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        url = reverse("materials:lessons-list")
+        self.client.get(url)  # версия токенов попадает в кеш
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        sql = " ".join(query["sql"] for query in queries.captured_queries)
+        self.assertNotIn("users_user", sql)
+        self.assertNotIn("auth_group", sql)
+
+    def test_owner_permission_uses_token_user_id(self):
+        """Права владельца проверяются по ID из токена."""
+
+        tokens = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+
+        response = self.client.get(reverse("materials:course-detail", args=(self.course.pk,)))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deactivation_revokes_tokens(self):
+        """После деактивации выданные токены перестают работать, в том числе refresh."""
+
+        tokens = self.login()
+        self.user.is_active = False
+        self.user.save()
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        response = self.client.get(reverse("materials:lessons-list"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials()
+        response = self.client.post(reverse("users:token_refresh"), {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_role_change_requires_new_token(self):
+        """Смена групп отзывает токены, новый токен содержит роль модератора."""
+
+        tokens = self.login()
+        self.user.groups.add(Group.objects.create(name="moders"))
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        response = self.client.get(reverse("materials:lessons-list"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.login()['access']}")
+        response = self.client.post(reverse("materials:lesson-create"), {"name": "Lesson"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class LoginTestCase(APITestCase):
+    """Тесты входа: ограничение попыток, ранний отказ и перехеширование паролей."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="login@example.com", password=make_password("secret-password"))
+        self.url = reverse("users:login")
+
+    def login(self, email="login@example.com", password="secret-password", ip="10.0.0.1"):
+        return self.client.post(self.url, {"email": email, "password": password}, format="json", REMOTE_ADDR=ip)
+
+    def test_account_throttle_applies_across_addresses(self):
+        """Попытки входа в одну учётную запись ограничиваются независимо от IP-адреса."""
+
+        rates = {"login_ip": "100/min", "login_account": "2/min"}
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates}):
+            self.assertEqual(self.login(password="wrong", ip="10.0.0.1").status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertEqual(self.login(password="wrong", ip="10.0.0.2").status_code, status.HTTP_401_UNAUTHORIZED)
+            response = self.login(ip="10.0.0.3")
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_ip_throttle_applies_across_accounts(self):
+        """Попытки входа с одного IP-адреса ограничиваются для любых учётных записей."""
+
+        rates = {"login_ip": "2/min", "login_account": "100/min"}
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates}):
+            self.login(email="a@example.com")
+            self.login(email="b@example.com")
+            response = self.login()
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_unknown_and_inactive_accounts_hash_dummy_password(self):
+        """Неизвестная или неактивная учётная запись не загружается, но пароль хешируется так же, как при входе."""
+
+        User.objects.create(email="inactive@example.com", password=make_password("secret-password"), is_active=False)
+
+        with (
+            patch("users.models.User.check_password") as user_check_password,
+            patch.object(type(get_hasher()), "verify", autospec=True, return_value=False) as verify,
+        ):
+            unknown = self.login(email="unknown@example.com", password="guess")
+            inactive = self.login(email="inactive@example.com", password="guess")
+
+        self.assertEqual(unknown.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(inactive.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(unknown.json(), inactive.json())
+        user_check_password.assert_not_called()
+        self.assertEqual(verify.call_count, 2)
+        self.assertEqual([call.args[1] for call in verify.call_args_list], ["guess", "guess"])
+
+    def test_login_rehashes_password_with_preferred_hasher(self):
+        """При входе пароль со старым алгоритмом перехешируется предпочтительным."""
+
+        User.objects.filter(pk=self.user.pk).update(password=make_password("secret-password", hasher="pbkdf2_sha1"))
+
+        response = self.login()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(identify_hasher(self.user.password).algorithm, get_hasher().algorithm)
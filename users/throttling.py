@@ -0,0 +1,30 @@
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LoginRateThrottle(SimpleRateThrottle):
+    """Базовый throttle входа. Лимиты читаются из DEFAULT_THROTTLE_RATES при каждом запросе."""
+
+    def get_rate(self):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+
+class LoginIPRateThrottle(LoginRateThrottle):
+    """Ограничивает число попыток входа с одного IP-адреса."""
+
+    scope = "login_ip"
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {"scope": self.scope, "ident": self.get_ident(request)}
+
+
+class LoginAccountRateThrottle(LoginRateThrottle):
+    """Ограничивает число попыток входа в одну учётную запись с любых адресов."""
+
+    scope = "login_account"
+
+    def get_cache_key(self, request, view):
+        email = request.data.get("email")
+        if not isinstance(email, str) or not email:
+            return None
+        return self.cache_format % {"scope": self.scope, "ident": email.strip().lower()}
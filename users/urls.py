@@ -1,17 +1,18 @@
 from django.urls import path
 from rest_framework.permissions import AllowAny
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenRefreshView
 
 from users.apps import UsersConfig
-from users.views import (PaymentCreateAPIView, PaymentListAPIView, PaymentStatusAPIView, UserCreateAPIView,
-                         UserDestroyAPIView, UserListAPIView, UserRetrieveAPIView, UserUpdateAPIView)
+from users.views import (LoginAPIView, PaymentCreateAPIView, PaymentListAPIView, PaymentStatusAPIView,
+                         UserCreateAPIView, UserDestroyAPIView, UserListAPIView, UserRetrieveAPIView,
+                         UserUpdateAPIView)
 
 app_name = UsersConfig.name
 
 
 urlpatterns = [
     path("register/", UserCreateAPIView.as_view(), name="register"),
-    path("login/", TokenObtainPairView.as_view(permission_classes=(AllowAny,)), name="login"),
+    path("login/", LoginAPIView.as_view(), name="login"),
     path("token/refresh/", TokenRefreshView.as_view(permission_classes=(AllowAny,)), name="token_refresh"),
     path("user/", UserListAPIView.as_view(), name="users-list"),
     path("user/<int:pk>/", UserRetrieveAPIView.as_view(), name="user-profile"),
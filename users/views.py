@@ -8,15 +8,27 @@ from rest_framework.generics import (CreateAPIView, DestroyAPIView, ListAPIView,
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt.views import TokenObtainPairView
 
+from config.values_serializers import ValuesListMixin
 from materials.models import Course, Lesson
 from users.models import Payment, User
-from users.serializers import PaymentSerializer, PrivateUserSerializer, PublicUserSerializer
+from users.serializers import (PaymentSerializer, PrivateUserSerializer, PublicUserSerializer,
+                               PublicUserValuesSerializer)
 
 from .filters import PaymentFilter
 from .permissions import IsSelfOrAdmin
 from .services import (convert_rub_to_usd, create_stripe_checkout_session, create_stripe_price, create_stripe_product,
                        retrieve_stripe_checkout_session)
+from .throttling import LoginAccountRateThrottle, LoginIPRateThrottle
+
+
+@extend_schema(tags=["Пользователи"], description="Вход: выдаёт пару JWT-токенов")
+class LoginAPIView(TokenObtainPairView):
+    """Вход с ограничением числа попыток по IP-адресу и по учётной записи."""
+
+    permission_classes = (AllowAny,)
+    throttle_classes = (LoginIPRateThrottle, LoginAccountRateThrottle)
 
 
 @extend_schema(
@@ -30,6 +42,7 @@ class UserCreateAPIView(CreateAPIView):
     serializer_class = PublicUserSerializer
     queryset = User.objects.all()
     permission_classes = (AllowAny,)
+    throttle_scope = "register"
 
     def perform_create(self, serializer):
         user = serializer.save(is_active=True)
@@ -42,11 +55,12 @@ class UserCreateAPIView(CreateAPIView):
     description="Получение списка пользователей",
     responses={200: PublicUserSerializer(many=True)},
 )
-class UserListAPIView(ListAPIView):
+class UserListAPIView(ValuesListMixin, ListAPIView):
     """Список пользователей."""
 
     queryset = User.objects.all()
     serializer_class = PublicUserSerializer
+    values_serializer_class = PublicUserValuesSerializer
 
 
 @extend_schema(
@@ -72,7 +86,7 @@ class UserRetrieveAPIView(RetrieveAPIView):
     queryset = User.objects.all()
 
     def get_serializer_class(self):
-        if self.request.user == self.get_object():
+        if self.request.user.pk == self.get_object().pk:
             return PrivateUserSerializer
         return PublicUserSerializer
 
@@ -122,6 +136,7 @@ class PaymentCreateAPIView(CreateAPIView):
 
     serializer_class = PaymentSerializer
     queryset = Payment.objects.all()
+    throttle_scope = "payment"
 
     def perform_create(self, serializer):
         content_type_str = self.request.data.get("content_type")
@@ -204,7 +219,7 @@ class PaymentStatusAPIView(APIView):
     serializer_class = PrivateUserSerializer
 
     def get(self, request, pk):
-        payment = get_object_or_404(Payment, pk=pk, user=request.user)
+        payment = get_object_or_404(Payment, pk=pk, user_id=request.user.pk)
 
         if not payment.session_id:
             return Response({"error": "У платежа нет session_id"}, status=status.HTTP_400_BAD_REQUEST)